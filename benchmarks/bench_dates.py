@@ -0,0 +1,83 @@
+"""
+Compara la conversión de fechas vectorizada (utils.dates.parse_dates) con el
+camino anterior: fecha del scraper fila por fila (split en 'T' o strptime) y
+created_at del writer con .apply(x.date()). Verifica que den las mismas fechas y
+mide filas por segundo.
+
+Uso:
+    python benchmarks/bench_dates.py [--rows 200000]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import pandas as pd  # noqa: E402
+
+from utils.dates import format_dates, parse_dates  # noqa: E402
+
+
+def legacy_parse_date(value):
+    if 'T' in value:
+        return value.split('T')[0]
+    try:
+        return datetime.strptime(value.strip(), '%d/%m/%Y').strftime('%Y-%m-%d')
+    except ValueError:
+        return value
+
+
+def legacy_writer_dates(values):
+    # Camino anterior: la columna llegaba como texto, pd.to_datetime implícito al
+    # cargar y luego Timestamp -> date fila por fila
+    series = pd.to_datetime(pd.Series([legacy_parse_date(v) for v in values]), errors='coerce')
+    return series.apply(lambda x: x.date() if hasattr(x, 'date') else x)
+
+
+def synthetic_dates(n, seed=7):
+    """
+    Fechas con los formatos de ANI: atributo content ISO con zona horaria (la
+    mayoría) y texto dd/mm/yyyy de la celda.
+    """
+    rnd = random.Random(seed)
+    start = datetime(2011, 1, 1)
+    values = []
+    for _ in range(n):
+        day = start + timedelta(days=rnd.randint(0, 5400))
+        if rnd.random() < 0.8:
+            values.append(f"{day:%Y-%m-%d}T00:00:00-05:00")
+        else:
+            values.append(f"{day:%d/%m/%Y}")
+    return values
+
+
+def timed(fn, rows):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    return result, elapsed, rows / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    values = synthetic_dates(args.rows)
+    series = pd.Series(values, dtype=object)
+
+    legacy, legacy_s, legacy_rate = timed(lambda: legacy_writer_dates(values), args.rows)
+    fast, fast_s, fast_rate = timed(lambda: parse_dates(series), args.rows)
+    assert fast.dt.date.tolist() == legacy.tolist(), "parse_dates difiere de la implementación anterior"
+    assert format_dates(fast).tolist() == [legacy_parse_date(v) for v in values], "format_dates difiere"
+    print(f"Paridad OK: {args.rows} fechas ({fast.dtype})")
+    for label, elapsed, rate in (("anterior", legacy_s, legacy_rate), ("parse_dates", fast_s, fast_rate)):
+        print(f"  {label:>11}: {elapsed:7.3f}s -> {rate:12.0f} filas/s (x{rate / legacy_rate:.1f})")
+
+
+if __name__ == "__main__":
+    main()
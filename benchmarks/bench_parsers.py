@@ -0,0 +1,70 @@
+"""
+Compara los backends de parseo del listado de ANI (filas por segundo) sobre las
+páginas guardadas en benchmarks/fixtures.
+
+Uso:
+    python benchmarks/bench_parsers.py [--iterations 200]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from extraction.parsers import PARSER_BS4, PARSER_LXML, etree  # noqa: E402
+from extraction.scraper import parse_page  # noqa: E402
+
+FIXTURES_DIR = ROOT / "benchmarks" / "fixtures"
+
+
+def load_fixtures():
+    return {path.name: path.read_bytes() for path in sorted(FIXTURES_DIR.glob("ani_listing_*.html"))}
+
+
+def _comparable(page_data):
+    return [{k: v for k, v in record.items() if k != "update_at"} for record in page_data]
+
+
+def check_parity(fixtures, backends):
+    for name, content in fixtures.items():
+        results = {backend: parse_page(content, 0, parser=backend) for backend in backends}
+        reference_data, reference_next = results[backends[0]]
+        for backend, (page_data, has_next) in results.items():
+            if _comparable(page_data) != _comparable(reference_data) or has_next != reference_next:
+                raise AssertionError(f"{backend} difiere de {backends[0]} en {name}")
+
+
+def bench(fixtures, backend, iterations):
+    rows = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for content in fixtures.values():
+            page_data, _ = parse_page(content, 0, parser=backend)
+            rows += len(page_data)
+    elapsed = time.perf_counter() - start
+    return rows, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    backends = [PARSER_BS4] + ([PARSER_LXML] if etree is not None else [])
+    check_parity(fixtures, backends)
+    print(f"Paridad OK entre backends: {', '.join(backends)} ({len(fixtures)} fixtures)")
+
+    baseline = None
+    for backend in backends:
+        rows, elapsed = bench(fixtures, backend, args.iterations)
+        rows_per_second = rows / elapsed if elapsed else float("inf")
+        baseline = baseline or rows_per_second
+        print(f"{backend:>5}: {rows:>8} filas en {elapsed:6.2f}s -> {rows_per_second:10.0f} filas/s "
+              f"(x{rows_per_second / baseline:.1f})")
+
+
+if __name__ == "__main__":
+    main()
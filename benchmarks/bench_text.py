@@ -0,0 +1,135 @@
+"""
+Compara la normalización de textos y la clasificación de títulos del scraper con
+la implementación anterior (reemplazos encadenados + regex + split/join, y búsqueda
+de palabras clave recorriendo el dict): verifica que den el mismo resultado y mide
+filas por segundo, por fila y en lote sobre una Series de pandas. Incluye además una
+alternancia regex compilada como referencia para la clasificación.
+
+Uso:
+    python benchmarks/bench_text.py [--rows 200000]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import pandas as pd  # noqa: E402
+
+from extraction.scraper import get_rtype_id, get_rtype_ids  # noqa: E402
+from extraction.sources import ANI  # noqa: E402
+from extraction.text import clean_quotes, clean_quotes_series  # noqa: E402
+
+
+def legacy_clean_quotes(text):
+    if not text:
+        return text
+    quotes_map = {
+        '“': '', '‘': '', '’': '', '«': '', '»': '',
+        '„': '', '‚': '', '‹': '', '›': '', '"': '',
+        "'": '', '´': '', '`': '', '′': '', '″': '',
+    }
+    cleaned_text = text
+    for quote_char, replacement in quotes_map.items():
+        cleaned_text = cleaned_text.replace(quote_char, replacement)
+    quotes_pattern = r'["\'“”‘’«»„‚‹›′″]'
+    cleaned_text = re.sub(quotes_pattern, '', cleaned_text)
+    cleaned_text = cleaned_text.strip()
+    cleaned_text = ' '.join(cleaned_text.split())
+    return cleaned_text
+
+
+def legacy_get_rtype_id(title):
+    title_lower = title.lower()
+    for keyword, rtype_id in ANI.classification_keywords.items():
+        if keyword in title_lower:
+            return rtype_id
+    return ANI.default_rtype_id
+
+
+_PRIORITY = {keyword: i for i, keyword in enumerate(ANI.classification_keywords)}
+_VALUES = list(ANI.classification_keywords.values())
+_ALTERNATION = re.compile("(?=(" + "|".join(map(re.escape, ANI.classification_keywords)) + "))")
+
+
+def alternation_rtype_id(title):
+    # Lookahead para detectar también coincidencias superpuestas; gana la de mayor prioridad
+    found = [_PRIORITY[m.group(1)] for m in _ALTERNATION.finditer(title.lower())]
+    return _VALUES[min(found)] if found else ANI.default_rtype_id
+
+
+def synthetic_titles(n, seed=7):
+    """
+    Títulos y resúmenes con la forma del listado de ANI: comillas tipográficas,
+    espacios repetidos y mayúsculas variadas.
+    """
+    rnd = random.Random(seed)
+    kinds = ["Resolución", "RESOLUCIÓN", "Resolucion", "Decreto", "Circular", "Acuerdo"]
+    subjects = [
+        "“Por medio de la cual se declara de utilidad pública” el predio",
+        "Por la cual se adopta el «Manual de Interventoría»",
+        "  Por la cual se modifica la Resolución 20233030001234  de 2023 ",
+        "Por el cual se reglamenta el ‘Decreto’ 1079 de 2015",
+        "Por la cual se ordena el inicio del trámite de expropiación",
+    ]
+    titles, summaries = [], []
+    for i in range(n):
+        titles.append(f" {rnd.choice(kinds)}  {20253030000000 + i} de “2025”")
+        summaries.append(rnd.choice(subjects) if rnd.random() > 0.05 else None)
+    return titles, summaries
+
+
+def timed(fn, rows, repeat=3):
+    # Mejor de repeat corridas: el resultado es el mismo en todas
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return result, elapsed, rows / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    titles, summaries = synthetic_titles(args.rows)
+    texts = titles + summaries
+    rows = len(texts)
+
+    # Normalización
+    legacy, legacy_s, legacy_rate = timed(lambda: [legacy_clean_quotes(t) for t in texts], rows)
+    fast, fast_s, fast_rate = timed(lambda: [clean_quotes(t) for t in texts], rows)
+    series = pd.Series(texts, dtype=object)
+    batch, batch_s, batch_rate = timed(lambda: clean_quotes_series(series), rows)
+    assert legacy == fast, "clean_quotes difiere de la implementación anterior"
+    assert batch.tolist() == legacy, "clean_quotes_series difiere"
+    print(f"Paridad OK: clean_quotes ({rows} textos)")
+    for label, elapsed, rate in (("anterior", legacy_s, legacy_rate), ("actual", fast_s, fast_rate),
+                                 ("Series", batch_s, batch_rate)):
+        print(f"  clean_quotes {label:>10}: {elapsed:7.3f}s -> {rate:12.0f} filas/s (x{rate / legacy_rate:.1f})")
+
+    # Clasificación (sobre títulos ya normalizados, como en el scraper)
+    cleaned_titles = [clean_quotes(t) for t in titles]
+    rows = len(cleaned_titles)
+    legacy, legacy_s, legacy_rate = timed(lambda: [legacy_get_rtype_id(t) for t in cleaned_titles], rows)
+    fast, fast_s, fast_rate = timed(lambda: [get_rtype_id(t) for t in cleaned_titles], rows)
+    title_series = pd.Series(cleaned_titles, dtype=object)
+    batch, batch_s, batch_rate = timed(lambda: get_rtype_ids(title_series), rows)
+    alternation, alternation_s, alternation_rate = timed(
+        lambda: [alternation_rtype_id(t) for t in cleaned_titles], rows)
+    assert legacy == fast == alternation, "get_rtype_id difiere de la implementación anterior"
+    assert batch.tolist() == legacy, "get_rtype_ids difiere"
+    print(f"Paridad OK: get_rtype_id ({rows} títulos)")
+    for label, elapsed, rate in (("anterior", legacy_s, legacy_rate), ("actual", fast_s, fast_rate),
+                                 ("Series", batch_s, batch_rate), ("regex alt.", alternation_s, alternation_rate)):
+        print(f"  get_rtype_id {label:>10}: {elapsed:7.3f}s -> {rate:12.0f} filas/s (x{rate / legacy_rate:.1f})")
+
+
+if __name__ == "__main__":
+    main()
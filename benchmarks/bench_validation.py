@@ -0,0 +1,145 @@
+"""
+Compara el motor de validación vectorizado con la implementación fila por fila:
+verifica que ambos retornen exactamente los mismos (valid_df, invalid_df),
+incluidos los motivos de rechazo (validation_reasons), y mide filas por segundo.
+Si los motores difieren termina con código 1; --check solo verifica la paridad
+(make check).
+
+Uso:
+    python benchmarks/bench_validation.py [--rows 50000] [--check]
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import pandas as pd  # noqa: E402
+
+from validation.validator import ENGINE_ROWWISE, ENGINE_VECTORIZED, validate_dataframe  # noqa: E402
+
+BENCH_RULES = {
+    "title": {"type": "string", "regex": "^(Resoluci[oó]n|Decreto) ", "required": True},
+    "created_at": {"type": "date", "regex": "^\\d{4}-\\d{2}-\\d{2}$", "required": True},
+    "external_link": {"type": "string", "regex": "^https?://", "required": True},
+    "summary": {"type": "string", "regex": "^[^<>]*$", "required": False},
+    "rtype_id": {"type": "int", "required": False},
+    "is_active": {"type": "boolean", "required": False},
+}
+
+
+def synthetic_records(n, seed=42):
+    """
+    Registros con la forma que produce el scraper, con ~11% de valores inválidos.
+    """
+    rnd = random.Random(seed)
+    records = []
+    for i in range(n):
+        record = {
+            "created_at": f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+            "update_at": "2025-10-30 10:00:00",
+            "is_active": True,
+            "title": f"Resolución {20253030000000 + i} de 2025",
+            "gtype": "link",
+            "entity": "Agencia Nacional de Infraestructura",
+            "external_link": f"https://www.ani.gov.co/sites/default/files/res_{i}.pdf",
+            "rtype_id": 15,
+            "summary": "Por medio de la cual se declara de utilidad pública un predio",
+            "classification_id": 13,
+        }
+        roll = rnd.random()
+        if roll < 0.02:
+            record["title"] = "  "
+        elif roll < 0.04:
+            record["created_at"] = "30/10/2025"
+        elif roll < 0.06:
+            record["external_link"] = "/sites/default/files/sin_dominio.pdf"
+        elif roll < 0.08:
+            record["summary"] = "<p>html sin limpiar</p>"
+        elif roll < 0.09:
+            record["summary"] = None
+        elif roll < 0.10:
+            record["rtype_id"] = "15"
+        elif roll < 0.11:
+            # Varios motivos de rechazo en la misma fila
+            record["title"] = "  "
+            record["external_link"] = "/sites/default/files/sin_dominio.pdf"
+            record["summary"] = "<p>html sin limpiar</p>"
+        records.append(record)
+    return records
+
+
+def run(df, rules_path, engine):
+    # Se silencian los logs para medir solo la validación
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        valid_df, invalid_df = validate_dataframe(df, rules_path, engine=engine)
+        elapsed = time.perf_counter() - start
+    return valid_df, invalid_df, elapsed
+
+
+def parity_errors(rowwise, vectorized):
+    """
+    Diferencias entre los (valid_df, invalid_df) de los dos motores; lista vacía si
+    coinciden. Los motivos de rechazo se comparan fila por fila para mostrar la
+    primera que difiere.
+    """
+    errors = []
+    for label, row_df, vec_df in (("válidos", rowwise[0], vectorized[0]), ("descartados", rowwise[1], vectorized[1])):
+        if list(row_df.columns) != list(vec_df.columns):
+            errors.append(f"{label}: columnas {list(row_df.columns)} != {list(vec_df.columns)}")
+            continue
+        if "validation_reasons" in row_df.columns and len(row_df) == len(vec_df):
+            differs = row_df["validation_reasons"].to_numpy() != vec_df["validation_reasons"].to_numpy()
+            if differs.any():
+                position = int(differs.argmax())
+                errors.append(
+                    f"{label}: validation_reasons difiere en {int(differs.sum())} filas; primera (posición "
+                    f"{position}): {row_df['validation_reasons'].iloc[position]!r} != "
+                    f"{vec_df['validation_reasons'].iloc[position]!r}"
+                )
+        try:
+            pd.testing.assert_frame_equal(row_df, vec_df, check_dtype=False)
+        except AssertionError as e:
+            errors.append(f"{label}: {e}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--check", action="store_true", help="solo verificar la paridad, sin medir")
+    args = parser.parse_args()
+
+    df = pd.DataFrame(synthetic_records(args.rows))
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+        json.dump(BENCH_RULES, f)
+        rules_path = f.name
+
+    row_valid, row_invalid, row_elapsed = run(df, rules_path, ENGINE_ROWWISE)
+    vec_valid, vec_invalid, vec_elapsed = run(df, rules_path, ENGINE_VECTORIZED)
+
+    errors = parity_errors((row_valid, row_invalid), (vec_valid, vec_invalid))
+    if errors:
+        print("Los motores de validación difieren:", file=sys.stderr)
+        for error in errors:
+            print(f"  {error}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Paridad OK: {len(vec_valid)} válidos, {len(vec_invalid)} descartados")
+    if args.check:
+        return
+
+    for engine, elapsed in ((ENGINE_ROWWISE, row_elapsed), (ENGINE_VECTORIZED, vec_elapsed)):
+        print(f"{engine:>10}: {elapsed:7.3f}s -> {args.rows / elapsed:12.0f} filas/s")
+    print(f"Aceleración: x{row_elapsed / vec_elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Mide el pico de memoria (RSS) del proceso al preparar y serializar un lote para
+la carga en 'regulations': la ruta anterior de insert_new_records (copias del
+DataFrame, claves con concatenación de strings, applymap(_clean_value),
+.apply sobre created_at y astype(object) + lista de tuplas de bulk_insert)
+contra la actual (filtro sin copia, claves con hash_pandas_object y limpieza
+vectorizada por bloques al escribir el buffer de COPY).
+
+Cada variante corre en un proceso aparte. En Linux el pico se reinicia después
+de construir el lote (/proc/self/clear_refs), de modo que solo cuenta la
+escritura; en otros sistemas se reporta ru_maxrss de todo el proceso. La carga
+en Postgres no se incluye: el COPY consume los buffers ya serializados.
+
+Uso:
+    python benchmarks/bench_write_memory.py [--rows 1000000]
+"""
+import argparse
+import gc
+import json
+import re
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from persistence.writer import batch_duplicates  # noqa: E402
+from utils.dates import normalize_date_columns  # noqa: E402
+from utils.db import NULL_TOKENS, DatabaseManager  # noqa: E402
+
+ENTITY = "Agencia Nacional de Infraestructura"
+VARIANTS = ("anterior", "actual")
+
+
+def synthetic_frame(n):
+    """
+    Lote con la forma del DataFrame validado: created_at datetime64, ~5% de filas
+    repetidas y resúmenes con 'NaN' o vacíos.
+    """
+    ids = np.arange(n)
+    ids[::20] = np.maximum(ids[::20] - 1, 0)
+    summaries = np.full(n, "Por medio de la cual se declara de utilidad pública un predio", dtype=object)
+    summaries[ids % 10 == 0] = None
+    summaries[ids % 25 == 0] = "NaN"
+    return normalize_date_columns(pd.DataFrame({
+        "created_at": pd.Timestamp("2011-01-01") + pd.to_timedelta(ids % 5400, unit="D"),
+        "update_at": "2025-10-30 10:00:00",
+        "is_active": True,
+        "title": pd.Series(ids).map("Resolución {} de 2025".format),
+        "gtype": "link",
+        "entity": ENTITY,
+        "external_link": pd.Series(ids).map("https://www.ani.gov.co/sites/default/files/res_{}.pdf".format),
+        "rtype_id": 15,
+        "summary": summaries,
+        "classification_id": 13,
+    }))
+
+
+def legacy_write(df):
+    """
+    Preparación de insert_new_records y bulk_insert antes de este cambio (sin
+    registros previos en la tabla).
+    """
+    entity_df = df[df['entity'] == ENTITY].copy()
+    cmp_entity_df = entity_df.copy()
+    cmp_entity_df['created_at'] = cmp_entity_df['created_at'].astype(str)
+    cmp_entity_df['external_link'] = cmp_entity_df['external_link'].fillna('').astype(str)
+    cmp_entity_df['title'] = cmp_entity_df['title'].astype(str).str.strip()
+    cmp_entity_df['unique_key'] = (
+        cmp_entity_df['title'] + '|' + cmp_entity_df['created_at'] + '|' + cmp_entity_df['external_link']
+    )
+    cmp_entity_df['is_duplicate'] = cmp_entity_df['unique_key'].isin(set())
+    new_records = entity_df.loc[cmp_entity_df.index[~cmp_entity_df['is_duplicate']]].copy()
+    new_records = new_records.drop_duplicates(subset=['title', 'created_at', 'external_link'], keep='first')
+
+    def _clean_value(v):
+        import pandas as pd
+        if v is None:
+            return None
+        if pd.isna(v):
+            return None
+        if isinstance(v, str) and v.strip() in ("", "NaT", "NaN", "nan"):
+            return None
+        return v
+
+    new_records = new_records.applymap(_clean_value)
+    new_records['created_at'] = new_records['created_at'].apply(
+        lambda x: (x.date() if hasattr(x, 'date') else (None if isinstance(x, str) and x.strip() == "" else x))
+    )
+    records = new_records.astype(object).where(pd.notnull(new_records), None)
+    rows = [tuple(x) for x in records.values]
+    return len(rows)
+
+
+class _DiscardCopyCursor:
+    """
+    Cursor que recibe los buffers de COPY y los descarta (sin base de datos).
+    """
+
+    def __init__(self):
+        self.bytes_copied = 0
+
+    def copy_expert(self, sql, buffer):
+        self.bytes_copied += len(buffer.getvalue())
+
+
+def current_write(df):
+    """
+    Preparación de insert_new_records y serialización de copy_dataframe actuales.
+    """
+    in_entity = df['entity'].eq(ENTITY)
+    entity_df = normalize_date_columns(df if in_entity.all() else df[in_entity])
+    duplicated = batch_duplicates(entity_df)
+    new_records = entity_df[~duplicated] if duplicated.any() else entity_df
+
+    db_manager = DatabaseManager()
+    db_manager.connection = object()
+    db_manager.cursor = _DiscardCopyCursor()
+    db_manager.copy_dataframe(new_records, "regulations", null_tokens=NULL_TOKENS)
+    return len(new_records)
+
+
+def _rss_kb(field):
+    with open("/proc/self/status", encoding="utf-8") as f:
+        return int(re.search(rf"{field}:\s+(\d+)", f.read()).group(1))
+
+
+def _reset_peak():
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="utf-8") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def run_variant(variant, rows):
+    df = synthetic_frame(rows)
+    gc.collect()
+    per_process = not _reset_peak()
+    before_kb = 0 if per_process else _rss_kb("VmRSS")
+
+    start = time.perf_counter()
+    written = (legacy_write if variant == "anterior" else current_write)(df)
+    elapsed = time.perf_counter() - start
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if per_process else _rss_kb("VmHWM")
+    print(json.dumps({
+        "variant": variant, "rows": written, "elapsed_s": round(elapsed, 3),
+        "rss_before_mb": round(before_kb / 1024, 1), "peak_mb": round(peak_kb / 1024, 1),
+        "per_process": per_process,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.rows)
+        return
+
+    results = {}
+    for variant in VARIANTS:
+        output = subprocess.run(
+            [sys.executable, __file__, "--variant", variant, "--rows", str(args.rows)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results[variant] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"Lote de {args.rows} filas")
+    for variant, result in results.items():
+        growth = result["peak_mb"] - result["rss_before_mb"]
+        print(f"  {variant:>8}: {result['elapsed_s']:7.2f}s | RSS antes {result['rss_before_mb']:8.1f} MB | "
+              f"pico {result['peak_mb']:8.1f} MB | incremento {growth:8.1f} MB")
+    legacy, current = results["anterior"], results["actual"]
+    if results["actual"]["per_process"]:
+        print("(pico de todo el proceso: /proc/self/clear_refs no disponible)")
+    print(f"Incremento de memoria: x{(legacy['peak_mb'] - legacy['rss_before_mb']) / max(current['peak_mb'] - current['rss_before_mb'], 0.1):.1f} menor")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Destinos de escritura para el benchmark sin red (benchmarks/bench_suite.py).
+
+- SQLiteSink: base SQLite (en memoria o en archivo) con las tablas de
+  'regulations' y 'regulations_component' y el mismo índice único de la clave de
+  idempotencia que schema.sql; replica la carga del writer (tabla temporal,
+  inserción omitiendo duplicados y componentes de las filas nuevas) sin
+  necesitar un servidor. No replica la captura de cambios: las filas ya
+  guardadas no se actualizan.
+- PostgresSink: un Postgres local (p. ej. el contenedor de docker-compose) en el
+  esquema dapper_bench, creado con schema.sql; escribe con
+  persistence.writer.insert_new_records, la misma ruta que el DAG.
+"""
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+from utils.dates import format_dates
+from utils.db import NULL_TOKENS, null_token_mask
+
+ROOT = Path(__file__).resolve().parent.parent
+SCHEMA_FILE = ROOT / "schema.sql"
+BENCH_SCHEMA = "dapper_bench"
+
+# Mismas columnas y clave de idempotencia que schema.sql
+SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS regulations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT,
+        summary TEXT,
+        created_at TEXT,
+        entity TEXT,
+        external_link TEXT,
+        classification_id INT,
+        rtype_id INT,
+        gtype TEXT,
+        is_active BOOLEAN DEFAULT TRUE,
+        update_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS regulations_dedup_key_idx
+        ON regulations (entity, title, created_at, COALESCE(external_link, ''));
+    CREATE TABLE IF NOT EXISTS regulations_component (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        regulations_id INT NOT NULL REFERENCES regulations(id) ON DELETE CASCADE,
+        components_id INT NOT NULL
+    );
+"""
+
+
+class SQLiteSink:
+    """
+    Destino SQLite. path=':memory:' (por defecto) mide solo la preparación del
+    lote y la inserción, sin E/S de disco.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=":memory:", component_id=7):
+        self.path = str(path)
+        self.component_id = component_id
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.executescript(SQLITE_SCHEMA)
+
+    def reset(self):
+        self.connection.executescript("DELETE FROM regulations_component; DELETE FROM regulations;")
+        self.connection.commit()
+
+    @staticmethod
+    def _rows(df):
+        """
+        Tuplas listas para sqlite3: fechas como 'YYYY-MM-DD', textos
+        ''/'NaT'/'NaN' y nulos de pandas como None.
+        """
+        converted = {}
+        for column in df.columns:
+            series = df[column]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                converted[column] = format_dates(series)
+            elif series.dtype == object:
+                converted[column] = series.mask(null_token_mask(series, NULL_TOKENS))
+        prepared = df.assign(**converted) if converted else df
+        prepared = prepared.astype(object).where(prepared.notna(), None)
+        return prepared.itertuples(index=False, name=None)
+
+    def write(self, df):
+        """
+        Inserta el lote omitiendo los duplicados de la clave y agrega sus
+        componentes. Retorna la cantidad de regulaciones nuevas.
+        """
+        if df.empty:
+            return 0
+        columns = list(df.columns)
+        columns_sql = ", ".join(columns)
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("DROP TABLE IF EXISTS temp.regulations_staging")
+            cursor.execute(f"CREATE TEMP TABLE regulations_staging ({columns_sql})")
+            cursor.executemany(
+                f"INSERT INTO regulations_staging VALUES ({', '.join('?' * len(columns))})",
+                self._rows(df),
+            )
+            last_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM regulations").fetchone()[0]
+            cursor.execute(
+                f"INSERT OR IGNORE INTO regulations ({columns_sql}) SELECT {columns_sql} FROM regulations_staging"
+            )
+            inserted = cursor.rowcount
+            cursor.execute(
+                "INSERT INTO regulations_component (regulations_id, components_id) "
+                "SELECT id, ? FROM regulations WHERE id > ?",
+                (self.component_id, last_id),
+            )
+            self.connection.commit()
+            return inserted
+        except Exception:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM regulations").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+class PostgresSink:
+    """
+    Destino Postgres en el esquema BENCH_SCHEMA (creado con schema.sql y vaciado
+    en cada reset), sin tocar las tablas del DAG. Escribe por entidad con
+    insert_new_records, como write_to_db.
+    """
+
+    name = "postgres"
+
+    def __init__(self, dsn, schema=BENCH_SCHEMA):
+        import psycopg2
+
+        from utils.db import DatabaseManager
+
+        self.schema = schema
+        self.db_manager = DatabaseManager()
+        self.db_manager.connection = psycopg2.connect(dsn, options=f"-c search_path={schema}")
+        self.db_manager.cursor = self.db_manager.connection.cursor()
+        cursor = self.db_manager.cursor
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        cursor.execute(SCHEMA_FILE.read_text(encoding="utf-8"))
+        self.db_manager.connection.commit()
+
+    def reset(self):
+        self.db_manager.cursor.execute("TRUNCATE regulations, regulations_component RESTART IDENTITY")
+        self.db_manager.connection.commit()
+
+    def write(self, df):
+        from persistence.writer import insert_new_records
+
+        inserted = 0
+        for entity, entity_df in df.groupby('entity', sort=False):
+            entity_count, _ = insert_new_records(self.db_manager, entity_df, entity)
+            inserted += entity_count
+        return inserted
+
+    def count(self):
+        self.db_manager.cursor.execute("SELECT COUNT(*) FROM regulations")
+        return self.db_manager.cursor.fetchone()[0]
+
+    def close(self):
+        self.db_manager.close()
+
+
+def make_sink(kind, sqlite_path=":memory:", dsn=None):
+    if kind == "sqlite":
+        return SQLiteSink(sqlite_path)
+    if kind == "postgres":
+        if not dsn:
+            raise ValueError("El destino postgres requiere --dsn o BENCH_DATABASE_URL")
+        return PostgresSink(dsn)
+    raise ValueError(f"Destino desconocido: {kind}")
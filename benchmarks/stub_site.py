@@ -0,0 +1,281 @@
+"""
+Sitio de prueba sin red para el scraper: un servidor HTTP local que sirve el
+listado de normatividad con la estructura de ani.gov.co (vista Drupal), a
+partir de las páginas grabadas en benchmarks/fixtures o de páginas sintéticas
+generadas con el mismo marcado para N miles de filas.
+
+Las páginas se generan al crear el sitio, de modo que el costo de renderizarlas
+no cuenta en las mediciones del scraper. Cada respuesta lleva ETag y responde
+304 a If-None-Match, como el sitio real detrás de su caché.
+
+Uso (servidor en primer plano, para apuntar el scraper a mano):
+    python benchmarks/stub_site.py [--rows 10000] [--rows-per-page 20] [--fixtures] [--port 8765]
+"""
+import argparse
+import hashlib
+import html
+import re
+import sys
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from extraction.sources import ANI, SourceAdapter  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+# Páginas grabadas en el orden del listado; después de la última se sirve la vacía
+FIXTURE_PAGES = ("ani_listing_page_0.html", "ani_listing_page_1.html", "ani_listing_last_page.html")
+EMPTY_FIXTURE = "ani_listing_empty.html"
+
+LISTING_PATH = "/informacion-de-la-ani/normatividad"
+DEFAULT_ROWS_PER_PAGE = 20
+
+_ROW_TEMPLATE = """<tr class="{parity}{first}">
+          <td class="views-field views-field-title">
+            <a href="/sites/default/files/normatividad/{year}/{slug}.pdf">{title}</a>          </td>
+          <td class="views-field views-field-body">
+            {body}
+          </td>
+          <td class="views-field views-field-field-fecha--1">
+            <span class="date-display-single" property="dc:date" datatype="xsd:dateTime" content="{iso}T00:00:00-05:00">{day:%d/%m/%Y}</span>          </td>
+      </tr>
+"""
+
+_PAGER_NEXT = (
+    '<li class="pager-next"><a title="Ir a la página siguiente" '
+    'href="{path}?field_tipos_de_normas__tid=12&amp;page={next_page}">siguiente ›</a></li>\n'
+)
+
+_TBODY_RE = re.compile(r"(<tbody>\s*).*?(\s*</tbody>)", re.S)
+_PAGER_RE = re.compile(r'<ul class="pager">.*?</ul>', re.S)
+_BODY_RE = re.compile(r'<td class="views-field views-field-body">\s*(.*?)\s*</td>', re.S)
+_TITLE_RE = re.compile(r'<td class="views-field views-field-title">\s*<a [^>]*>(.*?)</a>', re.S)
+
+
+def read_fixture(name):
+    return (FIXTURES_DIR / name).read_text(encoding="utf-8")
+
+
+def fixture_pages():
+    """
+    Páginas grabadas del listado (bytes), en orden.
+    """
+    return [read_fixture(name).encode("utf-8") for name in FIXTURE_PAGES]
+
+
+class PageGenerator:
+    """
+    Genera páginas del listado con el marcado de las páginas grabadas: toma la
+    cabecera, la tabla y el paginador de ani_listing_page_0.html y reemplaza las
+    filas. Los resúmenes (con comillas tipográficas, celdas vacías, etc.) y los
+    títulos largos que el scraper descarta salen de las filas grabadas; los
+    títulos y enlaces son únicos y las fechas descienden de a un día cada
+    pocas filas, como en el listado real.
+
+    Args:
+        rows (int): Filas del listado completo
+        rows_per_page (int): Filas por página (el sitio real usa 20)
+        start (date): Fecha de la fila más reciente
+        long_title_every (int): Cada cuántas filas se usa un título largo (0 = nunca)
+    """
+
+    def __init__(self, rows, rows_per_page=DEFAULT_ROWS_PER_PAGE, start=date(2025, 10, 24), long_title_every=50):
+        self.rows = rows
+        self.rows_per_page = rows_per_page
+        self.start = start
+        self.long_title_every = long_title_every
+
+        template = read_fixture(FIXTURE_PAGES[0])
+        recorded = "".join(read_fixture(name) for name in FIXTURE_PAGES)
+        self.bodies = [body for body in dict.fromkeys(_BODY_RE.findall(recorded))] or [""]
+        self.long_titles = [t for t in dict.fromkeys(_TITLE_RE.findall(recorded)) if len(t) > 65]
+        tbody = _TBODY_RE.search(template)
+        self._head = template[:tbody.start()] + "<tbody>\n"
+        self._tail = "      </tbody>" + template[tbody.end():]
+
+    @property
+    def pages(self):
+        return max(1, -(-self.rows // self.rows_per_page))
+
+    def row(self, i):
+        day = self.start - timedelta(days=i // 3)
+        number = 20253030000000 + i
+        if self.long_title_every and self.long_titles and i % self.long_title_every == self.long_title_every - 1:
+            title = self.long_titles[i % len(self.long_titles)]
+        elif i % 4 == 3:
+            title = f"Decreto {number % 10000} de {day.year}"
+        elif i % 7 == 5:
+            title = f"“Resolución {number} de {day.year}”"
+        else:
+            title = f"Resolución {number} de {day.year}"
+        return _ROW_TEMPLATE.format(
+            parity="odd" if i % 2 == 0 else "even",
+            first=" views-row-first" if i % self.rows_per_page == 0 else "",
+            year=day.year,
+            slug=f"Resolución_{number}_de_{day.year}",
+            title=html.escape(title, quote=False),
+            body=self.bodies[i % len(self.bodies)],
+            iso=day.isoformat(),
+            day=day,
+        )
+
+    def page(self, page_num):
+        """
+        HTML de la página page_num (bytes). Las páginas fuera del listado no traen filas.
+        """
+        first = page_num * self.rows_per_page
+        rows = "".join(self.row(i) for i in range(first, min(first + self.rows_per_page, self.rows)))
+        has_next = page_num < self.pages - 1
+        pager = (
+            f'<ul class="pager">\n<li class="pager-current">{page_num + 1}</li>\n'
+            + (_PAGER_NEXT.format(path=LISTING_PATH, next_page=page_num + 1) if has_next else "")
+            + "</ul>"
+        )
+        return _PAGER_RE.sub(lambda _: pager, self._head + rows + self._tail, count=1).encode("utf-8")
+
+    def render(self):
+        return [self.page(page_num) for page_num in range(self.pages)]
+
+
+def stub_source(listing_url, name="ani_stub", requests_per_second=0):
+    """
+    SourceAdapter de ANI apuntando a un sitio de prueba ya levantado en
+    listing_url (p. ej. desde otro proceso).
+    """
+    return SourceAdapter(
+        name=name,
+        entity=ANI.entity,
+        url_template=f"{listing_url}?field_tipos_de_normas__tid=12&field_fecha__value%5Bvalue%5D%5Byear%5D={{year}}",
+        selectors=ANI.selectors,
+        date_formats=ANI.date_formats,
+        classification_id=ANI.classification_id,
+        classification_keywords=ANI.classification_keywords,
+        default_rtype_id=ANI.default_rtype_id,
+        max_title_length=ANI.max_title_length,
+        requests_per_second=requests_per_second,
+    )
+
+
+class StubSite:
+    """
+    Servidor HTTP local (en un hilo) que sirve pages[n] para ?page=n en cualquier
+    ruta y la página vacía grabada fuera de rango. Se usa como context manager:
+
+        with StubSite(PageGenerator(10000).render()) as site:
+            records = list(iter_regulations(source=site.source()))
+    """
+
+    def __init__(self, pages, host="127.0.0.1", port=0):
+        self.pages = list(pages)
+        self.empty_page = read_fixture(EMPTY_FIXTURE).encode("utf-8")
+        self._etags = [f'"{hashlib.md5(page).hexdigest()}"' for page in self.pages]
+        self.requests = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @classmethod
+    def from_fixtures(cls, **kwargs):
+        return cls(fixture_pages(), **kwargs)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def listing_url(self):
+        return f"{self.base_url}{LISTING_PATH}"
+
+    def source(self, name="ani_stub", requests_per_second=0):
+        """
+        SourceAdapter de ANI apuntando al sitio local. requests_per_second=0 quita
+        el límite por host para medir solo el scraper.
+        """
+        return stub_source(self.listing_url, name, requests_per_second)
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Cabeceras y cuerpo salen en escrituras separadas: sin esto Nagle y el
+            # ACK retardado agregan ~40 ms por respuesta con keep-alive
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                try:
+                    page_num = int(query.get("page", ["0"])[0])
+                except ValueError:
+                    page_num = -1
+                in_range = 0 <= page_num < len(site.pages)
+                body = site.pages[page_num] if in_range else site.empty_page
+                etag = site._etags[page_num] if in_range else None
+                with site._lock:
+                    site.requests += 1
+                if etag and self.headers.get("If-None-Match") == etag:
+                    with site._lock:
+                        site.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--rows-per-page", type=int, default=DEFAULT_ROWS_PER_PAGE)
+    parser.add_argument("--fixtures", action="store_true", help="servir solo las páginas grabadas")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    pages = fixture_pages() if args.fixtures else PageGenerator(args.rows, args.rows_per_page).render()
+    site = StubSite(pages, port=args.port)
+    print(f"Sirviendo {len(pages)} páginas en {site.listing_url} (Ctrl+C para terminar)")
+    try:
+        site._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+from datetime import datetime
+
+from validation.validator import validate_dataframe
+from extraction.scraper import plan_backfill_shards, scrape_shard, shard_label
+from extraction.sources import list_sources
+from persistence.migrate import OPTIONAL_MIGRATIONS, migrate
+from persistence.writer import write_to_db
+from utils.artifacts import delete_run_artifacts, read_artifact, write_artifact
+from utils.dates import normalize_date_columns
+from utils.metrics import task_metrics
+import pandas as pd
+
+# Backfill del archivo completo repartido en shards (por año o por rango de páginas)
+# con dynamic task mapping: cada shard se extrae y valida en su propia instancia de
+# tarea, y una única tarea final une, deduplica y escribe en la base de datos.
+#
+# Conf del DAG run (todo opcional):
+#   {"sources": ["ani"]}                         -> fuentes a recorrer (por defecto todas)
+#   {"years": [2024, 2023]}                      -> un shard por año indicado
+#   {"total_pages": 120, "pages_per_shard": 10}  -> shards por rango de páginas
+# Sin conf se crea un shard por fuente y año desde SCRAPER_BACKFILL_START_YEAR.
+
+SHARD_CONCURRENCY = 3
+DEDUP_COLUMNS = ['entity', 'title', 'created_at', 'external_link']
+
+
+@task_metrics
+def task_migrate(**kwargs):
+    applied = migrate(include=OPTIONAL_MIGRATIONS)
+    print(f"✅ Esquema al día ({len(applied)} migraciones aplicadas).")
+    return True
+
+
+@task_metrics
+def task_plan(**kwargs):
+    conf = (kwargs.get('dag_run').conf or {}) if kwargs.get('dag_run') else {}
+    shards = []
+    for source in list_sources(conf.get('sources')):
+        if conf.get('total_pages') is not None:
+            shards += plan_backfill_shards(
+                total_pages=int(conf['total_pages']),
+                pages_per_shard=int(conf.get('pages_per_shard', 10)),
+                source=source,
+            )
+        else:
+            shards += plan_backfill_shards(years=conf.get('years'), source=source)
+    print(f"✅ Plan de backfill: {len(shards)} shards ({', '.join(shard_label(s) for s in shards)})")
+    # Cada elemento son los op_kwargs de una instancia mapeada de extract_shard
+    return [{'shard': shard} for shard in shards]
+
+
+@task_metrics
+def task_extract_shard(shard, **kwargs):
+    df = normalize_date_columns(pd.DataFrame(scrape_shard(shard, concurrency=SHARD_CONCURRENCY)))
+    ref = write_artifact(df, f"raw_{shard_label(shard)}", kwargs['run_id'])
+    print(f"✅ Extracción de {shard_label(shard)}: {len(df)} registros.")
+    return {'shard': shard, 'ref': ref}
+
+
+@task_metrics
+def task_validate_shard(shard, ref, **kwargs):
+    df = read_artifact(ref)
+    valid_df, invalid_df = validate_dataframe(df)
+    valid_ref = write_artifact(valid_df, f"validated_{shard_label(shard)}", kwargs['run_id'])
+    print(f"✅ Validación de {shard_label(shard)}: {len(valid_df)} válidos, {len(invalid_df)} descartados.")
+    return valid_ref
+
+
+@task_metrics
+def task_merge_write(**kwargs):
+    refs = kwargs['ti'].xcom_pull(task_ids='validate_shard') or []
+    frames = [read_artifact(ref) for ref in refs if ref and ref['rows']]
+    if not frames:
+        print("Sin registros válidos en los shards.")
+        delete_run_artifacts(kwargs['run_id'])
+        return True
+
+    merged = pd.concat(frames, ignore_index=True)
+    # Los shards pueden solaparse (p. ej. páginas que se corrieron durante el backfill)
+    key_columns = [col for col in DEDUP_COLUMNS if col in merged.columns]
+    deduped = merged.drop_duplicates(subset=key_columns, keep='first')
+    print(f"Shards unidos: {len(merged)} registros, {len(merged) - len(deduped)} duplicados entre shards.")
+
+    write_to_db(deduped)
+    delete_run_artifacts(kwargs['run_id'])
+    print(f"✅ Escritura completada: {len(deduped)} registros procesados.")
+    return True
+
+
+with DAG(
+    'dapper_backfill',
+    start_date=datetime(2025, 10, 30),
+    schedule_interval=None,
+    catchup=False,
+    tags=['dapper', 'etl', 'backfill']
+) as dag:
+
+    migrate_schema = PythonOperator(task_id='migrate', python_callable=task_migrate)
+    plan = PythonOperator(task_id='plan', python_callable=task_plan)
+    extract_shard = PythonOperator.partial(
+        task_id='extract_shard', python_callable=task_extract_shard
+    ).expand(op_kwargs=plan.output)
+    validate_shard = PythonOperator.partial(
+        task_id='validate_shard', python_callable=task_validate_shard
+    ).expand(op_kwargs=extract_shard.output)
+    merge_write = PythonOperator(task_id='merge_write', python_callable=task_merge_write)
+
+    migrate_schema >> plan
+    validate_shard >> merge_write
@@ -6,36 +6,96 @@ from airflow.operators.python import PythonOperator
 from datetime import datetime
 
 from validation.validator import validate_dataframe
-from extraction.scraper import scrape_page
+from extraction.documents import download_documents
+from extraction.scheduler import extract_sources_delta
+from extraction.scraper import iter_regulations
+from extraction.sources import list_sources
+from extraction.watermark import WatermarkStore, advance_watermark
+from extraction.pipeline import DEFAULT_PARSE_WORKERS
+from persistence.migrate import OPTIONAL_MIGRATIONS, migrate
 from persistence.writer import write_to_db
+from utils.artifacts import delete_run_artifacts, read_artifact, write_artifact
+from utils.dates import normalize_date_columns
+from utils.metrics import task_metrics
 import pandas as pd
 
+# Entre tareas solo viaja por XCom la referencia al artefacto Arrow
+# ({'path', 'rows', 'schema_hash'}); los datos quedan en DAPPER_ARTIFACTS_DIR.
+
+@task_metrics
+def task_migrate(**kwargs):
+    # Migraciones pendientes del esquema (y las opcionales de DB_OPTIONAL_MIGRATIONS)
+    applied = migrate(include=OPTIONAL_MIGRATIONS)
+    print(f"✅ Esquema al día ({len(applied)} migraciones aplicadas).")
+    return True
+
+@task_metrics
 def task_extract(**kwargs):
-    all_data = []
-    for page in range(3):  # ejemplo: scrape 3 páginas
-        all_data.extend(scrape_page(page))
-    df = pd.DataFrame(all_data)
-    kwargs['ti'].xcom_push(key='raw_data', value=df.to_json())
+    # Corrida diaria: solo el delta de cada fuente (extraction.sources) desde su
+    # watermark. Con {"backfill": true} en el conf del DAG run se recorre el archivo
+    # completo de cada fuente.
+    dag_run = kwargs.get('dag_run')
+    backfill = bool(dag_run and dag_run.conf and dag_run.conf.get('backfill'))
+    if backfill:
+        records, watermarks = [], []
+        for source in list_sources():
+            # En backfill el parseo corre en procesos separados de la descarga
+            page_hashes = {}
+            source_records = list(iter_regulations(
+                concurrency=3, parse_workers=DEFAULT_PARSE_WORKERS, page_hashes=page_hashes, source=source
+            ))
+            records.extend(source_records)
+            watermarks.append(advance_watermark(None, source.entity, source.listing_url, source_records, page_hashes))
+    else:
+        records, watermarks, failed = extract_sources_delta(concurrency=3)
+        if failed and not watermarks:
+            raise Exception(f"Falló la extracción de todas las fuentes: {', '.join(failed)}")
+        if failed:
+            print(f"⚠️ Fuentes con error (se reintentan en la próxima corrida): {', '.join(failed)}")
+    # created_at viaja como datetime64 desde aquí (Arrow conserva el dtype)
+    df = normalize_date_columns(pd.DataFrame(records))
+    ref = write_artifact(df, 'raw_data', kwargs['run_id'])
+    kwargs['ti'].xcom_push(key='raw_data', value=ref)
+    # Los watermarks se guardan en task_write, una vez escritos los registros
+    kwargs['ti'].xcom_push(key='watermarks', value=watermarks)
     print(f"✅ Extracción completa: {len(df)} registros.")
     return True
 
+@task_metrics
 def task_validate(**kwargs):
     ti = kwargs['ti']
-    raw_json = ti.xcom_pull(task_ids='extract', key='raw_data')
-    df = pd.read_json(raw_json)
+    df = read_artifact(ti.xcom_pull(task_ids='extract', key='raw_data'))
     valid_df, invalid_df = validate_dataframe(df)
-    ti.xcom_push(key='validated_data', value=valid_df.to_json())
+    ref = write_artifact(valid_df, 'validated_data', kwargs['run_id'])
+    ti.xcom_push(key='validated_data', value=ref)
     print(f"✅ Validación completa: {len(valid_df)} válidos, {len(invalid_df)} descartados.")
     return True
 
+@task_metrics
 def task_write(**kwargs):
     ti = kwargs['ti']
-    validated_json = ti.xcom_pull(task_ids='validate', key='validated_data')
-    valid_df = pd.read_json(validated_json)
-    write_to_db(valid_df)
+    valid_df = read_artifact(ti.xcom_pull(task_ids='validate', key='validated_data'))
+    if valid_df.empty:
+        print("Sin registros nuevos para escribir.")
+    else:
+        write_to_db(valid_df)
+    store = WatermarkStore()
+    for watermark in ti.xcom_pull(task_ids='extract', key='watermarks') or []:
+        store.save(watermark)
+    delete_run_artifacts(kwargs['run_id'])
     print(f"✅ Escritura completada: {len(valid_df)} registros insertados.")
     return True
 
+@task_metrics
+def task_download_documents(**kwargs):
+    # Documentos (PDF) de external_link pendientes: los de las regulaciones nuevas o
+    # con enlace nuevo y los que fallaron antes, hasta DOCUMENTS_RUN_LIMIT por
+    # corrida. Un documento con error no falla la tarea: se reintenta en la próxima
+    summary = download_documents()
+    print(f"✅ Documentos: {summary['downloaded']} descargados, {summary['not_modified']} sin cambios, "
+          f"{summary['failed']} con error.")
+    return True
+
 with DAG(
     'dapper_pipeline',
     start_date=datetime(2025, 10, 30),
@@ -44,8 +104,12 @@ with DAG(
     tags=['dapper', 'etl']
 ) as dag:
 
+    migrate_schema = PythonOperator(task_id='migrate', python_callable=task_migrate, provide_context=True)
     extract = PythonOperator(task_id='extract', python_callable=task_extract, provide_context=True)
     validate = PythonOperator(task_id='validate', python_callable=task_validate, provide_context=True)
     write = PythonOperator(task_id='write', python_callable=task_write, provide_context=True)
+    documents = PythonOperator(
+        task_id='download_documents', python_callable=task_download_documents, provide_context=True
+    )
 
-    extract >> validate >> write
+    migrate_schema >> extract >> validate >> write >> documents
@@ -0,0 +1,62 @@
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+from datetime import datetime
+
+from extraction.documents import download_documents
+from extraction.sources import list_sources
+from persistence.migrate import OPTIONAL_MIGRATIONS, migrate
+from streaming.executor import STREAM_BATCH_ROWS, stream_regulations
+from utils.metrics import task_metrics
+
+# Variante de dapper_pipeline en una sola tarea: extracción, validación y
+# escritura corren al mismo tiempo por micro-lotes (ver streaming/executor.py),
+# sin artefactos intermedios. Pensada para backfills largos, donde las filas
+# empiezan a llegar a Postgres desde el primer lote y la memoria no crece con el
+# tamaño del archivo. Se dispara a mano.
+#
+# Conf del DAG run (todo opcional):
+#   {"backfill": true}      -> archivo completo de cada fuente en vez del delta
+#   {"sources": ["ani"]}    -> fuentes a recorrer (por defecto todas)
+#   {"batch_rows": 2000}    -> registros por micro-lote (por defecto STREAM_BATCH_ROWS)
+
+@task_metrics
+def task_migrate(**kwargs):
+    applied = migrate(include=OPTIONAL_MIGRATIONS)
+    print(f"✅ Esquema al día ({len(applied)} migraciones aplicadas).")
+    return True
+
+@task_metrics
+def task_stream(**kwargs):
+    dag_run = kwargs.get('dag_run')
+    conf = (dag_run.conf if dag_run else None) or {}
+    summary = stream_regulations(
+        sources=list_sources(conf.get('sources')),
+        backfill=bool(conf.get('backfill')),
+        batch_rows=int(conf.get('batch_rows') or STREAM_BATCH_ROWS),
+    )
+    print(f"✅ Streaming completo: {summary['extracted']} extraídos, {summary['valid']} válidos, "
+          f"{summary['rejected']} descartados, {summary['inserted']} insertados en {summary['batches']} lotes.")
+    return True
+
+@task_metrics
+def task_download_documents(**kwargs):
+    summary = download_documents()
+    print(f"✅ Documentos: {summary['downloaded']} descargados, {summary['not_modified']} sin cambios, "
+          f"{summary['failed']} con error.")
+    return True
+
+with DAG(
+    'dapper_streaming',
+    start_date=datetime(2025, 10, 30),
+    schedule_interval=None,
+    catchup=False,
+    tags=['dapper', 'etl', 'streaming']
+) as dag:
+
+    migrate_schema = PythonOperator(task_id='migrate', python_callable=task_migrate, provide_context=True)
+    stream = PythonOperator(task_id='stream', python_callable=task_stream, provide_context=True)
+    documents = PythonOperator(
+        task_id='download_documents', python_callable=task_download_documents, provide_context=True
+    )
+
+    migrate_schema >> stream >> documents
@@ -1,3 +1,8 @@
+-- Esquema consolidado para el init del contenedor de Postgres: equivale a las
+-- migraciones de src/persistence/migrations (python -m persistence.migrate),
+-- que son las que se versionan. Los cambios de esquema van como migración nueva
+-- y se reflejan aquí.
+
 CREATE TABLE IF NOT EXISTS regulations (
     id SERIAL PRIMARY KEY,
     title TEXT,
@@ -12,9 +17,99 @@ CREATE TABLE IF NOT EXISTS regulations (
     update_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Clave de idempotencia del writer (INSERT ... ON CONFLICT DO NOTHING)
+CREATE UNIQUE INDEX IF NOT EXISTS regulations_dedup_key_idx
+    ON regulations (entity, title, created_at, (COALESCE(external_link, '')));
+
+-- MAX(created_at) por entidad (arranque del watermark) y listados por fecha
+CREATE INDEX IF NOT EXISTS regulations_entity_created_at_idx
+    ON regulations (entity, created_at DESC);
+
+-- Búsqueda de texto completo (columna generada) y aproximada por título (ver
+-- persistence/search.py)
+ALTER TABLE regulations ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('spanish', COALESCE(title, '')), 'A')
+        || setweight(to_tsvector('spanish', COALESCE(summary, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS regulations_search_vector_idx
+    ON regulations USING GIN (search_vector);
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS regulations_title_trgm_idx
+            ON regulations USING GIN (title gin_trgm_ops);
+    END IF;
+END
+$$;
+
+-- Hash del contenido (resumen, enlace, tipo y estado) para la captura de cambios
+-- del writer: solo se actualizan las filas cuyo hash cambió
+CREATE OR REPLACE FUNCTION regulations_content_hash(
+    summary TEXT,
+    external_link TEXT,
+    gtype TEXT,
+    rtype_id INT,
+    classification_id INT,
+    is_active BOOLEAN
+) RETURNS UUID AS $$
+    SELECT md5(
+        COALESCE(summary, '\N') || E'\x1f'
+        || COALESCE(external_link, '\N') || E'\x1f'
+        || COALESCE(gtype, '\N') || E'\x1f'
+        || COALESCE(rtype_id::TEXT, '\N') || E'\x1f'
+        || COALESCE(classification_id::TEXT, '\N') || E'\x1f'
+        || COALESCE(is_active::TEXT, '\N')
+    )::UUID
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+ALTER TABLE regulations ADD COLUMN IF NOT EXISTS content_hash UUID
+    GENERATED ALWAYS AS (
+        regulations_content_hash(summary, external_link, gtype, rtype_id, classification_id, is_active)
+    ) STORED;
+
 
 CREATE TABLE IF NOT EXISTS regulations_component (
     id SERIAL PRIMARY KEY,
     regulations_id INT NOT NULL REFERENCES regulations(id) ON DELETE CASCADE,
     components_id INT NOT NULL
-);
\ No newline at end of file
+);
+
+-- Borrado en cascada y joins desde regulations
+CREATE INDEX IF NOT EXISTS regulations_component_regulations_id_idx
+    ON regulations_component (regulations_id);
+
+-- Estado incremental de la extracción (ver extraction/watermark.py)
+CREATE TABLE IF NOT EXISTS extraction_watermarks (
+    entity TEXT NOT NULL,
+    listing_url TEXT NOT NULL,
+    last_created_at DATE,
+    top_link TEXT,
+    page_hashes JSONB NOT NULL DEFAULT '{}'::jsonb,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (entity, listing_url)
+);
+
+-- Documentos descargados desde external_link (ver extraction/documents.py); sin
+-- clave foránea para admitir regulations particionada
+CREATE TABLE IF NOT EXISTS regulation_documents (
+    regulations_id INT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    sha256 TEXT,
+    size_bytes BIGINT,
+    content_type TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    http_status INT,
+    error TEXT,
+    attempts INT NOT NULL DEFAULT 0,
+    fetched_at TIMESTAMP,
+    checked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS regulation_documents_sha256_idx
+    ON regulation_documents (sha256);
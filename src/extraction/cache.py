@@ -0,0 +1,289 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import requests
+
+from extraction.http_client import fetch
+
+CACHE_MODE_OFF = "off"
+CACHE_MODE_ON = "on"
+CACHE_MODE_REPLAY = "replay"
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "SCRAPER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "dapper_scraper_cache")
+)
+DEFAULT_CACHE_MODE = os.getenv("SCRAPER_CACHE_MODE", CACHE_MODE_ON).lower()
+DEFAULT_TTL = float(os.getenv("SCRAPER_CACHE_TTL", "300"))
+DEFAULT_MAX_BYTES = int(float(os.getenv("SCRAPER_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+# Archivos de una entrada; el tamaño de la caché cuenta todos y el desalojo los borra juntos
+_BODY_SUFFIX = ".html.gz"
+_ENTRY_SUFFIXES = (_BODY_SUFFIX, ".json", ".records.json.gz")
+
+_cache = None
+_lock = threading.Lock()
+
+
+class CacheMissError(requests.RequestException):
+    """
+    Se lanza en modo replay cuando una URL no está en la caché.
+    """
+
+
+class ResponseCache:
+    """
+    Caché en disco de respuestas HTTP indexada por URL.
+
+    Por cada URL guarda:
+      - <clave>.json: metadatos (ETag, Last-Modified, hora de descarga, hash del contenido)
+      - <clave>.html.gz: cuerpo comprimido (su mtime se usa como último acceso para LRU)
+      - <clave>.records.json.gz: resultado del parseo asociado a un hash de contenido
+
+    max_bytes acota la suma de los tres archivos de todas las entradas.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES,
+                 mode=DEFAULT_CACHE_MODE):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._index = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    # ------------------------------------------------------------------ rutas
+    def _key(self, url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def _write_atomic(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    # ------------------------------------------------------------ metadatos
+    def get_meta(self, url):
+        try:
+            with open(self._path(self._key(url), ".json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, url, meta):
+        key = self._key(url)
+        data = json.dumps(meta).encode("utf-8")
+        self._track(key, ".json", self._write_atomic(self._path(key, ".json"), data), touch=False)
+
+    def is_fresh(self, meta):
+        return bool(meta) and (time.time() - meta.get("fetched_at", 0)) < self.ttl
+
+    # ----------------------------------------------------------------- cuerpo
+    def get_body(self, url):
+        key = self._key(url)
+        body_path = self._path(key, _BODY_SUFFIX)
+        try:
+            with open(body_path, "rb") as f:
+                body = gzip.decompress(f.read())
+        except OSError:
+            return None
+        self._touch(key, body_path)
+        return body
+
+    def touch(self, url):
+        key = self._key(url)
+        self._touch(key, self._path(key, _BODY_SUFFIX))
+
+    def store(self, url, body, etag=None, last_modified=None):
+        """
+        Guarda el cuerpo de una respuesta y sus validadores HTTP.
+
+        Returns:
+            dict: metadatos guardados (incluye content_hash)
+        """
+        key = self._key(url)
+        self._track(key, _BODY_SUFFIX, self._write_atomic(self._path(key, _BODY_SUFFIX), gzip.compress(body)))
+
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+            "content_hash": hashlib.sha256(body).hexdigest(),
+        }
+        self._save_meta(url, meta)
+        self.evict()
+        return meta
+
+    def mark_validated(self, url, meta, etag=None, last_modified=None):
+        """
+        Renueva la hora de descarga cuando el servidor confirma que el contenido no cambió.
+        """
+        meta = dict(meta)
+        meta["fetched_at"] = time.time()
+        meta["etag"] = etag or meta.get("etag")
+        meta["last_modified"] = last_modified or meta.get("last_modified")
+        self._save_meta(url, meta)
+        return meta
+
+    # --------------------------------------------------------------- parseo
+    def load_records(self, url, content_hash):
+        try:
+            with open(self._path(self._key(url), ".records.json.gz"), "rb") as f:
+                payload = json.loads(gzip.decompress(f.read()))
+        except (OSError, ValueError):
+            return None
+        if payload.get("content_hash") != content_hash:
+            return None
+        return payload.get("result")
+
+    def store_records(self, url, content_hash, result):
+        key = self._key(url)
+        payload = json.dumps({"content_hash": content_hash, "result": result}).encode("utf-8")
+        size = self._write_atomic(self._path(key, ".records.json.gz"), gzip.compress(payload))
+        self._track(key, ".records.json.gz", size, touch=False)
+        self.evict()
+
+    # ------------------------------------------------------------- LRU/tamaño
+    def _load_index(self):
+        """
+        {clave: [último acceso, {sufijo: bytes}]} a partir de los archivos en disco;
+        el último acceso es el mtime del cuerpo (o el más reciente si no está).
+        """
+        files = {}
+        for name in os.listdir(self.directory):
+            suffix = next((suffix for suffix in _ENTRY_SUFFIXES if name.endswith(suffix)), None)
+            if suffix is None:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            files.setdefault(name[:-len(suffix)], {})[suffix] = stat
+        return {
+            key: [(stats.get(_BODY_SUFFIX) or max(stats.values(), key=lambda stat: stat.st_mtime)).st_mtime,
+                  {suffix: stat.st_size for suffix, stat in stats.items()}]
+            for key, stats in files.items()
+        }
+
+    def _track(self, key, suffix, size, touch=True):
+        """
+        Registra el tamaño de uno de los archivos de la entrada; touch marca el acceso.
+        """
+        with self._lock:
+            if self._index is None:
+                self._index = self._load_index()
+            entry = self._index.setdefault(key, [time.time(), {}])
+            entry[1][suffix] = size
+            if touch:
+                entry[0] = time.time()
+
+    def _touch(self, key, body_path):
+        now = time.time()
+        try:
+            os.utime(body_path, (now, now))
+        except OSError:
+            return
+        with self._lock:
+            if self._index is not None and key in self._index:
+                self._index[key][0] = now
+
+    def evict(self):
+        """
+        Elimina las entradas usadas hace más tiempo hasta quedar bajo max_bytes.
+        """
+        with self._lock:
+            if self._index is None:
+                self._index = self._load_index()
+            total = sum(sum(sizes.values()) for _, sizes in self._index.values())
+            if total <= self.max_bytes:
+                return
+            for key, (_, sizes) in sorted(self._index.items(), key=lambda item: item[1][0]):
+                for suffix in _ENTRY_SUFFIXES:
+                    try:
+                        os.remove(self._path(key, suffix))
+                    except OSError:
+                        pass
+                del self._index[key]
+                total -= sum(sizes.values())
+                if total <= self.max_bytes:
+                    break
+
+
+def get_cache():
+    """
+    Retorna la caché compartida del proceso, o None si SCRAPER_CACHE_MODE=off.
+    """
+    global _cache
+    if DEFAULT_CACHE_MODE == CACHE_MODE_OFF:
+        return None
+    with _lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def cached_fetch(url, cache, session=None, rate_limiter=None):
+    """
+    Obtiene el cuerpo de una URL usando la caché.
+
+      - replay: solo sirve desde la caché (CacheMissError si no está).
+      - entrada vigente según TTL: se sirve sin hacer solicitud.
+      - entrada vencida: GET condicional con If-None-Match / If-Modified-Since.
+
+    Returns:
+        tuple: (body, content_hash, changed) donde changed es False si el servidor
+            respondió 304 o el contenido descargado tiene el mismo hash que el guardado
+    """
+    meta = cache.get_meta(url)
+
+    if cache.mode == CACHE_MODE_REPLAY:
+        body = cache.get_body(url) if meta else None
+        if body is None:
+            raise CacheMissError(f"URL no disponible en caché (modo replay): {url}")
+        return body, meta["content_hash"], True
+
+    if meta and cache.is_fresh(meta):
+        body = cache.get_body(url)
+        if body is not None:
+            return body, meta["content_hash"], False
+
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = fetch(url, session=session, rate_limiter=rate_limiter, headers=headers or None)
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+
+    if response.status_code == 304 and meta:
+        body = cache.get_body(url)
+        if body is not None:
+            cache.mark_validated(url, meta, etag, last_modified)
+            return body, meta["content_hash"], False
+        # El cuerpo fue desalojado: pedir la página completa
+        response = fetch(url, session=session, rate_limiter=rate_limiter)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+    body = response.content
+    content_hash = hashlib.sha256(body).hexdigest()
+    if meta and meta.get("content_hash") == content_hash:
+        cache.mark_validated(url, meta, etag, last_modified)
+        cache.touch(url)
+        return body, content_hash, False
+
+    new_meta = cache.store(url, body, etag, last_modified)
+    return body, new_meta["content_hash"], True
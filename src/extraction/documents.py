@@ -0,0 +1,477 @@
+"""
+Descarga de los documentos enlazados por las regulaciones (external_link) a un
+almacén local direccionado por contenido.
+
+- Las descargas corren en un pool de hilos con límite por host: el
+  HostRateLimiter compartido (solicitudes por segundo) y un máximo de descargas
+  simultáneas por host (DOCUMENTS_PER_HOST).
+- Cada archivo se escribe a disco por bloques mientras se calcula su SHA-256;
+  nunca se tiene el documento completo en memoria. Si la conexión se corta, la
+  descarga se retoma con Range/If-Range desde lo ya escrito (en la misma
+  corrida o en la siguiente).
+- El archivo terminado se guarda como <hash[:2]>/<hash> en DAPPER_DOCUMENTS_DIR:
+  dos regulaciones con el mismo PDF comparten un único archivo.
+- Por regulación se registra en regulation_documents (migración 0005) el hash,
+  el tamaño, el estado y el ETag/Last-Modified. En las corridas siguientes la
+  solicitud es condicional (If-None-Match / If-Modified-Since) y los documentos
+  sin cambios no se vuelven a descargar.
+
+Uso:
+    python -m extraction.documents --limit 100
+    python -m extraction.documents --recheck      # revalida también los ya descargados
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+
+from extraction.http_client import fetch_stream, get_session
+from extraction.scheduler import configure_rate_limits
+from extraction.sources import list_sources
+from utils import metrics
+from utils.db import DatabaseManager
+
+DOCUMENTS_TABLE = "regulation_documents"
+
+DOCUMENTS_DIR = os.getenv("DAPPER_DOCUMENTS_DIR", os.path.join(tempfile.gettempdir(), "dapper_documents"))
+DEFAULT_WORKERS = int(os.getenv("DOCUMENTS_WORKERS", "8"))
+DEFAULT_PER_HOST = int(os.getenv("DOCUMENTS_PER_HOST", "2"))
+# Documentos por corrida de la tarea (0 = sin límite); los demás quedan para la siguiente
+DEFAULT_RUN_LIMIT = int(os.getenv("DOCUMENTS_RUN_LIMIT", "500"))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("DOCUMENTS_MAX_ATTEMPTS", "5"))
+MAX_DOCUMENT_BYTES = int(float(os.getenv("DOCUMENTS_MAX_MB", "200")) * 1024 * 1024)
+CHUNK_BYTES = int(os.getenv("DOCUMENTS_CHUNK_KB", "256")) * 1024
+# Reanudaciones dentro de una misma corrida si la conexión se corta
+RESUME_ATTEMPTS = 3
+# Resultados que se acumulan antes de guardarlos en la base de datos
+FLUSH_ROWS = 200
+
+STATUS_DOWNLOADED = "downloaded"
+STATUS_NOT_MODIFIED = "not_modified"
+STATUS_FAILED = "failed"
+
+RESULT_COLUMNS = [
+    'regulations_id', 'url', 'status', 'sha256', 'size_bytes', 'content_type', 'etag', 'last_modified',
+    'http_status', 'error', 'checked_at',
+]
+
+_PLAN_SQL = f"""
+    SELECT r.id, r.external_link, d.url, d.status, d.sha256, d.size_bytes, d.content_type, d.etag, d.last_modified
+    FROM regulations r
+    LEFT JOIN {DOCUMENTS_TABLE} d ON d.regulations_id = r.id
+    WHERE r.external_link IS NOT NULL AND r.is_active IS NOT FALSE
+      AND (d.regulations_id IS NULL
+           OR d.url IS DISTINCT FROM r.external_link
+           OR (d.status = '{STATUS_FAILED}' AND d.attempts < %(max_attempts)s)
+           OR %(recheck)s)
+    ORDER BY d.regulations_id IS NOT NULL, r.id DESC
+    {{limit}}
+"""
+
+_RECORD_SQL = f"""
+    INSERT INTO {DOCUMENTS_TABLE} ({{columns}}, attempts, fetched_at)
+    SELECT {{columns}},
+           CASE WHEN status = '{STATUS_FAILED}' THEN 1 ELSE 0 END,
+           CASE WHEN status = '{STATUS_DOWNLOADED}' THEN checked_at END
+    FROM {{staging}}
+    ON CONFLICT (regulations_id) DO UPDATE SET
+        url = EXCLUDED.url,
+        status = EXCLUDED.status,
+        sha256 = EXCLUDED.sha256,
+        size_bytes = EXCLUDED.size_bytes,
+        content_type = EXCLUDED.content_type,
+        etag = EXCLUDED.etag,
+        last_modified = EXCLUDED.last_modified,
+        http_status = EXCLUDED.http_status,
+        error = EXCLUDED.error,
+        attempts = CASE WHEN EXCLUDED.status = '{STATUS_FAILED}' THEN {DOCUMENTS_TABLE}.attempts + 1 ELSE 0 END,
+        fetched_at = CASE WHEN EXCLUDED.status = '{STATUS_DOWNLOADED}' THEN EXCLUDED.checked_at
+                          ELSE {DOCUMENTS_TABLE}.fetched_at END,
+        checked_at = EXCLUDED.checked_at
+"""
+
+
+class DocumentTooLarge(Exception):
+    """
+    El documento supera MAX_DOCUMENT_BYTES.
+    """
+
+
+class DocumentStore:
+    """
+    Almacén local de documentos direccionado por contenido:
+
+      - objects/<hash[:2]>/<hash>: archivo terminado, nombrado por su SHA-256
+      - partial/<clave>.part: descarga en curso de una URL (clave = sha1 de la URL)
+      - partial/<clave>.json: validadores de la descarga en curso (ETag,
+        Last-Modified) para retomarla con If-Range
+    """
+
+    def __init__(self, directory=DOCUMENTS_DIR):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        self.partial_dir = os.path.join(directory, "partial")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+    def path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def has(self, sha256):
+        return bool(sha256) and os.path.exists(self.path(sha256))
+
+    def partial_path(self, url):
+        return os.path.join(self.partial_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".part")
+
+    def load_partial(self, url):
+        """
+        Returns:
+            tuple: (bytes ya escritos, validadores) de una descarga a medias de url,
+                o (0, {}) si no hay una que se pueda retomar
+        """
+        path = self.partial_path(url)
+        try:
+            with open(path + ".json", encoding="utf-8") as f:
+                validators = json.load(f)
+            size = os.path.getsize(path)
+        except (OSError, ValueError):
+            return 0, {}
+        if validators.get("url") != url or not (validators.get("etag") or validators.get("last_modified")):
+            return 0, {}
+        return size, validators
+
+    def save_partial_validators(self, url, etag, last_modified):
+        with open(self.partial_path(url) + ".json", "w", encoding="utf-8") as f:
+            json.dump({"url": url, "etag": etag, "last_modified": last_modified}, f)
+
+    def discard_partial(self, url):
+        path = self.partial_path(url)
+        for stale in (path, path + ".json"):
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+
+    def commit(self, url, sha256):
+        """
+        Mueve la descarga terminada de url a su lugar en objects/. Si ya existe un
+        archivo con ese hash (mismo contenido), se descarta la copia nueva.
+
+        Returns:
+            str: ruta del archivo en el almacén
+        """
+        target = self.path(sha256)
+        partial = self.partial_path(url)
+        if os.path.exists(target):
+            os.remove(partial)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(partial, target)
+        try:
+            os.remove(partial + ".json")
+        except FileNotFoundError:
+            pass
+        return target
+
+
+class HostSlots:
+    """
+    Máximo de descargas simultáneas por host (además del límite de solicitudes por
+    segundo del HostRateLimiter).
+    """
+
+    def __init__(self, per_host=DEFAULT_PER_HOST):
+        self.per_host = max(1, per_host)
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    @contextmanager
+    def acquire(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.BoundedSemaphore(self.per_host))
+        with semaphore:
+            yield
+
+
+def _hash_file(path, hasher, chunk_size=CHUNK_BYTES):
+    """
+    Agrega al hash el contenido ya escrito de una descarga que se retoma.
+    """
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(block)
+
+
+def _resume_offset(response, offset):
+    """
+    Offset desde el que escribir la respuesta: el pedido si el servidor respondió
+    206 con ese rango, o 0 si envió el documento completo (200: no admite rangos o
+    el documento cambió, según If-Range).
+    """
+    if not offset or response.status_code != 206:
+        return 0
+    content_range = response.headers.get("Content-Range", "")
+    if not content_range.startswith(f"bytes {offset}-"):
+        return None
+    return offset
+
+
+def _stream_to_store(response, url, store, offset, hasher):
+    """
+    Escribe el cuerpo de response en la descarga parcial de url a partir de offset,
+    por bloques de CHUNK_BYTES, actualizando hasher.
+
+    Returns:
+        int: bytes escritos en esta respuesta
+    """
+    written = 0
+    expected = response.headers.get("Content-Length")
+    if expected and offset + int(expected) > MAX_DOCUMENT_BYTES:
+        raise DocumentTooLarge(f"{offset + int(expected)} bytes (máximo {MAX_DOCUMENT_BYTES})")
+    with open(store.partial_path(url), "ab" if offset else "wb") as f:
+        for block in response.iter_content(chunk_size=CHUNK_BYTES):
+            if not block:
+                continue
+            written += len(block)
+            if offset + written > MAX_DOCUMENT_BYTES:
+                raise DocumentTooLarge(f"más de {MAX_DOCUMENT_BYTES} bytes")
+            f.write(block)
+            hasher.update(block)
+    if expected and written != int(expected):
+        raise requests.exceptions.ChunkedEncodingError(
+            f"Respuesta incompleta: {written} de {expected} bytes"
+        )
+    return written
+
+
+def fetch_document(url, previous=None, store=None, session=None, rate_limiter=None, host_slots=None):
+    """
+    Descarga un documento al almacén (o confirma que no cambió).
+
+    Args:
+        url (str): URL del documento
+        previous (dict): Última descarga registrada para esa URL (sha256, etag,
+            last_modified, size_bytes, content_type); si el archivo sigue en el
+            almacén la solicitud es condicional
+        store (DocumentStore): Almacén (por defecto el de DOCUMENTS_DIR)
+
+    Returns:
+        dict: url, status, sha256, size_bytes, content_type, etag, last_modified,
+            http_status y error (si falló)
+    """
+    store = store or DocumentStore()
+    host_slots = host_slots or HostSlots()
+    host = urlparse(url).netloc
+    previous = previous if previous and store.has(previous.get('sha256')) else None
+    result = {'url': url, 'status': STATUS_FAILED, 'sha256': None, 'size_bytes': None, 'content_type': None,
+              'etag': None, 'last_modified': None, 'http_status': None, 'error': None}
+    if previous:
+        # Si falla la revalidación se conserva el último archivo bueno
+        result.update({key: previous.get(key) for key in ('sha256', 'size_bytes', 'content_type', 'etag',
+                                                          'last_modified')})
+
+    # Sin compresión de transporte: los bytes escritos son los del archivo y los
+    # rangos se cuentan sobre él
+    conditional = {'Accept-Encoding': 'identity'}
+    if previous and previous.get('etag'):
+        conditional['If-None-Match'] = previous['etag']
+    elif previous and previous.get('last_modified'):
+        conditional['If-Modified-Since'] = previous['last_modified']
+
+    for _ in range(RESUME_ATTEMPTS):
+        offset, validators = store.load_partial(url)
+        headers = dict(conditional)
+        if offset:
+            headers['Range'] = f"bytes={offset}-"
+            headers['If-Range'] = validators.get('etag') or validators['last_modified']
+        try:
+            with host_slots.acquire(url):
+                response = fetch_stream(url, session=session, rate_limiter=rate_limiter, headers=headers)
+                with response:
+                    result['http_status'] = response.status_code
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+                    # 304, o 200 con el mismo ETag de un servidor que ignora la condición
+                    if response.status_code == 304 or (previous and etag and etag == previous.get('etag')):
+                        if offset:
+                            store.discard_partial(url)
+                        result['status'] = STATUS_NOT_MODIFIED
+                        return result
+
+                    start = _resume_offset(response, offset)
+                    if start is None:
+                        store.discard_partial(url)
+                        result['error'] = "el servidor no respetó el rango pedido"
+                        continue
+                    hasher = hashlib.sha256()
+                    if start:
+                        _hash_file(store.partial_path(url), hasher)
+                    else:
+                        store.save_partial_validators(url, etag, last_modified)
+                    written = _stream_to_store(response, url, store, start, hasher)
+                    metrics.inc('dapper_http_bytes_total', written, host=host)
+
+            sha256 = hasher.hexdigest()
+            store.commit(url, sha256)
+            # Sin validadores útiles el servidor reenvía el archivo; si el hash no
+            # cambió cuenta como sin cambios
+            unchanged = bool(previous) and sha256 == previous.get('sha256')
+            result.update(status=STATUS_NOT_MODIFIED if unchanged else STATUS_DOWNLOADED, sha256=sha256, size_bytes=start + written,
+                          content_type=response.headers.get('Content-Type'), etag=etag,
+                          last_modified=last_modified, error=None)
+            return result
+        except DocumentTooLarge as e:
+            store.discard_partial(url)
+            result['error'] = f"Documento demasiado grande: {e}"
+            return result
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            result['http_status'] = status
+            if status == 416 and offset:
+                # El rango pedido ya no es válido: se descarta lo escrito y se empieza de cero
+                store.discard_partial(url)
+                continue
+            result['error'] = str(e)
+            return result
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            # Lo escrito queda en partial/ y el siguiente intento pide el resto
+            result['error'] = f"{type(e).__name__}: {e}"
+            continue
+        except requests.RequestException as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+            return result
+    return result
+
+
+def plan_downloads(db_manager, limit=None, recheck=False, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Regulaciones cuyo documento hay que descargar: las que no tienen uno registrado,
+    las que cambiaron de enlace y las que fallaron menos de max_attempts veces (con
+    recheck, también las ya descargadas, que se revalidan con una solicitud
+    condicional). Primero las que nunca se descargaron, las más recientes antes.
+
+    Returns:
+        dict: {url: {'regulation_ids': [...], 'previous': dict o None}}
+    """
+    sql = _PLAN_SQL.format(limit="LIMIT %(limit)s" if limit else "")
+    # Sin límite el plan puede cubrir todas las regulaciones: se recorre por bloques
+    rows = db_manager.iter_query(sql, {'max_attempts': max_attempts, 'recheck': bool(recheck), 'limit': limit})
+    plan = {}
+    for regulation_id, url, stored_url, status, sha256, size_bytes, content_type, etag, last_modified in rows:
+        task = plan.setdefault(url, {'regulation_ids': [], 'previous': None})
+        task['regulation_ids'].append(regulation_id)
+        if stored_url == url and sha256 and task['previous'] is None:
+            task['previous'] = {'sha256': sha256, 'size_bytes': size_bytes, 'content_type': content_type,
+                                'etag': etag, 'last_modified': last_modified}
+    return plan
+
+
+def record_results(db_manager, rows):
+    """
+    Guarda (o reemplaza) el resultado de la descarga de cada regulación con COPY a
+    una tabla temporal y un único INSERT ... ON CONFLICT DO UPDATE.
+    """
+    if not rows:
+        return 0
+    df = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    try:
+        columns_sql = db_manager._columns_sql(df.columns)
+        staging_name = db_manager.create_staging_table(DOCUMENTS_TABLE, df.columns)
+        db_manager.copy_dataframe(df, staging_name)
+        with metrics.db_roundtrip('upsert'):
+            db_manager.cursor.execute(_RECORD_SQL.format(columns=columns_sql, staging=staging_name))
+        with metrics.db_roundtrip('commit'):
+            db_manager.connection.commit()
+        return len(df)
+    except Exception as e:
+        db_manager.connection.rollback()
+        raise Exception(f"Error writing into {DOCUMENTS_TABLE}: {str(e)}")
+
+
+def download_documents(db_manager=None, limit=DEFAULT_RUN_LIMIT, recheck=False, workers=DEFAULT_WORKERS,
+                       per_host=DEFAULT_PER_HOST, store=None, session=None, rate_limiter=None):
+    """
+    Descarga los documentos pendientes (ver plan_downloads) en paralelo y registra
+    el resultado de cada regulación en regulation_documents. Un documento que falla
+    no interrumpe a los demás: queda con status 'failed' y se reintenta en las
+    corridas siguientes (hasta DOCUMENTS_MAX_ATTEMPTS veces).
+
+    Returns:
+        dict: cantidad de URLs por estado ('downloaded', 'not_modified', 'failed')
+            y bytes descargados ('bytes')
+    """
+    if db_manager is None:
+        with DatabaseManager() as pooled_manager:
+            return download_documents(pooled_manager, limit, recheck, workers, per_host, store, session,
+                                      rate_limiter)
+
+    store = store or DocumentStore()
+    session = session or get_session()
+    # Los límites propios de las fuentes también aplican a sus documentos
+    rate_limiter = rate_limiter or configure_rate_limits(list_sources())
+    host_slots = HostSlots(per_host)
+    summary = {STATUS_DOWNLOADED: 0, STATUS_NOT_MODIFIED: 0, STATUS_FAILED: 0, 'bytes': 0}
+
+    plan = plan_downloads(db_manager, limit=limit or None, recheck=recheck)
+    # Cierra la transacción de la consulta: las descargas pueden tardar minutos y
+    # la conexión no debe quedar "idle in transaction" mientras tanto
+    db_manager.connection.commit()
+    with metrics.stage('download_documents', rows_in=len(plan)) as download_stage:
+        pending_rows = []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {
+                executor.submit(fetch_document, url, task['previous'], store, session, rate_limiter, host_slots): url
+                for url, task in plan.items()
+            }
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'url': url, 'status': STATUS_FAILED, 'error': f"{type(e).__name__}: {e}"}
+                summary[result['status']] += 1
+                metrics.inc('dapper_documents_total', status=result['status'])
+                if result['status'] == STATUS_DOWNLOADED:
+                    summary['bytes'] += result['size_bytes']
+                checked_at = datetime.now().replace(microsecond=0)
+                for regulation_id in plan[url]['regulation_ids']:
+                    pending_rows.append(dict(result, regulations_id=regulation_id, checked_at=checked_at))
+                if len(pending_rows) >= FLUSH_ROWS:
+                    record_results(db_manager, pending_rows)
+                    pending_rows = []
+        record_results(db_manager, pending_rows)
+        download_stage.rows_out = summary[STATUS_DOWNLOADED] + summary[STATUS_NOT_MODIFIED]
+        download_stage.extra.update(summary)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=DEFAULT_RUN_LIMIT, help="máximo de regulaciones (0 = todas)")
+    parser.add_argument("--recheck", action="store_true", help="revalidar también los documentos ya descargados")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST)
+    parser.add_argument("--dir", default=DOCUMENTS_DIR, help="carpeta del almacén")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = download_documents(limit=args.limit, recheck=args.recheck, workers=args.workers,
+                                 per_host=args.per_host, store=DocumentStore(args.dir))
+    print(f"Documentos: {summary[STATUS_DOWNLOADED]} descargados, {summary[STATUS_NOT_MODIFIED]} sin cambios, "
+          f"{summary[STATUS_FAILED]} con error ({summary['bytes'] / 1024 / 1024:.1f} MiB "
+          f"en {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
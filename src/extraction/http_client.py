@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils import metrics
+
+REQUEST_TIMEOUT = 15
+DEFAULT_POOL_SIZE = int(os.getenv("SCRAPER_POOL_SIZE", "10"))
+DEFAULT_MAX_RETRIES = int(os.getenv("SCRAPER_MAX_RETRIES", "3"))
+DEFAULT_BACKOFF_FACTOR = float(os.getenv("SCRAPER_BACKOFF_FACTOR", "0.5"))
+DEFAULT_REQUESTS_PER_SECOND = float(os.getenv("SCRAPER_REQUESTS_PER_SECOND", "4"))
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_session = None
+_rate_limiter = None
+_lock = threading.Lock()
+
+
+class HostRateLimiter:
+    """
+    Limita la cantidad de solicitudes por segundo hacia cada host.
+    Es seguro para usar desde varios hilos.
+    """
+
+    def __init__(self, requests_per_second=DEFAULT_REQUESTS_PER_SECOND):
+        self.min_interval = self._interval(requests_per_second)
+        self._lock = threading.Lock()
+        self._next_slot = {}
+        self._host_intervals = {}
+
+    @staticmethod
+    def _interval(requests_per_second):
+        if requests_per_second and requests_per_second > 0:
+            return 1.0 / requests_per_second
+        return 0.0
+
+    def set_rate(self, host, requests_per_second):
+        """
+        Define un límite propio para un host (en lugar del límite general).
+        """
+        with self._lock:
+            self._host_intervals[host] = self._interval(requests_per_second)
+
+    def wait(self, url):
+        """
+        Bloquea el hilo actual hasta que haya un turno libre para el host de la URL.
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            min_interval = self._host_intervals.get(host, self.min_interval)
+            if not min_interval:
+                return
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + min_interval
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def build_session(pool_size=DEFAULT_POOL_SIZE, max_retries=DEFAULT_MAX_RETRIES,
+                  backoff_factor=DEFAULT_BACKOFF_FACTOR):
+    """
+    Crea una sesión HTTP con pool de conexiones keep-alive y reintentos con backoff
+    exponencial para errores de conexión y respuestas 429/5xx.
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """
+    Retorna la sesión HTTP compartida del proceso (se crea la primera vez).
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = build_session()
+        return _session
+
+
+def get_rate_limiter():
+    """
+    Retorna el limitador por host compartido del proceso.
+    """
+    global _rate_limiter
+    with _lock:
+        if _rate_limiter is None:
+            _rate_limiter = HostRateLimiter()
+        return _rate_limiter
+
+
+def fetch(url, session=None, rate_limiter=None, timeout=REQUEST_TIMEOUT, headers=None):
+    """
+    Realiza un GET respetando el límite por host y reintentando con backoff.
+
+    Registra la espera del limitador, la latencia (con reintentos), el estado y los
+    bytes recibidos por host (ver utils.metrics).
+
+    Returns:
+        requests.Response: respuesta exitosa (lanza requests.HTTPError si no lo es)
+    """
+    session = session or get_session()
+    rate_limiter = rate_limiter or get_rate_limiter()
+    host = urlparse(url).netloc
+
+    start = time.perf_counter()
+    rate_limiter.wait(url)
+    requested = time.perf_counter()
+    metrics.observe('dapper_http_rate_limit_wait_seconds', requested - start, host=host)
+    try:
+        response = session.get(url, timeout=timeout, headers=headers)
+    except requests.RequestException as e:
+        metrics.inc('dapper_http_requests_total', host=host, status=type(e).__name__)
+        raise
+    finally:
+        metrics.observe('dapper_http_request_seconds', time.perf_counter() - requested, host=host)
+    metrics.inc('dapper_http_requests_total', host=host, status=response.status_code)
+    metrics.inc('dapper_http_bytes_total', len(response.content), host=host)
+    response.raise_for_status()
+    return response
+
+
+def fetch_stream(url, session=None, rate_limiter=None, timeout=REQUEST_TIMEOUT, headers=None):
+    """
+    Como fetch, pero sin leer el cuerpo: la respuesta queda abierta para
+    recorrerla con iter_content y el llamador debe cerrarla (with response: ...).
+    Los bytes recibidos los registra el llamador (dapper_http_bytes_total).
+
+    Returns:
+        requests.Response: respuesta 2xx o 304 (lanza requests.HTTPError si es >= 400)
+    """
+    session = session or get_session()
+    rate_limiter = rate_limiter or get_rate_limiter()
+    host = urlparse(url).netloc
+
+    start = time.perf_counter()
+    rate_limiter.wait(url)
+    requested = time.perf_counter()
+    metrics.observe('dapper_http_rate_limit_wait_seconds', requested - start, host=host)
+    try:
+        response = session.get(url, timeout=timeout, headers=headers, stream=True)
+    except requests.RequestException as e:
+        metrics.inc('dapper_http_requests_total', host=host, status=type(e).__name__)
+        raise
+    finally:
+        metrics.observe('dapper_http_request_seconds', time.perf_counter() - requested, host=host)
+    metrics.inc('dapper_http_requests_total', host=host, status=response.status_code)
+    if response.status_code >= 400:
+        response.close()
+        response.raise_for_status()
+    return response
@@ -0,0 +1,221 @@
+import os
+import threading
+from collections import namedtuple
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+except ImportError:  # lxml es opcional: sin él se usa BeautifulSoup
+    etree = None
+
+PARSER_LXML = "lxml"
+PARSER_BS4 = "bs4"
+
+DEFAULT_PARSER = os.getenv("SCRAPER_PARSER", PARSER_LXML if etree is not None else PARSER_BS4).lower()
+
+# Clases CSS de las celdas del listado de normatividad
+TITLE_CLASS = "views-field-title"
+SUMMARY_CLASS = "views-field-body"
+DATE_CLASS = "views-field-field-fecha--1"
+DATE_SPAN_CLASS = "date-display-single"
+
+# Clases CSS que identifican las celdas de una fila; cada fuente puede definir las suyas
+RowSelectors = namedtuple("RowSelectors", ["title_class", "summary_class", "date_class", "date_span_class"])
+DEFAULT_SELECTORS = RowSelectors(TITLE_CLASS, SUMMARY_CLASS, DATE_CLASS, DATE_SPAN_CLASS)
+
+
+def _empty_raw_row():
+    """
+    Estructura de una fila cruda, común a todos los backends:
+      - title_cell: si la fila tiene celda de título
+      - title / href: texto y href del primer enlace de la celda (None si no hay enlace)
+      - summary: texto de la celda de resumen (None si no existe la celda)
+      - date_raw: atributo content (o texto) del span de fecha, o texto de la celda si no hay span
+      - date_from_span: si date_raw proviene del span de fecha
+    """
+    return {
+        'title_cell': False,
+        'title': None,
+        'href': None,
+        'summary': None,
+        'date_raw': None,
+        'date_from_span': False,
+    }
+
+
+class BeautifulSoupParser:
+    """
+    Backend basado en BeautifulSoup + html.parser (implementación original).
+    """
+
+    name = PARSER_BS4
+
+    def parse(self, content, selectors=DEFAULT_SELECTORS):
+        """
+        Returns:
+            tuple: (raw_rows, has_next); raw_rows es None si la página no tiene tbody
+                y has_next es None si la página no tiene paginador
+        """
+        soup = BeautifulSoup(content, 'html.parser')
+
+        pager = soup.find('ul', class_='pager')
+        has_next = None
+        if pager:
+            next_item = pager.find('li', class_='pager-next')
+            has_next = bool(next_item and next_item.find('a'))
+
+        tbody = soup.find('tbody')
+        if not tbody:
+            return None, has_next
+
+        return [self._parse_row(row, selectors) for row in tbody.find_all('tr')], has_next
+
+    def _parse_row(self, row, selectors):
+        raw = _empty_raw_row()
+
+        title_cell = row.find('td', class_=f'views-field {selectors.title_class}')
+        if title_cell:
+            raw['title_cell'] = True
+            title_link = title_cell.find('a')
+            if title_link:
+                raw['title'] = title_link.get_text(strip=True)
+                raw['href'] = title_link.get('href')
+
+        summary_cell = row.find('td', class_=f'views-field {selectors.summary_class}')
+        if summary_cell:
+            raw['summary'] = summary_cell.get_text(strip=True)
+
+        fecha_cell = row.find('td', class_=f'views-field {selectors.date_class}')
+        if fecha_cell:
+            fecha_span = fecha_cell.find('span', class_=selectors.date_span_class)
+            if fecha_span:
+                raw['date_raw'] = fecha_span.get('content', fecha_span.get_text(strip=True))
+                raw['date_from_span'] = True
+            else:
+                raw['date_raw'] = fecha_cell.get_text(strip=True)
+
+        return raw
+
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+class _CompiledXPaths:
+    """
+    XPath precompilados para el listado. Se crea una instancia por hilo, igual
+    que el HTMLParser, porque los objetos de lxml no deben compartirse entre hilos.
+    """
+
+    def __init__(self, selectors=DEFAULT_SELECTORS):
+        self.parser = etree.HTMLParser(encoding='utf-8')
+        self.rows = etree.XPath("(//tbody)[1]//tr")
+        self.has_tbody = etree.XPath("boolean(//tbody)")
+        self.pager = etree.XPath(f"(//ul[{_has_class('pager')}])[1]")
+        self.pager_next = etree.XPath(f"li[{_has_class('pager-next')}]//a")
+        self.title_cell = etree.XPath(f"(.//td[{_has_class(selectors.title_class)}])[1]")
+        self.first_link = etree.XPath("(.//a)[1]")
+        self.summary_cell = etree.XPath(f"(.//td[{_has_class(selectors.summary_class)}])[1]")
+        self.date_cell = etree.XPath(f"(.//td[{_has_class(selectors.date_class)}])[1]")
+        self.date_span = etree.XPath(f"(.//span[{_has_class(selectors.date_span_class)}])[1]")
+
+
+class LxmlParser:
+    """
+    Backend basado en lxml con expresiones XPath precompiladas.
+    Recorre una sola vez las filas del tbody y extrae todas las celdas de cada fila.
+    """
+
+    name = PARSER_LXML
+
+    def __init__(self):
+        if etree is None:
+            raise ImportError("lxml no está instalado")
+        self._local = threading.local()
+
+    def _compiled(self, selectors):
+        compiled = getattr(self._local, 'compiled', None)
+        if compiled is None:
+            compiled = self._local.compiled = {}
+        if selectors not in compiled:
+            compiled[selectors] = _CompiledXPaths(selectors)
+        return compiled[selectors]
+
+    @staticmethod
+    def _text(element):
+        # Equivalente a get_text(strip=True) de BeautifulSoup
+        return ''.join(text.strip() for text in element.itertext())
+
+    def parse(self, content, selectors=DEFAULT_SELECTORS):
+        """
+        Returns:
+            tuple: (raw_rows, has_next); raw_rows es None si la página no tiene tbody
+                y has_next es None si la página no tiene paginador
+        """
+        xp = self._compiled(selectors)
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        root = etree.fromstring(content, xp.parser) if content else None
+        if root is None:
+            return None, None
+
+        pager = xp.pager(root)
+        has_next = bool(xp.pager_next(pager[0])) if pager else None
+
+        if not xp.has_tbody(root):
+            return None, has_next
+
+        return [self._parse_row(xp, row) for row in xp.rows(root)], has_next
+
+    def _parse_row(self, xp, row):
+        raw = _empty_raw_row()
+
+        title_cell = xp.title_cell(row)
+        if title_cell:
+            raw['title_cell'] = True
+            title_link = xp.first_link(title_cell[0])
+            if title_link:
+                raw['title'] = self._text(title_link[0])
+                raw['href'] = title_link[0].get('href')
+
+        summary_cell = xp.summary_cell(row)
+        if summary_cell:
+            raw['summary'] = self._text(summary_cell[0])
+
+        fecha_cell = xp.date_cell(row)
+        if fecha_cell:
+            fecha_span = xp.date_span(fecha_cell[0])
+            if fecha_span:
+                content = fecha_span[0].get('content')
+                raw['date_raw'] = content if content is not None else self._text(fecha_span[0])
+                raw['date_from_span'] = True
+            else:
+                raw['date_raw'] = self._text(fecha_cell[0])
+
+        return raw
+
+
+_PARSERS = {
+    PARSER_LXML: LxmlParser,
+    PARSER_BS4: BeautifulSoupParser,
+}
+_instances = {}
+_lock = threading.Lock()
+
+
+def get_parser(name=None):
+    """
+    Retorna el backend de parseo indicado (por defecto SCRAPER_PARSER).
+    Si se pide lxml y no está instalado, se usa BeautifulSoup.
+    """
+    name = (name or DEFAULT_PARSER).lower()
+    if name == PARSER_LXML and etree is None:
+        name = PARSER_BS4
+    if name not in _PARSERS:
+        raise ValueError(f"Parser desconocido: {name}. Opciones: {', '.join(_PARSERS)}")
+
+    with _lock:
+        if name not in _instances:
+            _instances[name] = _PARSERS[name]()
+        return _instances[name]
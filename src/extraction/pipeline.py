@@ -0,0 +1,168 @@
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+DEFAULT_FETCH_WORKERS = int(os.getenv("SCRAPER_FETCH_WORKERS", "4"))
+DEFAULT_PARSE_WORKERS = int(os.getenv("SCRAPER_PARSE_WORKERS", str(os.cpu_count() or 1)))
+
+# Tiempo máximo que un hilo espera en la cola antes de revisar si debe detenerse
+_POLL_SECONDS = 0.1
+
+# Los procesos de parseo no se crean con fork: el pool los lanza recién en el primer
+# submit, con los hilos de descarga ya corriendo, y un hijo bifurcado heredaría
+# tomado cualquier lock que uno de ellos tuviera en ese momento (stdout, logging,
+# el pool de urllib3) y se colgaría. forkserver (o spawn donde no existe) parte de
+# un proceso sin esos hilos.
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+def fetch_parse_pipeline(items, fetch_fn, parse_fn, on_parsed=None,
+                         fetch_workers=DEFAULT_FETCH_WORKERS, parse_workers=DEFAULT_PARSE_WORKERS,
+                         max_pending=None):
+    """
+    Pipeline de dos etapas: hilos de I/O descargan y un ProcessPoolExecutor parsea
+    (procesos lanzados con forkserver o spawn, ver _MP_CONTEXT).
+
+    Los hilos de descarga ponen su resultado en una cola acotada (max_pending). Si el
+    parseo se atrasa, la cola se llena y los hilos se bloquean (backpressure). Los
+    resultados se entregan en el mismo orden de items aunque se descarguen y parseen
+    en desorden; para que los que esperan a uno lento no se acumulen, un elemento
+    solo se toma de items si hay menos de max_pending tomados y sin entregar (en
+    descarga, en cola, parseándose o esperando su turno). Así la memoria no crece
+    con el tamaño del archivo aunque una página se demore.
+
+    Args:
+        items (iterable): Elementos a procesar (puede ser infinito, p. ej. itertools.count)
+        fetch_fn (callable): fetch_fn(item) -> (payload, context, ready_result). Se ejecuta
+            en un hilo. Si ready_result no es None se usa directamente sin parsear.
+        parse_fn (callable): parse_fn(payload, item) -> result. Se ejecuta en otro proceso,
+            por lo que debe ser una función de nivel de módulo.
+        on_parsed (callable): on_parsed(item, context, result), en el proceso principal,
+            tras cada parseo (p. ej. para guardar en caché)
+        fetch_workers (int): Hilos de descarga
+        parse_workers (int): Procesos de parseo
+        max_pending (int): Máximo de elementos tomados y aún no entregados
+            (por defecto 2 * parse_workers)
+
+    Yields:
+        tuple: (item, result); result es la excepción si la descarga o el parseo fallaron
+    """
+    fetch_workers = max(1, fetch_workers)
+    parse_workers = max(1, parse_workers)
+    max_pending = max_pending or parse_workers * 2
+
+    raw_queue = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+    source = iter(items)
+    source_lock = threading.Lock()
+    # Se avisa cada vez que se entrega un resultado (se libera un lugar de la ventana)
+    window = threading.Condition(source_lock)
+    state = {'issued': 0, 'delivered': 0, 'exhausted': False}
+
+    def _next_item():
+        with window:
+            while state['issued'] >= state['delivered'] + max_pending:
+                if stop.is_set():
+                    return None, None
+                window.wait(timeout=_POLL_SECONDS)
+            if stop.is_set() or state['exhausted']:
+                return None, None
+            try:
+                item = next(source)
+            except StopIteration:
+                state['exhausted'] = True
+                return None, None
+            seq = state['issued']
+            state['issued'] += 1
+            return seq, item
+
+    def _fetcher():
+        while not stop.is_set():
+            seq, item = _next_item()
+            if seq is None:
+                return
+            try:
+                fetched = (None,) + tuple(fetch_fn(item))
+            except Exception as e:
+                fetched = (e, None, None, None)
+            while not stop.is_set():
+                try:
+                    raw_queue.put((seq, item) + fetched, timeout=_POLL_SECONDS)
+                    break
+                except queue.Full:
+                    continue
+
+    threads = [threading.Thread(target=_fetcher, daemon=True) for _ in range(fetch_workers)]
+    for thread in threads:
+        thread.start()
+
+    pool = ProcessPoolExecutor(max_workers=parse_workers, mp_context=_MP_CONTEXT)
+    pending = {}
+    ready = {}
+    next_seq = 0
+    try:
+        while True:
+            with source_lock:
+                finished = state['exhausted'] and next_seq == state['issued']
+            if finished:
+                return
+
+            # 1) Tomar descargas de la cola mientras haya cupo de parseo
+            got_item = False
+            if len(pending) < max_pending:
+                try:
+                    seq, item, error, payload, context, ready_result = raw_queue.get(
+                        timeout=0 if pending else _POLL_SECONDS
+                    )
+                    got_item = True
+                except queue.Empty:
+                    pass
+                if got_item:
+                    if error is not None:
+                        ready[seq] = (item, error)
+                    elif ready_result is not None:
+                        ready[seq] = (item, ready_result)
+                    else:
+                        future = pool.submit(parse_fn, payload, item)
+                        pending[future] = (seq, item, context)
+
+            # 2) Recoger parseos terminados: bloquea si no hay cupo para más parseos y
+            #    espera un poco si la cola estaba vacía, para no girar en vacío
+            if pending:
+                if len(pending) >= max_pending:
+                    timeout = None
+                else:
+                    timeout = 0 if got_item else _POLL_SECONDS / 5
+                done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    seq, item, context = pending.pop(future)
+                    try:
+                        result = future.result()
+                        if on_parsed is not None:
+                            on_parsed(item, context, result)
+                    except Exception as e:
+                        result = e
+                    ready[seq] = (item, result)
+
+            # 3) Entregar en orden
+            while next_seq in ready:
+                yield ready.pop(next_seq)
+                next_seq += 1
+                with window:
+                    state['delivered'] = next_seq
+                    window.notify_all()
+    finally:
+        stop.set()
+        # Vaciar la cola para liberar a los hilos bloqueados
+        while True:
+            try:
+                raw_queue.get_nowait()
+            except queue.Empty:
+                break
+        for thread in threads:
+            thread.join(timeout=_POLL_SECONDS * 10)
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,71 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from extraction.http_client import get_rate_limiter
+from extraction.scraper import extract_delta
+from extraction.sources import list_sources
+
+# Fuentes que se extraen al mismo tiempo; las descargas de cada una siguen
+# limitadas por host con el HostRateLimiter compartido
+DEFAULT_SOURCE_WORKERS = int(os.getenv("SCRAPER_SOURCE_WORKERS", "4"))
+
+
+def configure_rate_limits(sources, rate_limiter=None):
+    """
+    Aplica al limitador compartido el límite propio de las fuentes que lo definen.
+    """
+    rate_limiter = rate_limiter or get_rate_limiter()
+    for source in sources:
+        if source.requests_per_second is not None:
+            rate_limiter.set_rate(source.host, source.requests_per_second)
+    return rate_limiter
+
+
+def run_sources(fn, sources=None, max_workers=DEFAULT_SOURCE_WORKERS):
+    """
+    Ejecuta fn(source) para cada fuente en un pool de hilos. Todas comparten la
+    sesión HTTP, la caché y el limitador por host, de modo que fuentes del mismo
+    host no superan su límite aunque corran en paralelo.
+
+    Returns:
+        list: (source, result) en el orden de sources; result es la excepción si fn falló
+    """
+    sources = list_sources() if sources is None else sources
+    if not sources:
+        return []
+    configure_rate_limits(sources)
+
+    def _run(source):
+        try:
+            return fn(source)
+        except Exception as e:
+            print(f"Error en la fuente {source.name}: {e}")
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources)))) as executor:
+        return list(zip(sources, executor.map(_run, sources)))
+
+
+def extract_sources_delta(sources=None, concurrency=1, max_workers=DEFAULT_SOURCE_WORKERS, verbose=False):
+    """
+    Extrae el delta (ver scraper.extract_delta) de varias fuentes en paralelo.
+
+    Returns:
+        tuple: (records, watermarks, failed) con los registros de todas las fuentes,
+            los watermarks pendientes de las que terminaron bien y los nombres de las
+            que fallaron
+    """
+    records, watermarks, failed = [], [], []
+    results = run_sources(
+        lambda source: extract_delta(source, concurrency=concurrency, verbose=verbose),
+        sources, max_workers,
+    )
+    for source, result in results:
+        if isinstance(result, Exception):
+            failed.append(source.name)
+            continue
+        source_records, watermark = result
+        records.extend(source_records)
+        watermarks.append(watermark)
+    print(f"Extracción de {len(results)} fuentes: {len(records)} registros, {len(failed)} con error")
+    return records, watermarks, failed
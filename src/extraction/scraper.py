@@ -1,63 +1,60 @@
 from utils.db import DatabaseManager
+from extraction.cache import cached_fetch, get_cache
+from extraction.http_client import DEFAULT_POOL_SIZE, HostRateLimiter, build_session, fetch, get_rate_limiter, get_session
+from extraction.parsers import get_parser
+from extraction.pipeline import fetch_parse_pipeline
+from extraction.sources import ANI, get_source
+from extraction.text import clean_quotes
+from extraction.watermark import WatermarkStore, advance_watermark
+from utils import metrics
+from utils.dates import to_date
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import contextlib
+import functools
+import hashlib
+import itertools
+import os
+import time
 import requests
-from bs4 import BeautifulSoup
-import re
-
-ENTITY_VALUE = 'Agencia Nacional de Infraestructura'
-URL_BASE = "https://www.ani.gov.co/informacion-de-la-ani/normatividad?field_tipos_de_normas__tid=12&title=&body_value=&field_fecha__value%5Bvalue%5D%5Byear%5D="
-FIXED_CLASSIFICATION_ID = 13
-# Clasificaciones de documentos
-CLASSIFICATION_KEYWORDS = {
-    'resolución': 15,
-    'resolucion': 15,
-    'decreto': 14,
-}
-
-DEFAULT_RTYPE_ID = 14
-
-# Función eliminar comillas
-def clean_quotes(text):
-    if not text:
-        return text
-    quotes_map = {
-        '\u201C': '', '\u2018': '', '\u2019': '', '\u00AB': '', '\u00BB': '',
-        '\u201E': '', '\u201A': '', '\u2039': '', '\u203A': '', '"': '',
-        "'": '', '´': '', '`': '', '′': '', '″': '',
-    }
-    cleaned_text = text
-    for quote_char, replacement in quotes_map.items():
-        cleaned_text = cleaned_text.replace(quote_char, replacement)
-    quotes_pattern = r'["\'\u201C\u201D\u2018\u2019\u00AB\u00BB\u201E\u201A\u2039\u203A\u2032\u2033]'
-    cleaned_text = re.sub(quotes_pattern, '', cleaned_text)
-    cleaned_text = cleaned_text.strip()
-    cleaned_text = ' '.join(cleaned_text.split())
-    return cleaned_text
-
-def normalize_datetime(dt):
-    """
-    Normaliza un datetime para quitar información de timezone.
-    """
-    if dt is None:
-        return None
-    
-    # Si es un datetime con timezone, convertir a naive
-    if hasattr(dt, 'tzinfo') and dt.tzinfo is not None:
-        dt = dt.replace(tzinfo=None)
-    
-    return dt
 
-def get_rtype_id(title):
+# Fuente por defecto (ANI); URL, selectores y clasificación de cada entidad se
+# definen en extraction.sources
+ENTITY_VALUE = ANI.entity
+URL_BASE = ANI.listing_url
+
+# Cantidad de páginas que se descargan en paralelo por defecto
+DEFAULT_CONCURRENCY = 4
+
+# Backfill por shards: primer año del archivo y páginas por shard en modo por páginas
+BACKFILL_START_YEAR = int(os.getenv("SCRAPER_BACKFILL_START_YEAR", "2011"))
+DEFAULT_PAGES_PER_SHARD = 10
+
+# Clasificador de la fuente por defecto: get_rtype_id sin fuente no pasa por el registro
+_DEFAULT_CLASSIFIER = ANI.classifier
+
+
+class PageError(Exception):
     """
-    Obtiene el rtype_id basado en el título del documento.
+    Una página del listado no se pudo descargar o parsear: el recorrido quedó
+    incompleto y no debe tratarse como el final del listado.
     """
-    title_lower = title.lower()
-    
-    for keyword, rtype_id in CLASSIFICATION_KEYWORDS.items():
-        if keyword in title_lower:
-            return rtype_id
-    
-    return DEFAULT_RTYPE_ID
+
+
+def get_rtype_id(title, source=None):
+    """
+    Obtiene el rtype_id basado en el título del documento (según la fuente, por defecto ANI).
+    """
+    if source is None:
+        return _DEFAULT_CLASSIFIER.classify(title)
+    return get_source(source).get_rtype_id(title)
+
+
+def get_rtype_ids(titles, source=None):
+    """
+    get_rtype_id para una Series de títulos completa (ver KeywordClassifier.classify_series).
+    """
+    return get_source(source).get_rtype_id_series(titles)
 
 
 # Validar el campo created_at
@@ -71,31 +68,29 @@ def is_valid_created_at(created_at_value):
     return False
 
 
-def extract_title_and_link(row, norma_data, verbose, row_num):
+def extract_title_and_link(raw_row, norma_data, verbose, row_num, source=ANI):
     """
-    Extrae título y enlace de una fila
+    Extrae título y enlace de una fila cruda (ver extraction.parsers)
     
     Returns:
         bool: True si se extrajo correctamente, False si debe saltarse
     """
-    title_cell = row.find('td', class_='views-field views-field-title')
-    if not title_cell:
+    if not raw_row['title_cell']:
         if verbose:
             print(f"No se encontró celda de título en la fila {row_num}. Saltando.")
         return False
     
-    title_link = title_cell.find('a')
-    if not title_link:
+    if raw_row['title'] is None:
         if verbose:
             print(f"No se encontró enlace en la fila {row_num}. Saltando.")
         return False
     
     # Procesar título
-    raw_title = title_link.get_text(strip=True)
+    raw_title = raw_row['title']
     cleaned_title = clean_quotes(raw_title)
     
     # Validar longitud del título
-    if len(cleaned_title) > 65:
+    if len(cleaned_title) > source.max_title_length:
         if verbose:
             print(f"Saltando norma con título demasiado largo: '{cleaned_title}' (longitud: {len(cleaned_title)})")
         return False
@@ -103,9 +98,9 @@ def extract_title_and_link(row, norma_data, verbose, row_num):
     norma_data['title'] = cleaned_title
     
     # Procesar enlace
-    external_link = title_link.get('href')
+    external_link = raw_row['href']
     if external_link and not external_link.startswith('http'):
-        external_link = 'https://www.ani.gov.co' + external_link
+        external_link = source.link_base + external_link
     
     norma_data['external_link'] = external_link
     norma_data['gtype'] = 'link' if external_link else None
@@ -118,44 +113,29 @@ def extract_title_and_link(row, norma_data, verbose, row_num):
     
     return True
 
-def extract_summary(row, norma_data):
+def extract_summary(raw_row, norma_data):
     """
-    Extrae el resumen/descripción de una fila
+    Extrae el resumen/descripción de una fila cruda
     """
-    summary_cell = row.find('td', class_='views-field views-field-body')
-    if summary_cell:
-        raw_summary = summary_cell.get_text(strip=True)
+    raw_summary = raw_row['summary']
+    if raw_summary is not None:
         cleaned_summary = clean_quotes(raw_summary)
         formatted_summary = cleaned_summary.capitalize()
         norma_data['summary'] = formatted_summary
     else:
         norma_data['summary'] = None
 
-def extract_creation_date(row, norma_data, verbose, row_num):
+def extract_creation_date(raw_row, norma_data, verbose, row_num, source=ANI):
     """
-    Extrae la fecha de creación de una fila
+    Extrae la fecha de creación de una fila cruda
     
     Returns:
         bool: True si se extrajo correctamente, False si debe saltarse
     """
-    fecha_cell = row.find('td', class_='views-field views-field-field-fecha--1')
-    if fecha_cell:
-        fecha_span = fecha_cell.find('span', class_='date-display-single')
-        if fecha_span:
-            created_at_raw = fecha_span.get('content', fecha_span.get_text(strip=True))
-            # Procesar diferentes formatos de fecha
-            if 'T' in created_at_raw:
-                norma_data['created_at'] = created_at_raw.split('T')[0]
-            elif '/' in created_at_raw:
-                try:
-                    day, month, year = created_at_raw.split('/')
-                    norma_data['created_at'] = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-                except:
-                    norma_data['created_at'] = created_at_raw
-            else:
-                norma_data['created_at'] = created_at_raw
-        else:
-            norma_data['created_at'] = fecha_cell.get_text(strip=True)
+    if raw_row['date_raw'] is not None:
+        # Atributo content del span (ISO) o texto de la celda: ISO o los formatos
+        # de la fuente, normalizados a 'YYYY-MM-DD' (ver utils.dates)
+        norma_data['created_at'] = source.parse_date(raw_row['date_raw'])
     else:
         norma_data['created_at'] = None
     
@@ -167,6 +147,39 @@ def extract_creation_date(row, norma_data, verbose, row_num):
     
     return True
 
+def get_latest_created_at(entity=ENTITY_VALUE):
+    """
+    Obtiene la fecha de creación más reciente guardada en la base de datos para una entidad.
+    
+    Returns:
+        date: fecha más reciente o None si no hay registros
+    
+    Raises:
+        Exception: si no es posible conectarse a la base de datos
+    """
+    db_manager = DatabaseManager()
+    if not db_manager.connect():
+        raise Exception("Error conectando a la base de datos")
+    
+    try:
+        query = "SELECT MAX(created_at) FROM regulations WHERE entity = %s"
+        result = db_manager.execute_query(query, (entity,))
+    finally:
+        db_manager.close()
+    
+    if not result:
+        return None
+    # TIMESTAMP (datetime) o texto según el driver; se compara por día
+    return to_date(result[0][0])
+
+
+def _record_date(record):
+    """
+    Retorna la fecha (date) de created_at de un registro scrapeado, o None si no se puede leer.
+    """
+    return to_date(record.get('created_at'))
+
+
 def check_for_new_content(num_pages_to_check=3):
     """
     Verifica si hay contenido nuevo en las primeras páginas.
@@ -175,155 +188,553 @@ def check_for_new_content(num_pages_to_check=3):
     print(f"Verificando contenido nuevo en las primeras {num_pages_to_check} páginas...")
     
     try:
-        # Conectar a la base de datos para obtener la fecha más reciente
-        db_manager = DatabaseManager()
-        if not db_manager.connect():
-            print("Error conectando a la base de datos para verificación")
-            return True  # En caso de error, proceder con el scraping
-        
-        # Obtener la fecha de creación más reciente en la base de datos
-        query = "SELECT MAX(created_at) FROM dapper_regulations_regulations WHERE entity = %s"
-        result = db_manager.execute_query(query, (ENTITY_VALUE,))
-        
-        latest_db_date = None
-        if result and result[0][0]:
-            latest_db_date = result[0][0]
-            
-            # Normalizar fecha de la base de datos
-            if isinstance(latest_db_date, str):
-                try:
-                    latest_db_date = datetime.strptime(latest_db_date, '%Y-%m-%d %H:%M:%S')
-                except:
-                    try:
-                        latest_db_date = datetime.strptime(latest_db_date.split()[0], '%Y-%m-%d')
-                    except:
-                        latest_db_date = None
-            
-            # Normalizar datetime (quitar timezone info)
-            latest_db_date = normalize_datetime(latest_db_date)
-        
-        db_manager.close()
-        
-        print(f"Fecha más reciente en BD: {latest_db_date}")
-        
-        # Verificar las primeras páginas en busca de contenido más reciente
-        for page_num in range(num_pages_to_check):
-            try:
-                page_data = scrape_page(page_num, verbose=False)
-                
-                for record in page_data:
-                    created_at_val = record.get('created_at')
-                    
-                    if created_at_val and is_valid_created_at(created_at_val):
-                        web_date = None
-                        try:
-                            web_date = datetime.strptime(created_at_val, '%Y-%m-%d %H:%M:%S')
-                        except:
-                            try:
-                                web_date = datetime.strptime(created_at_val.split()[0], '%Y-%m-%d')
-                            except:
-                                continue
-                        
-                        # Normalizar fecha web (quitar timezone info)
-                        web_date = normalize_datetime(web_date)
-                        
-                        # Si encontramos contenido más reciente que el de la base de datos
-                        if not latest_db_date or web_date > latest_db_date:
-                            print(f"Nuevo contenido detectado - Fecha web: {web_date}, Fecha BD: {latest_db_date}")
-                            return True
-                
-            except Exception as e:
-                print(f"Error verificando página {page_num}: {e}")
-                continue
-        
-        print("No se detectó contenido nuevo")
-        return False
-        
+        latest_db_date = get_latest_created_at()
     except Exception as e:
         print(f"Error en verificación de contenido nuevo: {e}")
         return True  # En caso de error, proceder con el scraping
+    
+    print(f"Fecha más reciente en BD: {latest_db_date}")
+    
+    # El listado se detiene solo al encontrar registros anteriores a la fecha de la BD
+    try:
+        for record in iter_regulations(since=latest_db_date, max_pages=num_pages_to_check):
+            web_date = _record_date(record)
+            if web_date and (not latest_db_date or web_date > latest_db_date):
+                print(f"Nuevo contenido detectado - Fecha web: {web_date}, Fecha BD: {latest_db_date}")
+                return True
+    except PageError as e:
+        print(f"Error en verificación de contenido nuevo: {e}")
+        return True  # En caso de error, proceder con el scraping
+    
+    print("No se detectó contenido nuevo")
+    return False
 
 
-def scrape_page(page_num, verbose=False):
+def build_page_url(page_num, year=None, source=None):
+    """
+    Construye la URL de una página del listado de la fuente (por defecto ANI),
+    opcionalmente filtrado por el año de la norma (en ANI, el parámetro
+    field_fecha__value[value][year])
     """
-    Scrapea una página específica de ANI
+    return get_source(source).build_page_url(page_num, year)
+
+
+def parse_page(content, page_num, verbose=False, parser=None, source=None):
+    """
+    Parsea el HTML de una página del listado de una fuente (por defecto ANI)
     
     Args:
-        page_num (int): Número de página a scrapear
+        content (bytes): HTML de la página
+        page_num (int): Número de página (solo para logs)
         verbose (bool): Si mostrar logs detallados
+        parser (str): Backend de parseo ('lxml' o 'bs4'; por defecto SCRAPER_PARSER)
+        source (SourceAdapter|str): Fuente del listado (ver extraction.sources)
     
     Returns:
-        list: Lista de diccionarios con los datos extraídos
+        tuple: (page_data, has_next) con la lista de registros extraídos y si
+            el listado continúa después de esta página
     """
-    # Construir URL de la página
-    if page_num == 0:
-        page_url = URL_BASE
-    else:
-        page_url = f"{URL_BASE}&page={page_num}"
+    source = get_source(source)
+    rows, has_next = get_parser(parser).parse(content, source.selectors)
+    
+    if rows is None:
+        if verbose:
+            print(f"No se encontró tabla en página {page_num}")
+        return [], False
+    
+    if verbose:
+        print(f"Encontradas {len(rows)} filas en página {page_num}")
+    
+    if not rows:
+        return [], False
+    
+    # Sin paginador se asume que el listado continúa hasta encontrar un tbody vacío
+    if has_next is None:
+        has_next = True
+    
+    # Procesar filas
+    update_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    page_data = []
+    for i, row in enumerate(rows, 1):
+        try:
+            # Estructura base del registro
+            norma_data = {
+                'created_at': None,
+                'update_at': update_at,
+                'is_active': True,
+                'title': None,
+                'gtype': None,
+                'entity': source.entity,
+                'external_link': None,
+                'rtype_id': None,
+                'summary': None,
+                'classification_id': source.classification_id,
+            }
+            
+            # Extraer datos
+            if not extract_title_and_link(row, norma_data, verbose, i, source):
+                continue
+            
+            extract_summary(row, norma_data)
+            
+            if not extract_creation_date(row, norma_data, verbose, i, source):
+                continue
+            
+            # Establecer rtype_id basado en título
+            norma_data['rtype_id'] = source.get_rtype_id(norma_data['title'])
+            
+            page_data.append(norma_data)
+            
+        except Exception as e:
+            if verbose:
+                print(f"Error procesando fila {i} en página {page_num}: {str(e)}")
+            continue
+    
+    return page_data, has_next
+
+
+def _timed_parse_page(content, page_num, verbose=False, source=None):
+    """
+    parse_page que además retorna su duración, para medirla también cuando el
+    parseo corre en otro proceso (ver extraction.pipeline).
+
+    Returns:
+        tuple: ((page_data, has_next), segundos)
+    """
+    start = time.perf_counter()
+    result = parse_page(content, page_num, verbose, source=source)
+    return result, time.perf_counter() - start
+
+
+def _record_parse(source, seconds, page_data):
+    metrics.observe('dapper_parse_seconds', seconds, source=source.name)
+    metrics.inc('dapper_parse_rows_total', len(page_data), source=source.name)
+
+
+def _fetch_listing_page(page_num, verbose=False, session=None, rate_limiter=None, year=None, source=None):
+    """
+    Descarga una página del listado (a través de la caché si está habilitada).
+    
+    Returns:
+        tuple: (content, content_hash, cached_result); cached_result trae
+            (page_data, has_next) cuando la página no cambió y su parseo está en caché
+    """
+    page_url = build_page_url(page_num, year, source)
     
     if verbose:
         print(f"Scrapeando página {page_num}: {page_url}")
     
+    cache = get_cache()
+    if cache is None:
+        # Realizar solicitud HTTP (con keep-alive, límite por host y reintentos)
+        response = fetch(page_url, session=session, rate_limiter=rate_limiter)
+        return response.content, hashlib.sha256(response.content).hexdigest(), None
+    
+    # Solicitud a través de la caché (GET condicional / TTL / replay)
+    content, content_hash, changed = cached_fetch(page_url, cache, session, rate_limiter)
+    if not changed:
+        cached_result = cache.load_records(page_url, content_hash)
+        if cached_result is not None:
+            # Contenido sin cambios: se reutiliza el parseo anterior
+            if verbose:
+                print(f"Página {page_num} sin cambios, usando resultado en caché")
+            page_data, has_next = cached_result
+            update_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for norma_data in page_data:
+                norma_data['update_at'] = update_at
+            return content, content_hash, (page_data, has_next)
+    
+    return content, content_hash, None
+
+
+def _store_parsed_page(page_num, content_hash, result, year=None, source=None):
+    """
+    Guarda en caché el resultado del parseo de una página.
+    """
+    cache = get_cache()
+    if cache is not None and content_hash is not None:
+        page_data, has_next = result
+        cache.store_records(build_page_url(page_num, year, source), content_hash, [page_data, has_next])
+
+
+def _scrape_listing_page(page_num, verbose=False, session=None, rate_limiter=None, year=None, source=None):
+    """
+    Descarga y parsea una página del listado.
+    
+    Returns:
+        tuple: (page_data, has_next, content_hash, error); ante errores retorna
+            ([], False, None, excepción) y error es None si la página se procesó
+    """
+    source = get_source(source)
     try:
-        # Realizar solicitud HTTP
-        response = requests.get(page_url, timeout=15)
-        response.raise_for_status()
+        content, content_hash, cached_result = _fetch_listing_page(
+            page_num, verbose, session, rate_limiter, year, source
+        )
+        if cached_result is not None:
+            metrics.inc('dapper_scrape_pages_total', source=source.name, result='cached')
+            return cached_result + (content_hash, None)
         
-        # Parsear HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
-        tbody = soup.find('tbody')
+        result, seconds = _timed_parse_page(content, page_num, verbose, source)
+        _record_parse(source, seconds, result[0])
+        _store_parsed_page(page_num, content_hash, result, year, source)
+        metrics.inc('dapper_scrape_pages_total', source=source.name, result='parsed')
+        return result + (content_hash, None)
         
-        if not tbody:
-            if verbose:
-                print(f"No se encontró tabla en página {page_num}")
-            return []
+    except requests.RequestException as e:
+        metrics.inc('dapper_scrape_pages_total', source=source.name, result='http_error')
+        print(f"Error HTTP en página {page_num}: {e}")
+        return [], False, None, e
+    except Exception as e:
+        metrics.inc('dapper_scrape_pages_total', source=source.name, result='error')
+        print(f"Error procesando página {page_num}: {e}")
+        return [], False, None, e
+
+
+@contextlib.contextmanager
+def _listing_session(concurrency):
+    """
+    Sesión HTTP para descargar 'concurrency' páginas a la vez: la compartida si su
+    pool alcanza, o una con un pool de ese tamaño que se cierra al salir.
+    """
+    if concurrency <= DEFAULT_POOL_SIZE:
+        yield get_session()
+        return
+    with build_session(pool_size=concurrency) as session:
+        yield session
+
+
+def _iter_listing_pages(pages, concurrency=1, verbose=False, parse_workers=None, rate_limiter=None, year=None,
+                        source=None):
+    """
+    Descarga y parsea páginas del listado entregándolas en orden.
+    
+    Sin parse_workers, las páginas se descargan y parsean en hilos, de a
+    'concurrency' páginas por vez. Con parse_workers, la descarga (hilos) y el
+    parseo (procesos) se separan en el pipeline de extraction.pipeline.
+    
+    Yields:
+        tuple: (page_num, page_data, has_next, content_hash, error); error es la
+            excepción si la página no se pudo descargar o parsear (con page_data vacío)
+    """
+    concurrency = max(1, concurrency)
+    rate_limiter = rate_limiter or get_rate_limiter()
+    source = get_source(source)
+    
+    with _listing_session(concurrency) as session:
+        if parse_workers:
+            # Los hilos de descarga anotan el hash de cada página para entregarlo junto al parseo
+            content_hashes = {}
         
-        rows = tbody.find_all('tr')
-        if verbose:
-            print(f"Encontradas {len(rows)} filas en página {page_num}")
+            def _fetch(page_num):
+                content, content_hash, cached_result = _fetch_listing_page(
+                    page_num, verbose, session, rate_limiter, year, source
+                )
+                content_hashes[page_num] = content_hash
+                # Mismo formato que _timed_parse_page, sin duración (no hubo parseo)
+                return content, content_hash, (cached_result, None) if cached_result is not None else None
         
-        # Procesar filas
-        page_data = []
-        for i, row in enumerate(rows, 1):
+            def _on_parsed(page_num, content_hash, timed_result):
+                result, seconds = timed_result
+                _record_parse(source, seconds, result[0])
+                _store_parsed_page(page_num, content_hash, result, year, source)
+        
+            # Cada resultado llega como ((page_data, has_next), segundos de parseo), con
+            # segundos None si la página salió de la caché
+            results = fetch_parse_pipeline(
+                pages, _fetch, functools.partial(_timed_parse_page, source=source), on_parsed=_on_parsed,
+                fetch_workers=concurrency, parse_workers=parse_workers,
+            )
             try:
-                # Estructura base del registro
-                norma_data = {
-                    'created_at': None,
-                    'update_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'is_active': True,
-                    'title': None,
-                    'gtype': None,
-                    'entity': ENTITY_VALUE,
-                    'external_link': None,
-                    'rtype_id': None,
-                    'summary': None,
-                    'classification_id': FIXED_CLASSIFICATION_ID,
-                }
-                
-                # Extraer datos
-                if not extract_title_and_link(row, norma_data, verbose, i):
-                    continue
-                
-                extract_summary(row, norma_data)
-                
-                if not extract_creation_date(row, norma_data, verbose, i):
+                for page_num, result in results:
+                    error = None
+                    if isinstance(result, requests.RequestException):
+                        metrics.inc('dapper_scrape_pages_total', source=source.name, result='http_error')
+                        print(f"Error HTTP en página {page_num}: {result}")
+                        error, result = result, ([], False)
+                    elif isinstance(result, Exception):
+                        metrics.inc('dapper_scrape_pages_total', source=source.name, result='error')
+                        print(f"Error procesando página {page_num}: {result}")
+                        error, result = result, ([], False)
+                    else:
+                        result, seconds = result
+                        page_result = 'cached' if seconds is None else 'parsed'
+                        metrics.inc('dapper_scrape_pages_total', source=source.name, result=page_result)
+                    page_data, has_next = result
+                    yield page_num, page_data, has_next, content_hashes.pop(page_num, None), error
+            finally:
+                results.close()
+            return
+    
+        def _scrape(page_num):
+            return _scrape_listing_page(page_num, verbose, session, rate_limiter, year, source)
+    
+        pages = iter(pages)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # La primera página se descarga sola: en corridas incrementales suele ser
+            # la única necesaria y así no se piden páginas por adelantado
+            window_size = 1
+            while True:
+                window = list(itertools.islice(pages, window_size))
+                window_size = concurrency
+                if not window:
+                    return
+                # executor.map conserva el orden de las páginas
+                for page_num, page_result in zip(window, executor.map(_scrape, window)):
+                    yield (page_num,) + page_result
+
+
+def scrape_page(page_num, verbose=False, session=None, rate_limiter=None, source=None):
+    """
+    Scrapea una página específica del listado de una fuente (por defecto ANI)
+    
+    Args:
+        page_num (int): Número de página a scrapear
+        verbose (bool): Si mostrar logs detallados
+        session (requests.Session): Sesión HTTP a reutilizar (por defecto la compartida)
+        rate_limiter (HostRateLimiter): Limitador por host (por defecto el compartido)
+        source (SourceAdapter|str): Fuente del listado (ver extraction.sources)
+    
+    Returns:
+        list: Lista de diccionarios con los datos extraídos
+    """
+    source = get_source(source)
+    with metrics.stage('scrape_page', log=False, source=source.name) as page_stage:
+        page_data, _, _, _ = _scrape_listing_page(page_num, verbose, session, rate_limiter, source=source)
+        page_stage.rows_out = len(page_data)
+    return page_data
+
+
+def iter_regulations(start_page=0, since=None, max_pages=None, concurrency=1, verbose=False,
+                     parse_workers=None, stop_at_link=None, page_hashes=None, known_page_hashes=None, year=None,
+                     source=None):
+    """
+    Recorre el listado de una fuente (por defecto ANI) página por página y entrega los registros a medida
+    que se parsean, sin mantener todo el archivo en memoria.
+    
+    El recorrido termina cuando el paginador indica que no hay página siguiente,
+    cuando una página llega sin filas, al alcanzar max_pages, (si se indica since)
+    al terminar una página que contiene registros anteriores a esa fecha, (si se
+    indica stop_at_link) al llegar al registro con ese enlace, o (si se indica
+    known_page_hashes) al llegar a una página idéntica a la de la corrida anterior.
+    
+    Si una página no se puede descargar o parsear se lanza PageError, después de
+    entregar los registros de las páginas anteriores: el recorrido quedó
+    incompleto y el watermark no debe avanzar.
+    
+    Args:
+        start_page (int): Primera página a recorrer
+        since (datetime|date): Fecha más reciente ya guardada; se omiten los registros
+            anteriores a ella y se detiene el recorrido al encontrarlos
+        max_pages (int): Máximo de páginas a recorrer (None = sin límite)
+        concurrency (int): Páginas que se descargan por adelantado en paralelo
+        verbose (bool): Si mostrar logs detallados
+        parse_workers (int): Si se indica, el parseo corre en ese número de procesos
+            separado de la descarga (recomendado para backfills completos)
+        stop_at_link (str): external_link del registro más reciente ya extraído; ni
+            él ni los registros que le siguen se entregan
+        page_hashes (dict): si se indica, se completa con {page_num: content_hash}
+            de cada página recorrida
+        known_page_hashes (dict): {"page_num": content_hash} de la corrida anterior
+            (watermark['page_hashes']). Los registros nuevos aparecen al inicio del
+            listado y desplazan a los demás, así que una página con el mismo hash
+            no tiene registros nuevos y tampoco las siguientes: no se entregan
+        year (int): Si se indica, recorre solo el listado filtrado por ese año
+        source (SourceAdapter|str): Fuente del listado (ver extraction.sources)
+    
+    Yields:
+        dict: registro con la misma estructura que retorna scrape_page
+    """
+    since = to_date(since)
+    
+    if max_pages is None:
+        pages = itertools.count(start_page)
+    else:
+        pages = range(start_page, start_page + max_pages)
+    
+    page_results = _iter_listing_pages(pages, concurrency, verbose, parse_workers, year=year, source=source)
+    try:
+        for current_page, page_data, has_next, content_hash, error in page_results:
+            if error is not None:
+                raise PageError(f"Página {current_page} de {get_source(source).name}: {error}") from error
+            if page_hashes is not None:
+                page_hashes[current_page] = content_hash
+            if known_page_hashes and content_hash and known_page_hashes.get(str(current_page)) == content_hash:
+                if verbose:
+                    print(f"Página {current_page}: sin cambios desde la corrida anterior")
+                return
+            reached_known = False
+            
+            for record in page_data:
+                if stop_at_link and record.get('external_link') == stop_at_link:
+                    if verbose:
+                        print(f"Página {current_page}: se alcanzó el último registro extraído")
+                    return
+                record_date = _record_date(record)
+                if since is not None and record_date is not None and record_date < since:
+                    reached_known = True
                     continue
-                
-                # Establecer rtype_id basado en título
-                norma_data['rtype_id'] = get_rtype_id(norma_data['title'])
-                
-                page_data.append(norma_data)
-                
-            except Exception as e:
+                yield record
+            
+            if reached_known:
                 if verbose:
-                    print(f"Error procesando fila {i} en página {page_num}: {str(e)}")
-                continue
-        
-        return page_data
-        
-    except requests.RequestException as e:
-        print(f"Error HTTP en página {page_num}: {e}")
-        return []
-    except Exception as e:
-        print(f"Error procesando página {page_num}: {e}")
+                    print(f"Página {current_page}: se alcanzaron registros ya conocidos (anteriores a {since})")
+                return
+            if not has_next:
+                if verbose:
+                    print(f"Página {current_page}: fin del listado")
+                return
+    finally:
+        page_results.close()
+
+
+def delta_start(source=None, store=None):
+    """
+    Punto de partida del delta de una fuente: el watermark guardado para su
+    entidad y listado o, si no hay, MAX(created_at) de la base de datos.
+
+    Returns:
+        tuple: (watermark o None, since, stop_at_link) para iter_regulations
+    """
+    source = get_source(source)
+    entity, listing_url = source.entity, source.listing_url
+    store = store or WatermarkStore()
+    watermark = store.load(entity, listing_url)
+    if watermark is None:
+        since = get_latest_created_at(entity)
+        print(f"Sin watermark para {entity}; se parte de la fecha en BD: {since}")
+        return None, since, None
+    print(f"Watermark de {entity}: {watermark['last_created_at']} (último enlace: {watermark['top_link']})")
+    return watermark, watermark['last_created_at'], watermark['top_link']
+
+
+def extract_delta(source=None, store=None, concurrency=1, verbose=False, parse_workers=None):
+    """
+    Extrae solo los registros nuevos de una fuente (por defecto ANI) desde el
+    watermark guardado para su entidad y listado. El recorrido se detiene al llegar al registro más reciente de la
+    corrida anterior (top_link) o a una página con el mismo hash que en esa corrida,
+    por lo que una corrida sin cambios cuesta una solicitud HTTP y una búsqueda por
+    clave en extraction_watermarks. Sin watermark previo se parte de MAX(created_at)
+    de la base de datos.
+    
+    El watermark nuevo no se guarda aquí: debe guardarse con WatermarkStore.save
+    después de escribir los registros en la base de datos. Si una página falla,
+    PageError se propaga sin calcular watermark: los registros nuevos de esa
+    página y las siguientes se vuelven a buscar en la próxima corrida.
+    
+    Returns:
+        tuple: (records, pending_watermark)
+    """
+    source = get_source(source)
+    watermark, since, stop_at_link = delta_start(source, store)
+    
+    page_hashes = {}
+    with metrics.stage('extract_delta', source=source.name) as delta_stage:
+        records = list(iter_regulations(
+            since=since, concurrency=concurrency, verbose=verbose, parse_workers=parse_workers,
+            stop_at_link=stop_at_link, page_hashes=page_hashes,
+            known_page_hashes=(watermark or {}).get('page_hashes'), source=source,
+        ))
+        delta_stage.rows_out = len(records)
+        delta_stage.extra['pages'] = len(page_hashes)
+    return records, advance_watermark(watermark, source.entity, source.listing_url, records, page_hashes)
+
+
+def plan_backfill_shards(years=None, total_pages=None, pages_per_shard=DEFAULT_PAGES_PER_SHARD, source=None):
+    """
+    Divide el archivo de una fuente (por defecto ANI) en shards independientes para
+    recorrerlos en paralelo.
+    
+    Por defecto hay un shard por año (de BACKFILL_START_YEAR al año actual, del más
+    reciente al más antiguo), usando el filtro por año del listado. Si se indica
+    total_pages, el listado sin filtro se divide en rangos de pages_per_shard páginas.
+    
+    Returns:
+        list: shards como dict, p. ej. {'source': 'ani', 'year': 2024} o
+            {'source': 'ani', 'start_page': 0, 'max_pages': 10}
+    """
+    source_name = get_source(source).name
+    if total_pages is not None:
+        pages_per_shard = max(1, pages_per_shard)
+        return [
+            {'source': source_name, 'start_page': start, 'max_pages': min(pages_per_shard, total_pages - start)}
+            for start in range(0, total_pages, pages_per_shard)
+        ]
+    if years is None:
+        years = range(datetime.now().year, BACKFILL_START_YEAR - 1, -1)
+    return [{'source': source_name, 'year': int(year)} for year in years]
+
+
+def shard_label(shard):
+    """
+    Nombre corto de un shard para logs y artefactos (ani_year_2024, ani_pages_0_10).
+    """
+    prefix = f"{shard.get('source') or ANI.name}_"
+    if shard.get('year') is not None:
+        return f"{prefix}year_{shard['year']}"
+    start = shard.get('start_page', 0)
+    if shard.get('max_pages'):
+        return f"{prefix}pages_{start}_{start + shard['max_pages']}"
+    return f"{prefix}pages_{start}_end"
+
+
+def scrape_shard(shard, concurrency=1, verbose=False, parse_workers=None):
+    """
+    Recorre completo un shard de plan_backfill_shards.
+    
+    Returns:
+        list: registros del shard
+    """
+    with metrics.stage('scrape_shard', shard=shard_label(shard)) as shard_stage:
+        records = list(iter_regulations(
+            start_page=shard.get('start_page', 0), max_pages=shard.get('max_pages'), year=shard.get('year'),
+            concurrency=concurrency, verbose=verbose, parse_workers=parse_workers, source=shard.get('source'),
+        ))
+        shard_stage.rows_out = len(records)
+    return records
+
+
+def scrape_pages(page_range, concurrency=DEFAULT_CONCURRENCY, verbose=False, requests_per_second=None,
+                 parse_workers=None, source=None):
+    """
+    Scrapea varias páginas de una fuente (por defecto ANI) en paralelo reutilizando un pool de conexiones
+    keep-alive. Los resultados se retornan en el mismo orden de page_range.
+    
+    Args:
+        page_range (iterable): Números de página a scrapear
+        concurrency (int): Máximo de páginas descargándose al mismo tiempo
+        verbose (bool): Si mostrar logs detallados
+        requests_per_second (float): Límite de solicitudes por segundo al host
+            (por defecto SCRAPER_REQUESTS_PER_SECOND)
+        parse_workers (int): Si se indica, el parseo corre en ese número de procesos
+            (ver extraction.pipeline)
+        source (SourceAdapter|str): Fuente del listado (ver extraction.sources)
+    
+    Returns:
+        list: Lista de diccionarios con los datos de todas las páginas
+    """
+    pages = list(page_range)
+    if not pages:
         return []
+    
+    concurrency = max(1, min(concurrency, len(pages)))
+    rate_limiter = get_rate_limiter() if requests_per_second is None else HostRateLimiter(requests_per_second)
+    
+    all_data = []
+    if parse_workers:
+        for _, page_data, _, _, _ in _iter_listing_pages(pages, concurrency, verbose, parse_workers, rate_limiter,
+                                                         source=source):
+            all_data.extend(page_data)
+    else:
+        with _listing_session(concurrency) as session:
+            def _scrape(page_num):
+                return scrape_page(page_num, verbose=verbose, session=session, rate_limiter=rate_limiter,
+                                   source=source)
+            
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                # executor.map conserva el orden de las páginas
+                for page_data in executor.map(_scrape, pages):
+                    all_data.extend(page_data)
+    
+    if verbose:
+        print(f"Scrapeadas {len(pages)} páginas: {len(all_data)} registros")
+    return all_data
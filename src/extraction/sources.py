@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+from urllib.parse import urlparse
+
+from extraction.parsers import DEFAULT_SELECTORS, RowSelectors
+from extraction.text import KeywordClassifier
+from utils.dates import DEFAULT_DATE_FORMATS, parse_dates, to_date
+
+# Fuentes a procesar por defecto (nombres separados por coma; vacío = todas las registradas)
+DEFAULT_SOURCE_NAMES = os.getenv("SCRAPER_SOURCES", "")
+# Archivo JSON opcional con fuentes adicionales (lista de objetos con los argumentos de SourceAdapter)
+SOURCES_FILE = os.getenv("SCRAPER_SOURCES_FILE")
+
+
+class SourceAdapter:
+    """
+    Describe el listado de normatividad de una entidad: URL, selectores de las
+    celdas, formatos de fecha y clasificación de los registros. El scraper, la
+    caché, el parseo y el watermark son comunes a todas las fuentes.
+
+    Args:
+        name (str): Identificador corto de la fuente (p. ej. 'ani')
+        entity (str): Valor de la columna entity de los registros
+        url_template (str): URL del listado con el marcador {year} para el filtro por año
+        selectors (RowSelectors | dict): Clases CSS de las celdas de cada fila
+        date_formats (list): Formatos strptime de las fechas que no vienen en ISO
+        classification_id (int): classification_id fijo de los registros
+        classification_keywords (dict): palabra clave del título -> rtype_id, en orden de prioridad
+        default_rtype_id (int): rtype_id si ninguna palabra clave coincide
+        link_base (str): Prefijo de los enlaces relativos (por defecto esquema y host de la URL)
+        page_param (str): Parámetro de paginación del listado
+        max_title_length (int): Se descartan los registros con títulos más largos
+        requests_per_second (float): Límite propio para el host (None = el global)
+    """
+
+    def __init__(self, name, entity, url_template, selectors=DEFAULT_SELECTORS, date_formats=DEFAULT_DATE_FORMATS,
+                 classification_id=None, classification_keywords=None, default_rtype_id=None,
+                 link_base=None, page_param='page', max_title_length=65, requests_per_second=None):
+        if '{year}' not in url_template:
+            raise ValueError(f"La URL de la fuente {name} debe incluir el marcador {{year}}")
+        self.name = name
+        self.entity = entity
+        self.url_template = url_template
+        self.selectors = selectors if isinstance(selectors, RowSelectors) else RowSelectors(**selectors)
+        self.date_formats = tuple(date_formats)
+        self.classification_id = classification_id
+        self.classification_keywords = dict(classification_keywords or {})
+        self.default_rtype_id = default_rtype_id
+        self.classifier = KeywordClassifier(self.classification_keywords, default_rtype_id)
+        parsed = urlparse(url_template)
+        self.host = parsed.netloc
+        self.link_base = link_base or f"{parsed.scheme}://{parsed.netloc}"
+        self.page_param = page_param
+        self.max_title_length = max_title_length
+        self.requests_per_second = requests_per_second
+
+    def __repr__(self):
+        return f"SourceAdapter({self.name!r}, {self.entity!r})"
+
+    @property
+    def listing_url(self):
+        """
+        URL de la primera página del listado sin filtro de año.
+        """
+        return self.build_page_url(0)
+
+    def build_page_url(self, page_num, year=None):
+        url = self.url_template.replace('{year}', '' if year is None else str(int(year)))
+        if page_num == 0:
+            return url
+        separator = '&' if '?' in url else '?'
+        return f"{url}{separator}{self.page_param}={page_num}"
+
+    def get_rtype_id(self, title):
+        """
+        Obtiene el rtype_id según la primera palabra clave contenida en el título.
+        """
+        return self.classifier.classify(title)
+
+    def get_rtype_id_series(self, titles):
+        """
+        Versión en lote de get_rtype_id para una Series de títulos.
+        """
+        return self.classifier.classify_series(titles)
+
+    def parse_date(self, value):
+        """
+        Convierte una fecha de la fuente (ISO, con o sin hora, o en alguno de
+        date_formats) a 'YYYY-MM-DD'. Retorna None si no se reconoce.
+        """
+        parsed = to_date(value, self.date_formats)
+        return parsed.isoformat() if parsed else None
+
+    def parse_dates(self, values):
+        """
+        Versión vectorizada de parse_date: Series datetime64 (NaT si no se reconoce).
+        """
+        return parse_dates(values, self.date_formats)
+
+ANI = SourceAdapter(
+    name='ani',
+    entity='Agencia Nacional de Infraestructura',
+    url_template=(
+        "https://www.ani.gov.co/informacion-de-la-ani/normatividad?field_tipos_de_normas__tid=12"
+        "&title=&body_value=&field_fecha__value%5Bvalue%5D%5Byear%5D={year}"
+    ),
+    classification_id=13,
+    # Clasificaciones de documentos
+    classification_keywords={
+        'resolución': 15,
+        'resolucion': 15,
+        'decreto': 14,
+    },
+    default_rtype_id=14,
+)
+
+_registry = {}
+_registry_lock = threading.Lock()
+# Separado de _registry_lock: load_sources_file lo toma en register_source
+_load_lock = threading.Lock()
+_file_loaded = False
+
+
+def register_source(source):
+    """
+    Registra (o reemplaza) una fuente por su nombre.
+    """
+    with _registry_lock:
+        _registry[source.name] = source
+    return source
+
+
+def load_sources_file(path):
+    """
+    Registra las fuentes definidas en un archivo JSON: una lista de objetos con los
+    argumentos de SourceAdapter (selectors como objeto con title_class,
+    summary_class, date_class y date_span_class).
+
+    Returns:
+        list: Fuentes registradas
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        definitions = json.load(f)
+    return [register_source(SourceAdapter(**definition)) for definition in definitions]
+
+
+def _ensure_loaded():
+    """
+    Carga SOURCES_FILE la primera vez. La carga ocurre con _load_lock tomado y la
+    marca se pone solo si terminó bien: un hilo que llega mientras tanto espera a
+    que las fuentes estén registradas, y si la carga falla se reintenta en la
+    próxima llamada.
+    """
+    global _file_loaded
+    if _file_loaded:
+        return
+    with _load_lock:
+        if _file_loaded:
+            return
+        if SOURCES_FILE:
+            sources = load_sources_file(SOURCES_FILE)
+            print(f"Fuentes cargadas desde {SOURCES_FILE}: {', '.join(s.name for s in sources)}")
+        _file_loaded = True
+
+
+def get_source(name=None):
+    """
+    Retorna la fuente registrada con ese nombre (por defecto ANI).
+    """
+    if name is None:
+        return ANI
+    if isinstance(name, SourceAdapter):
+        return name
+    _ensure_loaded()
+    with _registry_lock:
+        if name not in _registry:
+            raise ValueError(f"Fuente desconocida: {name}. Opciones: {', '.join(_registry)}")
+        return _registry[name]
+
+
+def list_sources(names=None):
+    """
+    Retorna las fuentes a procesar: las indicadas en names, o las de SCRAPER_SOURCES,
+    o todas las registradas.
+    """
+    _ensure_loaded()
+    if names is None:
+        names = [name.strip() for name in DEFAULT_SOURCE_NAMES.split(',') if name.strip()] or None
+    if names is None:
+        with _registry_lock:
+            return list(_registry.values())
+    return [get_source(name) for name in names]
+
+
+register_source(ANI)
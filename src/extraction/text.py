@@ -0,0 +1,77 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Comillas y acentos sueltos que se eliminan de títulos y resúmenes
+QUOTE_CHARS = (
+    '"\'\u00B4`\u2032\u2033'
+    '\u201C\u201D\u2018\u2019\u00AB\u00BB\u201E\u201A\u2039\u203A'
+)
+_QUOTES_RE = re.compile(f"[{re.escape(QUOTE_CHARS)}]+")
+
+
+def clean_quotes(text):
+    """
+    Elimina las comillas de QUOTE_CHARS con una sola expresión precompilada y
+    normaliza los espacios (sin espacios al inicio o al final y uno solo entre
+    palabras).
+    """
+    if not text:
+        return text
+    return ' '.join(_QUOTES_RE.sub('', text).split())
+
+
+def clean_quotes_series(series):
+    """
+    clean_quotes sobre una Series de textos, una vez por texto distinto
+    (pd.factorize): los resúmenes del listado se repiten mucho. Los nulos quedan
+    como None.
+    """
+    codes, uniques = pd.factorize(series)
+    values = np.empty(len(uniques) + 1, dtype=object)
+    values[:-1] = [clean_quotes(text) for text in uniques]
+    # factorize marca los nulos con -1, que toma el último valor (None)
+    values[-1] = None
+    return pd.Series(values[codes], index=series.index, name=series.name)
+
+
+class KeywordClassifier:
+    """
+    Clasifica títulos por palabras clave: retorna el valor de la primera palabra
+    clave (en el orden de keywords, que define la prioridad) contenida en el título
+    en minúsculas, o default si ninguna aparece.
+
+    Las palabras clave se pasan a minúsculas una sola vez al construir el
+    clasificador. Para títulos cortos (el scraper descarta los de más de 65
+    caracteres) la búsqueda con 'in' es más rápida que una alternancia compilada
+    o un autómata; ver benchmarks/bench_text.py.
+    """
+
+    def __init__(self, keywords, default=None):
+        self.keywords = dict(keywords or {})
+        self.default = default
+        self._rules = tuple((keyword.lower(), value) for keyword, value in self.keywords.items())
+
+    def classify(self, title):
+        title_lower = title.lower()
+        for keyword, value in self._rules:
+            if keyword in title_lower:
+                return value
+        return self.default
+
+    def classify_series(self, series):
+        """
+        classify sobre una Series de títulos (los nulos reciben default). Los
+        títulos casi nunca se repiten (llevan el número del acto), así que se
+        clasifican en un solo recorrido sobre el arreglo de numpy: deduplicarlos
+        con pd.factorize cuesta más que la búsqueda; ver benchmarks/bench_text.py.
+        """
+        classify = self.classify
+        titles = series.to_numpy()
+        try:
+            values = [classify(title) for title in titles]
+        except AttributeError:
+            # Hay nulos (None o NaN no tienen lower()): solo entonces se revisa cada valor
+            values = [classify(title) if isinstance(title, str) else self.default for title in titles]
+        return pd.Series(values, index=series.index, name=series.name, dtype=object)
@@ -0,0 +1,100 @@
+import json
+
+from utils.dates import to_date
+from utils.db import DatabaseManager
+
+WATERMARKS_TABLE = "extraction_watermarks"
+
+
+class WatermarkStore:
+    """
+    Estado incremental de la extracción por entidad y URL de listado (tabla
+    extraction_watermarks, ver schema.sql):
+      - last_created_at: fecha más reciente ya extraída
+      - top_link: enlace del primer registro del listado en la última corrida
+      - page_hashes: hash del contenido de cada página recorrida ({"0": "..."})
+
+    Las lecturas son una búsqueda por clave primaria.
+    """
+
+    def __init__(self, table_name=WATERMARKS_TABLE):
+        self.table_name = table_name
+
+    def load(self, entity, listing_url):
+        """
+        Returns:
+            dict: watermark guardado (last_created_at como date) o None si no existe
+        """
+        with DatabaseManager() as db_manager:
+            rows = db_manager.execute_query(
+                f"SELECT last_created_at, top_link, page_hashes FROM {self.table_name} "
+                f"WHERE entity = %s AND listing_url = %s",
+                (entity, listing_url),
+            )
+        if not rows:
+            return None
+        last_created_at, top_link, page_hashes = rows[0]
+        return {
+            'entity': entity,
+            'listing_url': listing_url,
+            'last_created_at': to_date(last_created_at),
+            'top_link': top_link,
+            'page_hashes': page_hashes or {},
+        }
+
+    def save(self, watermark):
+        """
+        Guarda (o reemplaza) el watermark de watermark['entity'] y watermark['listing_url'].
+        """
+        with DatabaseManager() as db_manager:
+            db_manager.cursor.execute(
+                f"""
+                INSERT INTO {self.table_name} (entity, listing_url, last_created_at, top_link, page_hashes, updated_at)
+                VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                ON CONFLICT (entity, listing_url) DO UPDATE SET
+                    last_created_at = EXCLUDED.last_created_at,
+                    top_link = EXCLUDED.top_link,
+                    page_hashes = EXCLUDED.page_hashes,
+                    updated_at = EXCLUDED.updated_at
+                """,
+                (
+                    watermark['entity'],
+                    watermark['listing_url'],
+                    to_date(watermark.get('last_created_at')),
+                    watermark.get('top_link'),
+                    json.dumps(watermark.get('page_hashes') or {}),
+                ),
+            )
+            db_manager.connection.commit()
+
+
+def advance_watermark(previous, entity, listing_url, records, page_hashes):
+    """
+    Calcula el watermark que resulta de una corrida: la fecha más reciente entre
+    la anterior y la de los registros nuevos, el enlace del primer registro nuevo
+    (o el anterior si no hubo nuevos) y los hashes de las páginas, con los de las
+    recorridas reemplazando a los anteriores (ver iter_regulations(known_page_hashes)).
+
+    Returns:
+        dict: watermark serializable en JSON (fechas en formato ISO) para XCom
+    """
+    previous = previous or {}
+    last_created_at = previous.get('last_created_at')
+    for record in records:
+        record_date = to_date(record.get('created_at'))
+        if record_date is not None and (last_created_at is None or record_date > last_created_at):
+            last_created_at = record_date
+
+    top_link = records[0].get('external_link') if records else previous.get('top_link')
+    # Un hash describe el contenido de esa página: los de páginas que esta corrida
+    # no recorrió siguen sirviendo para compararlas en la próxima
+    merged_hashes = dict(previous.get('page_hashes') or {})
+    merged_hashes.update({str(page): content_hash for page, content_hash in page_hashes.items() if content_hash})
+
+    return {
+        'entity': entity,
+        'listing_url': listing_url,
+        'last_created_at': last_created_at.isoformat() if last_created_at else None,
+        'top_link': top_link,
+        'page_hashes': merged_hashes,
+    }
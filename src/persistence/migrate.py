@@ -0,0 +1,256 @@
+"""
+Migraciones versionadas del esquema de la base de datos.
+
+Cada migración es un archivo NNNN_nombre.sql en persistence/migrations; se
+aplican en orden de versión, cada una en su propia transacción, y quedan
+registradas en schema_migrations con el checksum del archivo. Las de
+migrations/optional (p. ej. el particionado de regulations) solo se aplican
+si se piden por nombre o versión.
+
+Uso:
+    python -m persistence.migrate                 # aplica las pendientes
+    python -m persistence.migrate --status
+    python -m persistence.migrate --with partition_regulations_by_year
+"""
+import argparse
+import hashlib
+import os
+import re
+from datetime import date
+from pathlib import Path
+
+import psycopg2
+
+from utils import metrics
+from utils.db import get_connection
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+OPTIONAL_DIR = MIGRATIONS_DIR / "optional"
+MIGRATIONS_TABLE = "schema_migrations"
+
+# Migraciones opcionales que aplica la tarea migrate de los DAGs (nombres o
+# versiones separados por coma)
+OPTIONAL_MIGRATIONS = tuple(
+    key.strip() for key in os.getenv("DB_OPTIONAL_MIGRATIONS", "").split(",") if key.strip()
+)
+
+# Lock de sesión (pg_advisory_lock) para que dos tareas no migren a la vez
+_ADVISORY_LOCK_ID = 80421501
+
+_FILENAME_RE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+class Migration:
+    """
+    Archivo de migración: versión (prefijo numérico), nombre, SQL y checksum.
+    """
+
+    def __init__(self, path, optional=False):
+        match = _FILENAME_RE.match(path.name)
+        if not match:
+            raise ValueError(f"Nombre de migración inválido: {path.name} (se espera NNNN_nombre.sql)")
+        self.path = path
+        self.version = int(match.group(1))
+        self.name = match.group(2)
+        self.optional = optional
+        self.sql = path.read_text(encoding="utf-8")
+        self.checksum = hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+    def __repr__(self):
+        return f"Migration({self.version:04d}, {self.name!r})"
+
+    def matches(self, key):
+        return str(key) in (self.name, str(self.version), f"{self.version:04d}", self.path.stem)
+
+
+def discover(directory=MIGRATIONS_DIR, optional_directory=OPTIONAL_DIR):
+    """
+    Migraciones disponibles ordenadas por versión (las opcionales marcadas con
+    optional=True). Falla si dos archivos comparten versión.
+    """
+    migrations = [Migration(path) for path in sorted(Path(directory).glob("*.sql"))]
+    if optional_directory and Path(optional_directory).is_dir():
+        migrations += [Migration(path, optional=True) for path in sorted(Path(optional_directory).glob("*.sql"))]
+    versions = {}
+    for migration in migrations:
+        if migration.version in versions:
+            raise ValueError(f"Versión de migración repetida: {migration.path.name} y {versions[migration.version].path.name}")
+        versions[migration.version] = migration
+    return sorted(migrations, key=lambda m: m.version)
+
+
+def _ensure_table(cursor):
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            version INT PRIMARY KEY,
+            name TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+def applied_migrations(cursor):
+    """
+    Returns:
+        dict: {version: (name, checksum, applied_at)} de las migraciones aplicadas
+    """
+    cursor.execute(f"SELECT version, name, checksum, applied_at FROM {MIGRATIONS_TABLE} ORDER BY version")
+    return {version: (name, checksum, applied_at) for version, name, checksum, applied_at in cursor.fetchall()}
+
+
+def _select(migrations, applied, target=None, include=()):
+    """
+    Migraciones pendientes: las obligatorias hasta target y las opcionales de include.
+    """
+    include = [key for key in include if key]
+    unknown = [key for key in include if not any(m.optional and m.matches(key) for m in migrations)]
+    if unknown:
+        raise ValueError(f"Migraciones opcionales desconocidas: {', '.join(map(str, unknown))}")
+    pending = []
+    for migration in migrations:
+        if migration.version in applied:
+            continue
+        if migration.optional:
+            if any(migration.matches(key) for key in include):
+                pending.append(migration)
+        elif target is None or migration.version <= target:
+            pending.append(migration)
+    return pending
+
+
+def _check_checksums(migrations, applied):
+    by_version = {m.version: m for m in migrations}
+    for version, (name, checksum, _) in applied.items():
+        migration = by_version.get(version)
+        if migration is not None and migration.checksum != checksum:
+            raise RuntimeError(
+                f"La migración {version:04d}_{name} cambió después de aplicada; "
+                f"los cambios de esquema van en una migración nueva"
+            )
+
+
+def migrate(connection=None, target=None, include=(), dry_run=False, verbose=True):
+    """
+    Aplica las migraciones pendientes en orden, cada una en su transacción y
+    bajo un advisory lock. Si alguna falla se revierte solo esa y se lanza la
+    excepción (las anteriores quedan aplicadas).
+
+    Args:
+        connection: conexión psycopg2 (por defecto una nueva con utils.db.get_connection)
+        target (int): última versión obligatoria a aplicar (None = todas)
+        include (list): migraciones opcionales a aplicar (nombre o versión)
+        dry_run (bool): solo listar las pendientes
+
+    Returns:
+        list: migraciones aplicadas (o pendientes si dry_run)
+    """
+    own_connection = connection is None
+    connection = connection or get_connection()
+    migrations = discover()
+    applied_now = []
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (_ADVISORY_LOCK_ID,))
+            try:
+                _ensure_table(cursor)
+                connection.commit()
+                applied = applied_migrations(cursor)
+                _check_checksums(migrations, applied)
+                pending = _select(migrations, applied, target, include)
+                if dry_run:
+                    return pending
+                for migration in pending:
+                    with metrics.stage('migration', log=False, version=migration.version):
+                        try:
+                            with metrics.db_roundtrip('ddl'):
+                                cursor.execute(migration.sql)
+                            cursor.execute(
+                                f"INSERT INTO {MIGRATIONS_TABLE} (version, name, checksum) VALUES (%s, %s, %s)",
+                                (migration.version, migration.name, migration.checksum),
+                            )
+                            connection.commit()
+                        except Exception:
+                            connection.rollback()
+                            raise
+                    applied_now.append(migration)
+                    if verbose:
+                        print(f"Migración aplicada: {migration.path.name}")
+                if _is_partitioned(cursor):
+                    ensure_year_partitions(cursor)
+                    connection.commit()
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (_ADVISORY_LOCK_ID,))
+                connection.commit()
+        if verbose and not applied_now:
+            print("Esquema al día: sin migraciones pendientes.")
+        return applied_now
+    finally:
+        if own_connection:
+            connection.close()
+
+
+def _is_partitioned(cursor):
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('regulations')")
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def ensure_year_partitions(cursor, years=None):
+    """
+    Con regulations particionada, crea las particiones de years (por defecto el
+    año en curso y el siguiente) si no existen.
+    """
+    this_year = date.today().year
+    for year in years or (this_year, this_year + 1):
+        cursor.execute("SELECT regulations_add_year_partition(%s)", (int(year),))
+
+
+def status(connection=None):
+    """
+    Returns:
+        list: (migración, applied_at o None) de todas las migraciones disponibles
+    """
+    own_connection = connection is None
+    connection = connection or get_connection()
+    try:
+        with connection.cursor() as cursor:
+            _ensure_table(cursor)
+            connection.commit()
+            applied = applied_migrations(cursor)
+        return [(migration, applied.get(migration.version, (None, None, None))[2]) for migration in discover()]
+    finally:
+        if own_connection:
+            connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", help="DSN de Postgres (por defecto las variables POSTGRES_*)")
+    parser.add_argument("--status", action="store_true", help="listar las migraciones y si están aplicadas")
+    parser.add_argument("--target", type=int, help="última versión obligatoria a aplicar")
+    parser.add_argument("--with", dest="include", action="append", default=[],
+                        help="migración opcional a aplicar (nombre o versión; se puede repetir)")
+    parser.add_argument("--dry-run", action="store_true", help="solo listar las pendientes")
+    args = parser.parse_args()
+
+    connection = psycopg2.connect(args.dsn) if args.dsn else get_connection()
+    try:
+        if args.status:
+            for migration, applied_at in status(connection):
+                state = applied_at.isoformat(sep=" ", timespec="seconds") if applied_at else "pendiente"
+                optional = " (opcional)" if migration.optional else ""
+                print(f"{migration.version:04d} {migration.name}{optional}: {state}")
+            return
+        pending = migrate(connection, target=args.target, include=args.include, dry_run=args.dry_run)
+        if args.dry_run:
+            for migration in pending:
+                print(f"Pendiente: {migration.path.name}")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+-- Tablas base del pipeline. Idempotente: en una base creada con schema.sql
+-- (p. ej. el init del contenedor de Postgres) solo queda registrada.
+CREATE TABLE IF NOT EXISTS regulations (
+    id SERIAL PRIMARY KEY,
+    title TEXT,
+    summary TEXT,
+    created_at TIMESTAMP,
+    entity TEXT,
+    external_link TEXT,
+    classification_id INT,
+    rtype_id INT,
+    gtype TEXT,
+    is_active BOOLEAN DEFAULT TRUE,
+    update_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS regulations_component (
+    id SERIAL PRIMARY KEY,
+    regulations_id INT NOT NULL REFERENCES regulations(id) ON DELETE CASCADE,
+    components_id INT NOT NULL
+);
+
+-- Estado incremental de la extracción (ver extraction/watermark.py)
+CREATE TABLE IF NOT EXISTS extraction_watermarks (
+    entity TEXT NOT NULL,
+    listing_url TEXT NOT NULL,
+    last_created_at DATE,
+    top_link TEXT,
+    page_hashes JSONB NOT NULL DEFAULT '{}'::jsonb,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (entity, listing_url)
+);
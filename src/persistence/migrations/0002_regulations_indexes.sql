@@ -0,0 +1,29 @@
+-- Índices de las consultas frecuentes sobre regulations.
+--
+-- En bases anteriores al índice único puede haber filas repetidas en la clave:
+-- se conserva la de menor id (sus componentes se borran en cascada).
+DO $$
+BEGIN
+    IF to_regclass('regulations_dedup_key_idx') IS NULL THEN
+        DELETE FROM regulations r
+        USING regulations d
+        WHERE r.entity = d.entity
+          AND r.title = d.title
+          AND r.created_at = d.created_at
+          AND COALESCE(r.external_link, '') = COALESCE(d.external_link, '')
+          AND r.id > d.id;
+    END IF;
+END
+$$;
+
+-- Clave de idempotencia del writer (INSERT ... ON CONFLICT DO NOTHING)
+CREATE UNIQUE INDEX IF NOT EXISTS regulations_dedup_key_idx
+    ON regulations (entity, title, created_at, (COALESCE(external_link, '')));
+
+-- MAX(created_at) por entidad (arranque del watermark) y listados por fecha
+CREATE INDEX IF NOT EXISTS regulations_entity_created_at_idx
+    ON regulations (entity, created_at DESC);
+
+-- Borrado en cascada y joins desde regulations
+CREATE INDEX IF NOT EXISTS regulations_component_regulations_id_idx
+    ON regulations_component (regulations_id);
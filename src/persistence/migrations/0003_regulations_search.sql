@@ -0,0 +1,30 @@
+-- Búsqueda de texto completo sobre título y resumen (ver persistence/search.py).
+--
+-- search_vector es una columna generada: Postgres la calcula en cada INSERT o
+-- UPDATE, incluida la carga del writer (COPY a staging + INSERT ... SELECT), sin
+-- triggers ni cambios en el DataFrame. Configuración 'spanish' (stemming y
+-- stopwords en español); el título pesa más que el resumen en el ranking.
+ALTER TABLE regulations ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('spanish', COALESCE(title, '')), 'A')
+        || setweight(to_tsvector('spanish', COALESCE(summary, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS regulations_search_vector_idx
+    ON regulations USING GIN (search_vector);
+
+-- Trigramas del título para la búsqueda aproximada (errores de tipeo, números
+-- parciales) y los ILIKE '%...%' existentes. pg_trgm viene en la imagen oficial
+-- de Postgres; si el servidor no lo tiene, la búsqueda aproximada queda
+-- deshabilitada y el resto de la migración se aplica igual.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS regulations_title_trgm_idx
+            ON regulations USING GIN (title gin_trgm_ops);
+    ELSE
+        RAISE NOTICE 'pg_trgm no está disponible: se omite regulations_title_trgm_idx';
+    END IF;
+END
+$$;
@@ -0,0 +1,34 @@
+-- Captura de cambios (CDC) en el writer: hash del contenido de cada regulación.
+--
+-- Un registro se identifica por (entity, title, created_at); su contenido son
+-- las columnas que la fuente puede corregir sin cambiar la identidad (resumen,
+-- enlace, tipo y estado). El writer compara el hash de cada fila del lote con
+-- content_hash y solo escribe las que cambiaron (ver persistence/writer.py).
+--
+-- content_hash es una columna generada: se mantiene al día en cada INSERT o
+-- UPDATE y se calcula para las filas existentes al aplicar la migración. Si se
+-- cambia la función hay que recalcular la columna (una migración nueva que la
+-- vuelva a crear).
+CREATE OR REPLACE FUNCTION regulations_content_hash(
+    summary TEXT,
+    external_link TEXT,
+    gtype TEXT,
+    rtype_id INT,
+    classification_id INT,
+    is_active BOOLEAN
+) RETURNS UUID AS $$
+    -- NULL se codifica como \N para distinguirlo del texto vacío; md5 cabe en un UUID (16 bytes)
+    SELECT md5(
+        COALESCE(summary, '\N') || E'\x1f'
+        || COALESCE(external_link, '\N') || E'\x1f'
+        || COALESCE(gtype, '\N') || E'\x1f'
+        || COALESCE(rtype_id::TEXT, '\N') || E'\x1f'
+        || COALESCE(classification_id::TEXT, '\N') || E'\x1f'
+        || COALESCE(is_active::TEXT, '\N')
+    )::UUID
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+ALTER TABLE regulations ADD COLUMN IF NOT EXISTS content_hash UUID
+    GENERATED ALWAYS AS (
+        regulations_content_hash(summary, external_link, gtype, rtype_id, classification_id, is_active)
+    ) STORED;
@@ -0,0 +1,29 @@
+-- Documentos (PDF de resoluciones y decretos) descargados desde external_link,
+-- uno por regulación (ver extraction/documents.py).
+--
+-- Los archivos se guardan en un almacén local direccionado por contenido
+-- (DAPPER_DOCUMENTS_DIR, un archivo por SHA-256); aquí queda el hash, el
+-- tamaño y el estado de la última descarga de cada regulación, y el ETag y
+-- Last-Modified para que las corridas siguientes pidan solo lo que cambió.
+--
+-- Sin clave foránea hacia regulations: con la tabla particionada (migración
+-- opcional 0100) id no es único por sí solo y Postgres no la admite.
+CREATE TABLE IF NOT EXISTS regulation_documents (
+    regulations_id INT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    sha256 TEXT,
+    size_bytes BIGINT,
+    content_type TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    http_status INT,
+    error TEXT,
+    attempts INT NOT NULL DEFAULT 0,
+    fetched_at TIMESTAMP,
+    checked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Regulaciones que comparten un mismo archivo
+CREATE INDEX IF NOT EXISTS regulation_documents_sha256_idx
+    ON regulation_documents (sha256);
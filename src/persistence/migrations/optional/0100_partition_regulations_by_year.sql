@@ -0,0 +1,113 @@
+-- Opcional: particiona regulations por rango de created_at, una partición por
+-- año (regulations_<año>) más una partición DEFAULT para las fechas sin
+-- partición propia. Se aplica con
+--     python -m persistence.migrate --with partition_regulations_by_year
+-- o DB_OPTIONAL_MIGRATIONS=partition_regulations_by_year en la tarea migrate.
+--
+-- Consecuencias:
+--   - La clave primaria pasa a ser (id, created_at) y created_at es NOT NULL
+--     (la migración falla si hay filas sin fecha).
+--   - Postgres no admite claves foráneas hacia una columna que no es única por
+--     sí sola en una tabla particionada: regulations_component pierde la FK (y
+--     el ON DELETE CASCADE); los componentes se siguen insertando en la misma
+--     sentencia que las regulaciones (ver persistence/writer.py).
+--   - Los años nuevos se agregan con SELECT regulations_add_year_partition(año);
+--     la tarea migrate lo hace para el año siguiente en cada corrida.
+--
+-- La tabla nueva copia las columnas (con sus defaults y columnas generadas) y
+-- los índices de la actual, de modo que se puede aplicar después de cualquier
+-- migración que agregue columnas o índices a regulations.
+
+-- Columnas de regulations que se pueden insertar (sin las generadas)
+CREATE OR REPLACE FUNCTION regulations_insert_columns() RETURNS TEXT AS $$
+    SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum)
+    FROM pg_attribute
+    WHERE attrelid = 'regulations'::regclass AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION regulations_add_year_partition(p_year INT) RETURNS VOID AS $$
+DECLARE
+    partition_name TEXT := format('regulations_%s', p_year);
+    range_start TIMESTAMP := make_date(p_year, 1, 1);
+    range_end TIMESTAMP := make_date(p_year + 1, 1, 1);
+    columns_sql TEXT := regulations_insert_columns();
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN;
+    END IF;
+    -- Las filas de ese año que cayeron en la partición DEFAULT se mueven a la nueva
+    DROP TABLE IF EXISTS regulations_partition_moved;
+    CREATE TEMP TABLE regulations_partition_moved ON COMMIT DROP AS
+        SELECT * FROM regulations_default WHERE created_at >= range_start AND created_at < range_end;
+    DELETE FROM regulations_default WHERE created_at >= range_start AND created_at < range_end;
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF regulations FOR VALUES FROM (%L) TO (%L)',
+        partition_name, range_start, range_end
+    );
+    EXECUTE format(
+        'INSERT INTO regulations (%s) SELECT %s FROM regulations_partition_moved',
+        columns_sql, columns_sql
+    );
+END
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    first_year INT;
+    last_year INT := EXTRACT(YEAR FROM CURRENT_DATE)::INT + 1;
+    partition_year INT;
+    index_names TEXT[];
+    index_defs TEXT[];
+    columns_sql TEXT;
+    i INT;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'regulations'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+    IF EXISTS (SELECT 1 FROM regulations WHERE created_at IS NULL) THEN
+        RAISE EXCEPTION 'regulations tiene filas sin created_at: la clave de partición no admite NULL';
+    END IF;
+
+    ALTER TABLE regulations_component DROP CONSTRAINT IF EXISTS regulations_component_regulations_id_fkey;
+    ALTER TABLE regulations RENAME TO regulations_unpartitioned;
+    ALTER TABLE regulations_unpartitioned DROP CONSTRAINT regulations_pkey;
+
+    -- Índices actuales: se recrean con el mismo nombre sobre la tabla particionada
+    SELECT array_agg(index_class.relname::TEXT), array_agg(pg_get_indexdef(index_class.oid))
+    INTO index_names, index_defs
+    FROM pg_index
+    JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+    WHERE pg_index.indrelid = 'regulations_unpartitioned'::regclass;
+    FOR i IN 1..COALESCE(array_length(index_names, 1), 0) LOOP
+        EXECUTE format('DROP INDEX %I', index_names[i]);
+    END LOOP;
+
+    CREATE TABLE regulations (
+        LIKE regulations_unpartitioned INCLUDING DEFAULTS INCLUDING GENERATED,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+    ALTER SEQUENCE regulations_id_seq OWNED BY regulations.id;
+
+    CREATE TABLE regulations_default PARTITION OF regulations DEFAULT;
+    first_year := LEAST(
+        COALESCE((SELECT EXTRACT(YEAR FROM MIN(created_at))::INT FROM regulations_unpartitioned), last_year),
+        EXTRACT(YEAR FROM CURRENT_DATE)::INT
+    );
+    FOR partition_year IN first_year..last_year LOOP
+        PERFORM regulations_add_year_partition(partition_year);
+    END LOOP;
+
+    columns_sql := regulations_insert_columns();
+    EXECUTE format(
+        'INSERT INTO regulations (%s) SELECT %s FROM regulations_unpartitioned',
+        columns_sql, columns_sql
+    );
+
+    -- Los índices del padre se crean en cada partición (después de la carga)
+    FOR i IN 1..COALESCE(array_length(index_defs, 1), 0) LOOP
+        EXECUTE regexp_replace(index_defs[i], ' ON \S+ USING ', ' ON regulations USING ');
+    END LOOP;
+
+    DROP TABLE regulations_unpartitioned;
+END
+$$;
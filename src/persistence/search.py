@@ -0,0 +1,146 @@
+"""
+Búsqueda sobre las regulaciones cargadas: texto completo en español sobre
+título y resumen (columna generada search_vector con índice GIN) y búsqueda
+aproximada por título con trigramas (pg_trgm), ver la migración
+0003_regulations_search.
+
+Los resultados se ordenan por relevancia y se paginan con keyset: cada página
+retorna un cursor opaco con el (rank, id) de su última fila, y la siguiente
+pide las filas estrictamente posteriores. A diferencia de OFFSET, el costo de
+una página no crece con su número y las páginas no se corren si entran
+registros nuevos entre una consulta y otra.
+"""
+import base64
+import json
+from datetime import timedelta
+
+import psycopg2
+
+from utils import metrics
+from utils.dates import to_date
+from utils.db import DatabaseManager
+
+TS_CONFIG = 'spanish'
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+RESULT_COLUMNS = ('id', 'title', 'summary', 'created_at', 'entity', 'external_link', 'rtype_id', 'classification_id')
+
+_SEARCH_SQL = """
+    SELECT {columns}, rank FROM (
+        SELECT {source_columns}, {rank} AS rank
+        FROM regulations r{from_extra}
+        WHERE {match}{filters}
+    ) ranked
+    {after}
+    ORDER BY rank DESC, id DESC
+    LIMIT %(limit)s
+"""
+
+_FULL_TEXT = {
+    'from_extra': ", websearch_to_tsquery('" + TS_CONFIG + "', %(query)s) AS q(tsq)",
+    'rank': "ts_rank_cd(r.search_vector, q.tsq)",
+    'match': "r.search_vector @@ q.tsq",
+}
+_FUZZY = {
+    'from_extra': "",
+    'rank': "similarity(r.title, %(query)s)",
+    'match': "r.title %% %(query)s",
+}
+
+
+def encode_cursor(rank, row_id):
+    payload = json.dumps([rank, row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple: (rank, id) de la última fila de la página anterior
+    """
+    try:
+        rank, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return float(rank), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor de búsqueda inválido: {cursor!r}") from e
+
+
+def _build_query(fuzzy, entity, date_range, after):
+    filters, params = [], {}
+    if entity:
+        filters.append("r.entity = %(entity)s")
+        params['entity'] = entity
+    start, end = date_range or (None, None)
+    start, end = to_date(start), to_date(end)
+    if start:
+        filters.append("r.created_at >= %(start)s")
+        params['start'] = start
+    if end:
+        # Fin inclusivo: hasta el final de ese día
+        filters.append("r.created_at < %(end)s")
+        params['end'] = end + timedelta(days=1)
+    if after:
+        # rank es REAL: se compara contra el mismo tipo para que el cursor sea exacto
+        params['after_rank'], params['after_id'] = after
+    sql = _SEARCH_SQL.format(
+        columns=", ".join(RESULT_COLUMNS),
+        source_columns=", ".join(f"r.{column}" for column in RESULT_COLUMNS),
+        filters="".join(f" AND {condition}" for condition in filters),
+        after="WHERE (rank, id) < (%(after_rank)s::REAL, %(after_id)s)" if after else "",
+        **(_FUZZY if fuzzy else _FULL_TEXT),
+    )
+    return sql, params
+
+
+def search_regulations(query, entity=None, date_range=None, limit=DEFAULT_LIMIT, cursor=None, fuzzy=False,
+                       db_manager=None):
+    """
+    Busca regulaciones por texto y retorna una página de resultados ordenada por
+    relevancia.
+
+    Args:
+        query (str): Texto a buscar. En modo texto completo admite la sintaxis de
+            websearch_to_tsquery ("frase exacta", -excluir, OR)
+        entity (str): Si se indica, solo regulaciones de esa entidad
+        date_range (tuple): (desde, hasta) sobre created_at, ambos inclusivos y
+            opcionales (date, datetime o 'YYYY-MM-DD')
+        limit (int): Resultados por página (máximo MAX_LIMIT)
+        cursor (str): next_cursor de la página anterior (None = primera página)
+        fuzzy (bool): Búsqueda aproximada por similitud de trigramas del título
+            (requiere pg_trgm) en lugar de texto completo
+        db_manager (DatabaseManager): Conexión a usar (por defecto una del pool)
+
+    Returns:
+        dict: {'results': [dict con RESULT_COLUMNS y rank], 'next_cursor': str o None}
+    """
+    if not query or not query.strip():
+        raise ValueError("La búsqueda requiere un texto")
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    after = decode_cursor(cursor) if cursor else None
+    sql, params = _build_query(fuzzy, entity, date_range, after)
+    # Una fila de más indica si hay página siguiente
+    params.update(query=query.strip(), limit=limit + 1)
+
+    with metrics.stage('search', log=False, mode='fuzzy' if fuzzy else 'full_text') as search_stage:
+        try:
+            if db_manager is None:
+                with DatabaseManager() as pooled_manager:
+                    rows = pooled_manager.execute_query(sql, params)
+            else:
+                rows = db_manager.execute_query(sql, params)
+        except psycopg2.errors.UndefinedFunction as e:
+            if fuzzy:
+                raise RuntimeError("La búsqueda aproximada requiere la extensión pg_trgm (migración 0003)") from e
+            raise
+        search_stage.rows_out = min(len(rows), limit)
+
+    page = rows[:limit]
+    results = []
+    for row in page:
+        result = dict(zip(RESULT_COLUMNS, row[:-1]))
+        result['created_at'] = to_date(result['created_at'])
+        result['rank'] = float(row[-1])
+        results.append(result)
+    next_cursor = encode_cursor(results[-1]['rank'], results[-1]['id']) if len(rows) > limit else None
+    return {'results': results, 'next_cursor': next_cursor}
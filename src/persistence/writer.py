@@ -1,195 +1,200 @@
 
-from utils.db import DatabaseManager
+from utils import metrics
+from utils.db import NULL_TOKENS, DatabaseManager
+from utils.dates import normalize_date_columns
 import pandas as pd
-from airflow.exceptions import AirflowException
-def insert_regulations_component(db_manager, new_ids):
+
+
+# Componente al que se asocian las regulaciones cargadas por este writer
+REGULATIONS_COMPONENT_ID = 7
+
+# Clave de idempotencia: índice único regulations_dedup_key_idx (ver schema.sql)
+REGULATIONS_CONFLICT_TARGET = "(entity, title, created_at, (COALESCE(external_link, ''))) DO NOTHING"
+
+# Columnas de la clave de idempotencia dentro de una entidad
+DEDUP_KEY_COLUMNS = ['title', 'created_at', 'external_link']
+
+# Captura de cambios: identidad de una regulación y columnas que la fuente puede
+# corregir sin cambiarla (argumentos de regulations_content_hash, migración 0004)
+IDENTITY_COLUMNS = ['entity', 'title', 'created_at']
+CONTENT_COLUMNS = ['summary', 'external_link', 'gtype', 'rtype_id', 'classification_id', 'is_active']
+
+
+def batch_duplicates(df, columns=DEDUP_KEY_COLUMNS):
+    """
+    Máscara de las filas del lote que repiten la clave de una fila anterior. La
+    clave de cada fila es un hash uint64 de sus columnas (pd.util.hash_pandas_object),
+    sin construir strings por fila; con 64 bits la probabilidad de colisión en un
+    lote de millones de filas es despreciable.
+    """
+    keys = pd.util.hash_pandas_object(df[columns], index=False)
+    return keys.duplicated(keep='first')
+
+
+def _content_hash_sql(columns, batch_alias, stored_alias):
+    """
+    Expresión regulations_content_hash(...) de una fila del lote; las columnas de
+    contenido que no vienen en el lote se toman de la fila guardada.
+    """
+    args = [f'{batch_alias}."{col}"' if col in columns else f'{stored_alias}."{col}"' for col in CONTENT_COLUMNS]
+    return f"regulations_content_hash({', '.join(args)})"
+
+
+def write_regulations_with_components(db_manager, records, table_name='regulations'):
     """
-    Inserta los componentes de las regulaciones.
+    Carga un lote de regulaciones con captura de cambios, en una sola sentencia y
+    transacción. Los registros se copian a una tabla temporal y cada fila se
+    compara con la regulación guardada con la misma identidad (IDENTITY_COLUMNS):
+
+    - sin regulación guardada: se inserta (ON CONFLICT DO NOTHING sobre la clave de
+      idempotencia) junto con su fila de regulations_component;
+    - con distinto hash de contenido (content_hash, migración 0004): se actualizan
+      sus columnas de contenido y update_at con un único UPDATE ... FROM;
+    - con el mismo hash: no se escribe nada.
+
+    Si el lote trae varias filas con la misma identidad (distinto enlace), cada una
+    solo se compara con la guardada que tenga su mismo enlace, como antes.
+
+    Returns:
+        tuple: (IDs insertados, IDs actualizados)
     """
-    if not new_ids:
-        return 0, "No new regulation IDs provided"
+    if not db_manager.connection or not db_manager.cursor:
+        raise Exception("Database not connected")
 
     try:
-        id_rows = pd.DataFrame(new_ids, columns=['regulations_id'])
-        id_rows['components_id'] = 7
-        
-        inserted_count = db_manager.bulk_insert(id_rows, 'regulations_component')
-        return inserted_count, f"Successfully inserted {inserted_count} regulation components"
-        
+        columns = list(records.columns)
+        columns_sql = db_manager._columns_sql(columns)
+        staging_name = db_manager.create_staging_table(table_name, columns)
+        # Los textos 'NaT'/'NaN'/'' se cargan como NULL al serializar cada bloque
+        db_manager.copy_dataframe(records, staging_name, null_tokens=NULL_TOKENS)
+
+        identity_sql = ", ".join(f'b."{col}"' for col in IDENTITY_COLUMNS)
+        identity_match = " AND ".join(f'r."{col}" = b."{col}"' for col in IDENTITY_COLUMNS)
+        same_link = "COALESCE(r.external_link, '') = COALESCE(b.external_link, '')"
+        stored_content = ", ".join(f'r."{col}"' for col in CONTENT_COLUMNS)
+        updated_columns = [col for col in CONTENT_COLUMNS if col in columns]
+        update_at = 'd."update_at"' if 'update_at' in columns else "NULL"
+        set_sql = ", ".join([f'"{col}" = d."{col}"' for col in updated_columns]
+                            + [f"update_at = COALESCE({update_at}, CURRENT_TIMESTAMP)"])
+
+        with metrics.db_roundtrip('write_cte'):
+            db_manager.cursor.execute(
+                f"""
+            WITH batch AS (
+                SELECT b.*, COUNT(*) OVER (PARTITION BY {identity_sql}) = 1 AS unique_identity
+                FROM {staging_name} b
+            ), diff AS (
+                SELECT b.*, stored.id AS stored_id, stored.content_hash AS stored_hash,
+                       {_content_hash_sql(columns, 'b', 'stored')} AS batch_hash
+                FROM batch b
+                LEFT JOIN LATERAL (
+                    SELECT r.id, r.content_hash, {stored_content}
+                    FROM {table_name} r
+                    WHERE {identity_match} AND (b.unique_identity OR {same_link})
+                    ORDER BY {same_link} DESC, r.id DESC
+                    LIMIT 1
+                ) stored ON TRUE
+            ), updated AS (
+                UPDATE {table_name} r
+                SET {set_sql}
+                FROM diff d
+                WHERE r.id = d.stored_id AND r.created_at = d.created_at
+                  AND d.batch_hash IS DISTINCT FROM d.stored_hash
+                RETURNING r.id
+            ), inserted AS (
+                INSERT INTO {table_name} ({columns_sql})
+                SELECT {columns_sql} FROM diff WHERE stored_id IS NULL
+                ON CONFLICT {REGULATIONS_CONFLICT_TARGET}
+                RETURNING id
+            ), components AS (
+                INSERT INTO regulations_component (regulations_id, components_id)
+                SELECT id, %s FROM inserted
+            )
+            SELECT 'inserted', id FROM inserted
+            UNION ALL
+            SELECT 'updated', id FROM updated
+            """,
+                (REGULATIONS_COMPONENT_ID,),
+            )
+            rows = db_manager.cursor.fetchall()
+        with metrics.db_roundtrip('commit'):
+            db_manager.connection.commit()
+        inserted_ids = [row_id for kind, row_id in rows if kind == 'inserted']
+        updated_ids = [row_id for kind, row_id in rows if kind == 'updated']
+        return inserted_ids, updated_ids
     except Exception as e:
-        return 0, f"Error inserting regulation components: {str(e)}"
-
+        db_manager.connection.rollback()
+        raise Exception(f"Error writing into {table_name}: {str(e)}")
 
 
 def insert_new_records(db_manager, df, entity):
     """
     Inserta nuevos registros en la base de datos evitando duplicados.
-    Conserva la lógica de idempotencia (title|created_at|external_link),
-    no muta tipos reales del DF que va a BD y sanea 'NaT'/'NaN'/'' -> None
-    antes de insertar para evitar errores de tipos en Postgres.
+    Conserva la lógica de idempotencia (title|created_at|external_link), pero la
+    resuelve en la base de datos: los registros se cargan con COPY a una tabla
+    temporal y se insertan con ON CONFLICT DO NOTHING sobre el índice único de la
+    clave, de modo que el costo depende solo del lote entrante y no del tamaño de
+    la tabla. created_at se lleva como datetime64 (ver utils.dates) y en las
+    columnas de texto 'NaT'/'NaN'/'' se cargan como NULL para evitar errores de
+    tipos en Postgres. El DataFrame no se copia ni se recorre celda por celda:
+    los duplicados del lote se marcan con un hash por fila y la limpieza se hace
+    por bloques al serializar el COPY. Las regulaciones ya guardadas cuyo
+    contenido cambió en la fuente (resumen, enlace...) se actualizan en la misma
+    sentencia y las que no cambiaron no se escriben (ver
+    write_regulations_with_components). Las regulaciones y sus componentes se
+    cargan en una única transacción; si la carga falla se revierte y se lanza la
+    excepción.
+
+    Returns:
+        tuple: (regulaciones insertadas, mensaje con insertadas, actualizadas y sin cambios)
     """
     regulations_table_name = 'regulations'
 
     try:
-        # 1) Cargar existentes para el entity (incluyendo external_link)
-        query = f"""
-            SELECT title, created_at, entity, COALESCE(external_link, '') AS external_link
-            FROM {regulations_table_name}
-            WHERE entity = %s
-        """
-        existing_records = db_manager.execute_query(query, (entity,))
-        if not existing_records:
-            db_df = pd.DataFrame(columns=['title', 'created_at', 'entity', 'external_link'])
-        else:
-            db_df = pd.DataFrame(existing_records, columns=['title', 'created_at', 'entity', 'external_link'])
-
-        print(f"Registros existentes en BD para {entity}: {len(db_df)}")
-
-        # 2) Filtrar el DF por la entidad
-        entity_df = df[df['entity'] == entity].copy()
+        # 1) Filtrar el DF por la entidad (sin copiar si el lote ya es de una sola
+        #    entidad, como en write_to_db). created_at como datetime64; los lotes con
+        #    fechas en texto se convierten de forma vectorizada
+        in_entity = df['entity'].eq(entity)
+        entity_df = normalize_date_columns(df if in_entity.all() else df[in_entity])
         if entity_df.empty:
             return 0, f"No records found for entity {entity}"
 
-        print(f"Registros a procesar para {entity}: {len(entity_df)}")
-
-        # 3) Normalización para comparación (NO mutar el DF real que irá a BD)
-        cmp_entity_df = entity_df.copy()
-        cmp_db_df = db_df.copy()
-
-        if not cmp_db_df.empty:
-            cmp_db_df['created_at'] = cmp_db_df['created_at'].astype(str)
-            cmp_db_df['external_link'] = cmp_db_df['external_link'].fillna('').astype(str)
-            cmp_db_df['title'] = cmp_db_df['title'].astype(str).str.strip()
-
-        cmp_entity_df['created_at'] = cmp_entity_df['created_at'].astype(str)
-        cmp_entity_df['external_link'] = cmp_entity_df['external_link'].fillna('').astype(str)
-        cmp_entity_df['title'] = cmp_entity_df['title'].astype(str).str.strip()
-
-        # 4) Idempotencia con clave única sobre copias de comparación
-        if cmp_db_df.empty:
-            new_records = entity_df.copy()  # ¡Original, sin cambios de tipo!
-            duplicates_found = 0
-            print("No hay registros existentes, todos son nuevos")
-        else:
-            cmp_entity_df['unique_key'] = (
-                cmp_entity_df['title'] + '|' +
-                cmp_entity_df['created_at'] + '|' +
-                cmp_entity_df['external_link']
-            )
-            cmp_db_df['unique_key'] = (
-                cmp_db_df['title'] + '|' +
-                cmp_db_df['created_at'] + '|' +
-                cmp_db_df['external_link']
+        # Conteos y tiempos en una línea de log JSON (stage.insert_new_records)
+        with metrics.stage('insert_new_records', rows_in=len(entity_df), entity=entity) as insert_stage:
+            # 2) Duplicados internos del lote (la BD resuelve los ya existentes)
+            duplicated = batch_duplicates(entity_df)
+            internal_duplicates = int(duplicated.sum())
+            new_records = entity_df[~duplicated] if internal_duplicates else entity_df
+
+            # 3) Insertar las nuevas, actualizar las que cambiaron y sus componentes en
+            #    una sola transacción: los IDs salen de RETURNING id (no de ORDER BY id
+            #    DESC, que falla con cargas concurrentes)
+            inserted_ids, updated_ids = write_regulations_with_components(
+                db_manager, new_records, regulations_table_name
             )
+            total_rows_processed = len(inserted_ids)
+            updated_count = len(updated_ids)
+            duplicates_found = len(new_records) - total_rows_processed - updated_count
 
-            existing_keys = set(cmp_db_df['unique_key'])
-            cmp_entity_df['is_duplicate'] = cmp_entity_df['unique_key'].isin(existing_keys)
-
-            keep_idx = cmp_entity_df.index[~cmp_entity_df['is_duplicate']]
-            new_records = entity_df.loc[keep_idx].copy()  # Original, sin astype(str)
-            duplicates_found = len(entity_df) - len(new_records)
-
-            if duplicates_found > 0:
-                print(f"Duplicados encontrados: {duplicates_found}")
-                duplicate_records = cmp_entity_df[cmp_entity_df['is_duplicate']]
-                print("Ejemplos de duplicados:")
-                for _, row in duplicate_records.head(3).iterrows():
-                    print(f"  - {row['title'][:50]}... | {row['created_at']}")
-
-        # 5) Duplicados internos (sobre original)
-        print(f"Antes de remover duplicados internos: {len(new_records)}")
-        new_records = new_records.drop_duplicates(
-            subset=['title', 'created_at', 'external_link'],
-            keep='first'
-        )
-        internal_duplicates = len(entity_df) - duplicates_found - len(new_records)
-        if internal_duplicates > 0:
-            print(f"Duplicados internos removidos: {internal_duplicates}")
-
-        print(f"Después de remover duplicados internos: {len(new_records)}")
-        print(f"=== DUPLICADOS IDENTIFICADOS: {duplicates_found + internal_duplicates} ===")
-
-        if new_records.empty:
-            return 0, f"No new records found for entity {entity} after duplicate validation"
-
-        # 6) Limpieza estricta de valores antes de insertar (NaT/NaN/'' -> None)
-        def _clean_value(v):
-            import pandas as pd
-            if v is None:
-                return None
-            # NaN/NaT (pandas)
-            if pd.isna(v):
-                return None
-            if isinstance(v, str) and v.strip() in ("", "NaT", "NaN", "nan"):
-                return None
-            return v
-
-        new_records = new_records.applymap(_clean_value)
-
-        # created_at compatible con DATE: Timestamp -> date, '' -> None
-        if 'created_at' in new_records.columns:
-            new_records['created_at'] = new_records['created_at'].apply(
-                lambda x: (x.date() if hasattr(x, 'date') else (None if isinstance(x, str) and x.strip() == "" else x))
-            )
+            insert_stage.rows_out = total_rows_processed + updated_count
+            insert_stage.extra.update(internal_duplicates=internal_duplicates, existing_duplicates=duplicates_found,
+                                      inserted=total_rows_processed, updated=updated_count)
+            metrics.inc('dapper_write_duplicates_total', internal_duplicates, entity=entity, kind='batch')
+            metrics.inc('dapper_write_duplicates_total', duplicates_found, entity=entity, kind='existing')
+            metrics.inc('dapper_write_updated_total', updated_count, entity=entity)
+
+        if total_rows_processed == 0 and updated_count == 0:
+            return 0, f"No new or changed records found for entity {entity} after duplicate validation"
 
-        print(f"Registros finales a insertar: {len(new_records)}")
-
-        # 7) Insertar nuevos registros
-        try:
-            print(f"=== INSERTANDO {len(new_records)} REGISTROS ===")
-            total_rows_processed = db_manager.bulk_insert(new_records, regulations_table_name)
-
-            if total_rows_processed == 0:
-                return 0, f"No records were actually inserted for entity {entity}"
-
-            print(f"Registros insertados exitosamente: {total_rows_processed}")
-
-        except Exception as insert_error:
-            print(f"Error en inserción: {insert_error}")
-            # Si es error por duplicados, reportar sin romper
-            lower_msg = str(insert_error).lower()
-            if "duplicate" in lower_msg or "unique" in lower_msg:
-                print("Error de duplicados detectado - algunos registros ya existían")
-                return 0, f"Some records for entity {entity} were duplicates and skipped"
-            else:
-                raise insert_error
-
-        # 8) Obtener IDs de recién insertados (método simple)
-        print("=== OBTENIENDO IDS DE REGISTROS INSERTADOS ===")
-        new_ids_query = f"""
-            SELECT id FROM {regulations_table_name}
-            WHERE entity = %s
-            ORDER BY id DESC
-            LIMIT %s
-        """
-        new_ids_result = db_manager.execute_query(new_ids_query, (entity, total_rows_processed))
-        new_ids = [row[0] for row in new_ids_result]
-        print(f"IDs obtenidos: {len(new_ids)}")
-
-        # 9) Insertar componentes (si aplica)
-        inserted_count_comp = 0
-        component_message = ""
-        try:
-            if new_ids:
-                inserted_count_comp, component_message = insert_regulations_component(db_manager, new_ids)
-                print(f"Componentes: {component_message}")
-        except Exception as comp_error:
-            print(f"Error insertando componentes: {comp_error}")
-            component_message = f"Error inserting components: {str(comp_error)}"
-
-        # 10) Mensaje final
+        # 4) Mensaje final
         total_duplicates = duplicates_found + internal_duplicates
         stats = (
             f"Processed: {len(entity_df)} | "
-            f"Existing: {len(db_df)} | "
-            f"Duplicates skipped: {total_duplicates} | "
+            f"Unchanged or duplicated: {total_duplicates} | "
+            f"Updated: {updated_count} | "
             f"New inserted: {total_rows_processed}"
         )
-        message = f"Entity {entity}: {stats}. {component_message}"
-        print("=== RESULTADO FINAL ===")
-        print(message)
-        print("=" * 50)
-
+        message = f"Entity {entity}: {stats}. Successfully inserted {total_rows_processed} regulation components"
         return total_rows_processed, message
 
     except Exception as e:
@@ -199,7 +204,7 @@ def insert_new_records(db_manager, df, entity):
         print(f"ERROR CRÍTICO: {error_msg}")
         import traceback
         print(traceback.format_exc())
-        return 0, error_msg
+        raise Exception(error_msg)
 
 
 
@@ -207,13 +212,13 @@ def insert_new_records(db_manager, df, entity):
 
 def write_to_db(df: pd.DataFrame):
     """
-    Inserta los datos validados en la base de datos usando DatabaseManager e insert_new_records.
+    Inserta los datos validados en la base de datos usando DatabaseManager e insert_new_records,
+    una vez por cada entidad presente en el DataFrame.
     Si ocurre un error, se lanza una excepción para que Airflow marque el task como FAILED.
     """
-    from persistence.writer import insert_new_records  # evita import circular
-    from utils.db import DatabaseManager
-
-    ENTITY_VALUE = 'Agencia Nacional de Infraestructura'  # puedes parametrizarlo si luego manejas varias entidades
+    # Solo la tarea de Airflow la necesita: el resto del módulo (insert_new_records)
+    # también se usa fuera de Airflow, p. ej. desde streaming.executor
+    from airflow.exceptions import AirflowException
 
     if df.empty:
         msg = "⚠️ No hay datos válidos para insertar en la base de datos."
@@ -222,21 +227,22 @@ def write_to_db(df: pd.DataFrame):
 
     db_manager = DatabaseManager()
     inserted_count = 0
-    message = ""
 
     try:
         # 🔌 Conexión
         if not db_manager.connect():
             raise AirflowException("❌ No se pudo conectar a la base de datos.")
 
-        # 💾 Inserción de datos
-        inserted_count, message = insert_new_records(db_manager, df, ENTITY_VALUE)
+        # 💾 Inserción de datos por entidad
+        for entity, entity_df in df.groupby('entity', sort=False):
+            entity_count, message = insert_new_records(db_manager, entity_df, entity)
+            inserted_count += entity_count
+            print(f"🪶 Detalle: {message}")
 
         if inserted_count == 0:
-            raise AirflowException(f"❌ No se insertaron registros. Detalle: {message}")
-
-        print(f"✅ Inserción completada: {inserted_count} registros insertados.")
-        print(f"🪶 Detalle: {message}")
+            print("⚠️ No se insertaron registros: todos ya existían en la base de datos.")
+        else:
+            print(f"✅ Inserción completada: {inserted_count} registros insertados.")
         return inserted_count
 
     except Exception as e:
@@ -246,30 +252,3 @@ def write_to_db(df: pd.DataFrame):
 
     finally:
         db_manager.close()
-
-    """
-    Wrapper que inserta los datos validados en la base de datos.
-    Utiliza DatabaseManager e insert_new_records.
-    """
-    from persistence.writer import insert_new_records  # evita import circular
-
-    ENTITY_VALUE = 'Agencia Nacional de Infraestructura'  # o el valor que uses en el scraper
-
-    if df.empty:
-        print("⚠️ No hay datos válidos para insertar en la base de datos.")
-        return
-
-    db_manager = DatabaseManager()
-    try:
-        if not db_manager.connect():
-            print("❌ No se pudo conectar a la base de datos.")
-            return
-        
-        inserted_count, message = insert_new_records(db_manager, df, ENTITY_VALUE)
-        print(f"✅ Inserción completada: {inserted_count} registros insertados.")
-        print(f"🪶 Detalle: {message}")
-
-    except Exception as e:
-        print(f"❌ Error durante la escritura en DB: {str(e)}")
-    finally:
-        db_manager.close()
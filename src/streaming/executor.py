@@ -0,0 +1,323 @@
+"""
+ETL en streaming: extracción, validación y escritura corren al mismo tiempo
+sobre micro-lotes de STREAM_BATCH_ROWS registros conectados por colas acotadas.
+
+- Un hilo recorre los listados (iter_regulations) y arma los micro-lotes como
+  DataFrame (created_at ya como datetime64, ver utils.dates).
+- Otro hilo los valida con el RuleSet compilado una sola vez.
+- Otro hilo los escribe con insert_new_records sobre una única conexión.
+
+Entre dos etapas caben STREAM_QUEUE_BATCHES lotes: si la escritura se atrasa,
+la validación y la extracción se bloquean (backpressure). En memoria hay a lo
+sumo unos pocos lotes sin importar el tamaño del archivo, y las primeras filas
+llegan a Postgres mientras se siguen descargando páginas. Los watermarks se
+guardan solo después de escribir todos los lotes, igual que en el DAG por
+etapas; si la corrida falla a mitad, los lotes ya escritos se vuelven a
+extraer en la siguiente y el writer los trata como duplicados.
+
+Uso:
+    python -m streaming.executor                                  # delta de todas las fuentes
+    python -m streaming.executor --backfill --source ani --batch-rows 2000
+"""
+import argparse
+import contextlib
+import functools
+import os
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from extraction.pipeline import DEFAULT_PARSE_WORKERS
+from extraction.scheduler import configure_rate_limits
+from extraction.scraper import PageError, delta_start, iter_regulations
+from extraction.sources import list_sources
+from extraction.watermark import WatermarkStore, advance_watermark
+from persistence.writer import insert_new_records
+from utils import metrics
+from utils.dates import normalize_date_columns, to_date
+from utils.db import DatabaseManager
+from validation.validator import ENGINE_VECTORIZED, RuleSet
+
+STREAM_BATCH_ROWS = int(os.getenv("STREAM_BATCH_ROWS", "5000"))
+STREAM_QUEUE_BATCHES = int(os.getenv("STREAM_QUEUE_BATCHES", "4"))
+
+# Tiempo máximo que un hilo espera en una cola antes de revisar si debe detenerse
+_POLL_SECONDS = 0.1
+# Marca de fin de los lotes en las colas
+_END = object()
+
+
+def run_stages(batches, stages, max_pending=STREAM_QUEUE_BATCHES):
+    """
+    Ejecuta las etapas sobre los lotes de batches, cada una en su propio hilo y
+    conectadas por colas de max_pending lotes (backpressure como en
+    extraction.pipeline.fetch_parse_pipeline). Si una etapa falla, las demás se
+    detienen y la excepción se relanza aquí.
+
+    Args:
+        batches (iterable): Lotes de entrada; se recorre en un hilo propio y, si es
+            un generador, se cierra al detenerse
+        stages (list): (nombre, fn) en orden; fn(lote) retorna el lote para la etapa
+            siguiente (None o vacío: no pasa nada). El resultado de la última se descarta.
+        max_pending (int): Lotes en cola entre dos etapas
+
+    Returns:
+        dict: por etapa, lotes procesados ('batches'), tiempo ocupado ('seconds') y
+            mayor ocupación de su cola de entrada ('max_queued')
+    """
+    queues = [queue.Queue(maxsize=max(1, max_pending)) for _ in stages]
+    stop = threading.Event()
+    errors = []
+    stats = {name: {'batches': 0, 'seconds': 0.0, 'max_queued': 0} for name, _ in stages}
+    names = [name for name, _ in stages]
+
+    def _fail(error):
+        errors.append(error)
+        stop.set()
+
+    def _put(index, item):
+        while not stop.is_set():
+            try:
+                queues[index].put(item, timeout=_POLL_SECONDS)
+            except queue.Full:
+                continue
+            queue_stats = stats[names[index]]
+            queue_stats['max_queued'] = max(queue_stats['max_queued'], queues[index].qsize())
+            return True
+        return False
+
+    def _get(index):
+        while not stop.is_set():
+            try:
+                return queues[index].get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _produce():
+        try:
+            for batch in batches:
+                if not _put(0, batch):
+                    return
+            _put(0, _END)
+        except Exception as e:
+            _fail(e)
+        finally:
+            close = getattr(batches, 'close', None)
+            if close is not None:
+                close()
+
+    def _work(index, name, fn):
+        is_last = index == len(stages) - 1
+        try:
+            while True:
+                batch = _get(index)
+                if batch is _END:
+                    if not is_last:
+                        _put(index + 1, _END)
+                    return
+                start = time.perf_counter()
+                result = fn(batch)
+                stats[name]['seconds'] += time.perf_counter() - start
+                stats[name]['batches'] += 1
+                if not is_last and result is not None and len(result) and not _put(index + 1, result):
+                    return
+        except Exception as e:
+            _fail(e)
+
+    threads = [threading.Thread(target=_produce, name='stream-source', daemon=True)]
+    threads += [
+        threading.Thread(target=_work, args=(index, name, fn), name=f'stream-{name}', daemon=True)
+        for index, (name, fn) in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    finally:
+        stop.set()
+    if errors:
+        raise errors[0]
+    for name in stats:
+        stats[name]['seconds'] = round(stats[name]['seconds'], 4)
+    return stats
+
+
+def write_batch(db_manager, df):
+    """
+    Escribe un micro-lote validado con insert_new_records, una vez por entidad.
+
+    Returns:
+        int: regulaciones insertadas
+    """
+    inserted = 0
+    for entity, entity_df in df.groupby('entity', sort=False):
+        entity_count, message = insert_new_records(db_manager, entity_df, entity)
+        inserted += entity_count
+        print(f"🪶 Detalle: {message}")
+    return inserted
+
+
+def _is_later(record, other):
+    record_date = to_date(record.get('created_at'))
+    other_date = to_date(other.get('created_at'))
+    return record_date is not None and (other_date is None or record_date > other_date)
+
+
+def stream_regulations(sources=None, backfill=False, batch_rows=STREAM_BATCH_ROWS,
+                       max_pending=STREAM_QUEUE_BATCHES, concurrency=3, parse_workers=None, rules_path=None,
+                       engine=ENGINE_VECTORIZED, write_fn=None, store=None, save_watermarks=True, verbose=False):
+    """
+    Extrae, valida y escribe las regulaciones de las fuentes en micro-lotes, con
+    las tres etapas corriendo al mismo tiempo (ver run_stages).
+
+    Una fuente que falla no detiene a las demás: sus lotes ya extraídos se
+    escriben, pero su watermark no avanza y se retoma en la próxima corrida.
+    Esto incluye una página del listado que no se pudo descargar o parsear
+    (PageError): no se toma como el final del listado.
+
+    Args:
+        sources (list): Fuentes (SourceAdapter); por defecto list_sources()
+        backfill (bool): Recorrer el archivo completo de cada fuente en vez del delta
+            desde su watermark
+        batch_rows (int): Registros por micro-lote
+        max_pending (int): Micro-lotes en cola entre dos etapas
+        concurrency (int): Páginas que se descargan por adelantado
+        parse_workers (int): Procesos de parseo (en backfill, DEFAULT_PARSE_WORKERS
+            si no se indica)
+        rules_path (str): Reglas de validación (por defecto validation/rules.json)
+        engine (str): Motor de validación
+        write_fn (callable): write_fn(df) -> regulaciones insertadas. Por defecto
+            write_batch sobre una conexión del pool
+        store (WatermarkStore): Dónde se leen y guardan los watermarks
+        save_watermarks (bool): Guardar los watermarks al terminar
+
+    Returns:
+        dict: registros extraídos, válidos, descartados e insertados, lotes, fuentes
+            con error, segundos hasta la primera escritura, watermarks y
+            estadísticas por etapa
+    """
+    sources = list_sources() if sources is None else sources
+    configure_rate_limits(sources)
+    store = store or WatermarkStore()
+    if backfill and parse_workers is None:
+        parse_workers = DEFAULT_PARSE_WORKERS
+    batch_rows = max(1, batch_rows)
+    summary = {
+        'extracted': 0, 'valid': 0, 'rejected': 0, 'inserted': 0, 'batches': 0,
+        'failed_sources': [], 'first_write_seconds': None, 'watermarks': [],
+    }
+    start = time.perf_counter()
+
+    def _frame(records):
+        summary['extracted'] += len(records)
+        summary['batches'] += 1
+        return normalize_date_columns(pd.DataFrame(records))
+
+    def _extract_batches():
+        batch = []
+        for source in sources:
+            try:
+                watermark, since, stop_at_link = (None, None, None) if backfill else delta_start(source, store)
+                page_hashes, first, latest = {}, None, None
+                for record in iter_regulations(
+                    since=since, concurrency=concurrency, verbose=verbose, parse_workers=parse_workers,
+                    stop_at_link=stop_at_link, page_hashes=page_hashes,
+                    known_page_hashes=(watermark or {}).get('page_hashes'), source=source,
+                ):
+                    first = first or record
+                    if latest is None or _is_later(record, latest):
+                        latest = record
+                    batch.append(record)
+                    if len(batch) >= batch_rows:
+                        yield _frame(batch)
+                        batch = []
+            except PageError as e:
+                # Las páginas siguientes no se recorrieron: avanzar el watermark
+                # dejaría sus registros fuera de las próximas corridas
+                print(f"Error en la fuente {source.name}, listado incompleto: {e}")
+                summary['failed_sources'].append(source.name)
+                continue
+            except Exception as e:
+                print(f"Error en la fuente {source.name}: {e}")
+                summary['failed_sources'].append(source.name)
+                continue
+            # Del lote de la fuente, advance_watermark solo usa el primer registro
+            # (top_link) y la fecha más reciente
+            seen = [record for record in (first, latest) if record is not None]
+            summary['watermarks'].append(
+                advance_watermark(watermark, source.entity, source.listing_url, seen, page_hashes)
+            )
+        if batch:
+            yield _frame(batch)
+
+    with contextlib.ExitStack() as stack:
+        if write_fn is None:
+            write_fn = functools.partial(write_batch, stack.enter_context(DatabaseManager()))
+        ruleset = RuleSet.load(rules_path)
+
+        def _validate(df):
+            with metrics.stage('stream_validate', rows_in=len(df), log=False, engine=engine) as validate_stage:
+                valid_df, invalid_df = ruleset.validate(df, engine=engine, verbose=verbose)
+                validate_stage.rows_out = len(valid_df)
+            summary['valid'] += len(valid_df)
+            summary['rejected'] += len(invalid_df)
+            return valid_df
+
+        def _write(df):
+            with metrics.stage('stream_write', rows_in=len(df), log=False) as write_stage:
+                inserted = write_fn(df)
+                write_stage.rows_out = inserted
+            summary['inserted'] += inserted
+            if summary['first_write_seconds'] is None:
+                summary['first_write_seconds'] = round(time.perf_counter() - start, 3)
+
+        with metrics.stage('stream', backfill=backfill) as stream_stage:
+            summary['stages'] = run_stages(_extract_batches(), [('validate', _validate), ('write', _write)],
+                                           max_pending)
+            stream_stage.rows_in = summary['extracted']
+            stream_stage.rows_out = summary['inserted']
+            stream_stage.extra.update(
+                batches=summary['batches'], valid=summary['valid'], rejected=summary['rejected'],
+                failed_sources=len(summary['failed_sources']), first_write_seconds=summary['first_write_seconds'],
+            )
+
+    failed = summary['failed_sources']
+    if failed and not summary['watermarks']:
+        raise Exception(f"Falló la extracción de todas las fuentes: {', '.join(failed)}")
+    if failed:
+        print(f"⚠️ Fuentes con error (se reintentan en la próxima corrida): {', '.join(failed)}")
+    if save_watermarks:
+        for watermark in summary['watermarks']:
+            store.save(watermark)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", action="append", help="fuente a procesar (se puede repetir); por defecto todas")
+    parser.add_argument("--backfill", action="store_true", help="recorrer el archivo completo en vez del delta")
+    parser.add_argument("--batch-rows", type=int, default=STREAM_BATCH_ROWS, help="registros por micro-lote")
+    parser.add_argument("--queue-batches", type=int, default=STREAM_QUEUE_BATCHES,
+                        help="micro-lotes en cola entre dos etapas")
+    parser.add_argument("--concurrency", type=int, default=3)
+    parser.add_argument("--parse-workers", type=int, default=None)
+    parser.add_argument("--rules", default=None, help="archivo de reglas de validación")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    summary = stream_regulations(
+        sources=list_sources(args.source), backfill=args.backfill, batch_rows=args.batch_rows,
+        max_pending=args.queue_batches, concurrency=args.concurrency, parse_workers=args.parse_workers,
+        rules_path=args.rules, verbose=args.verbose,
+    )
+    print(f"✅ Streaming: {summary['extracted']} extraídos, {summary['valid']} válidos, "
+          f"{summary['rejected']} descartados, {summary['inserted']} insertados en {summary['batches']} lotes "
+          f"(primera escritura a los {summary['first_write_seconds']}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import uuid
+
+import numpy as np
+import pyarrow as pa
+
+# Carpeta donde las tareas del DAG dejan los lotes intermedios. Con varios workers
+# debe apuntar a un volumen compartido.
+ARTIFACTS_DIR = os.getenv("DAPPER_ARTIFACTS_DIR", os.path.join(tempfile.gettempdir(), "dapper_artifacts"))
+
+ARTIFACT_EXTENSION = ".arrow"
+
+
+def _safe_name(value):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", str(value))
+
+
+def run_dir(run_id, base_dir=None):
+    """
+    Carpeta de artefactos de una ejecución del DAG.
+    """
+    return os.path.join(base_dir or ARTIFACTS_DIR, _safe_name(run_id))
+
+
+def schema_hash(schema):
+    """
+    Hash corto del esquema Arrow (nombres y tipos de columna, sin metadatos).
+    """
+    return hashlib.sha256(schema.remove_metadata().to_string().encode("utf-8")).hexdigest()[:16]
+
+
+def write_artifact(df, name, run_id, base_dir=None):
+    """
+    Guarda un DataFrame como archivo Arrow IPC sin comprimir, de modo que pueda
+    leerse con memory-map. La escritura es atómica (archivo temporal + rename).
+
+    Returns:
+        dict: Referencia para XCom: {'path', 'rows', 'schema_hash'}
+    """
+    directory = run_dir(run_id, base_dir)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, _safe_name(name) + ARTIFACT_EXTENSION)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return {"path": path, "rows": table.num_rows, "schema_hash": schema_hash(table.schema)}
+
+
+def read_artifact(ref):
+    """
+    Lee un artefacto escrito por write_artifact con memory-map y lo retorna como
+    DataFrame (con los mismos dtypes con que se escribió).
+
+    El DataFrame es una copia que no comparte memoria con el archivo: se puede
+    modificar y el archivo se puede borrar. La conversión es columna por columna
+    (split_blocks) y libera cada columna Arrow apenas se convierte
+    (self_destruct), así que no se juntan en memoria la tabla completa y el
+    DataFrame.
+
+    Raises:
+        ValueError: si el esquema o la cantidad de filas no coinciden con la referencia
+    """
+    with pa.memory_map(ref["path"], "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+
+        actual_hash = schema_hash(table.schema)
+        if ref.get("schema_hash") and actual_hash != ref["schema_hash"]:
+            raise ValueError(f"El esquema de {ref['path']} ({actual_hash}) no coincide con {ref['schema_hash']}")
+        if ref.get("rows") is not None and table.num_rows != ref["rows"]:
+            raise ValueError(f"{ref['path']} tiene {table.num_rows} filas, se esperaban {ref['rows']}")
+
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        del table
+        # Las columnas que Arrow convierte sin copia (numéricas sin nulos) apuntan
+        # al archivo mapeado y son de solo lectura
+        for column in df.columns:
+            values = df[column].values
+            if isinstance(values, np.ndarray) and not values.flags.writeable:
+                df[column] = df[column].copy()
+        return df
+
+
+def delete_run_artifacts(run_id, base_dir=None):
+    """
+    Elimina los artefactos de una ejecución (p. ej. tras escribir en la base de datos).
+    """
+    shutil.rmtree(run_dir(run_id, base_dir), ignore_errors=True)
@@ -0,0 +1,113 @@
+from datetime import date, datetime
+
+import pandas as pd
+
+# Formatos de fecha de las fuentes que no vienen en ISO (p. ej. el texto de la
+# celda de fecha de ANI); las fechas ISO (atributo content del span, con o sin
+# hora) se reconocen siempre
+DEFAULT_DATE_FORMATS = ('%d/%m/%Y',)
+ISO_DATE_FORMAT = '%Y-%m-%d'
+
+# Columnas de fecha de los registros que se llevan como datetime64 en los DataFrames
+DATE_COLUMNS = ('created_at',)
+
+
+def _iso_head(text):
+    """
+    Parte de fecha de un valor ISO: lo anterior a la 'T' o al espacio de la hora.
+    """
+    return text.split('T', 1)[0].split(' ', 1)[0]
+
+
+def to_date(value, formats=DEFAULT_DATE_FORMATS):
+    """
+    Convierte un valor suelto (str ISO o en alguno de formats, datetime, date o
+    Timestamp) a date, ignorando la hora y la zona horaria. Retorna None si está
+    vacío o no se reconoce.
+    """
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        return None
+    text = value.strip()
+    if not text:
+        return None
+    try:
+        return date.fromisoformat(_iso_head(text))
+    except ValueError:
+        pass
+    for date_format in formats:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_dates(values, formats=DEFAULT_DATE_FORMATS):
+    """
+    Versión vectorizada de to_date: convierte una Series (o lista) de fechas a
+    datetime64[ns] sin zona horaria, al inicio del día. Los strings se leen con
+    pd.to_datetime primero como ISO (la parte anterior a la hora) y los que no
+    coinciden con cada formato de formats; lo que no se reconoce queda NaT.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if getattr(series.dt, 'tz', None) is not None:
+            series = series.dt.tz_localize(None)
+        return series.dt.normalize()
+
+    result = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    if pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        is_str = series.notna()
+    elif series.dtype == object:
+        is_str = series.map(lambda v: isinstance(v, str)).astype(bool)
+    else:
+        is_str = pd.Series(False, index=series.index)
+
+    if is_str.any():
+        text = series[is_str]
+        # exact=False toma la fecha ISO al inicio aunque siga la hora o la zona
+        # horaria, sin partir cada string
+        parsed = pd.to_datetime(text, format=ISO_DATE_FORMAT, errors='coerce', exact=False)
+        for date_format in formats:
+            missing = parsed.isna()
+            if not missing.any():
+                break
+            parsed[missing] = pd.to_datetime(text[missing].str.strip(), format=date_format, errors='coerce')
+        result[is_str] = parsed
+
+    # Valores que ya son fechas (datetime, date, Timestamp) en columnas object
+    others = ~is_str & series.notna()
+    if others.any():
+        converted = pd.to_datetime(series[others].map(to_date), errors='coerce')
+        result[others] = converted
+    return result.dt.normalize()
+
+
+def format_dates(values):
+    """
+    Series de fechas como strings 'YYYY-MM-DD' (None donde no hay fecha).
+    """
+    dates = parse_dates(values)
+    return dates.dt.strftime(ISO_DATE_FORMAT).astype(object).where(dates.notna(), None)
+
+
+def normalize_date_columns(df, columns=DATE_COLUMNS, formats=DEFAULT_DATE_FORMATS):
+    """
+    Retorna df con las columnas de fecha presentes convertidas a datetime64 (ver
+    parse_dates). Las columnas que ya son datetime64 sin zona horaria no se tocan.
+    """
+    converted = {}
+    for column in columns:
+        if column not in df.columns:
+            continue
+        series = df[column]
+        if pd.api.types.is_datetime64_dtype(series) and getattr(series.dt, 'tz', None) is None:
+            continue
+        converted[column] = parse_dates(series, formats)
+    return df.assign(**converted) if converted else df
@@ -1,28 +1,162 @@
 
+import atexit
+import io
 import os
+import threading
+import uuid
 import psycopg2
 import pandas as pd
+from psycopg2.extras import execute_values
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 
-def get_connection():
-    conn = psycopg2.connect(
+from utils import metrics
+
+# Filas por bloque al serializar un DataFrame para COPY (acota la memoria del buffer)
+COPY_CHUNK_ROWS = int(os.getenv("DB_COPY_CHUNK_ROWS", "50000"))
+
+# Pool de conexiones compartido por las etapas del pipeline: DB_POOL_MIN conexiones
+# se mantienen abiertas y DB_POOL_MAX es el máximo prestado a la vez. Con todas
+# prestadas, quien pide una espera hasta DB_POOL_TIMEOUT segundos a que se devuelva
+# alguna y recién entonces falla con PoolError
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "60"))
+
+# Filas que trae cada viaje de un cursor del lado del servidor (iter_query)
+ITER_BATCH_ROWS = int(os.getenv("DB_ITER_BATCH_ROWS", "5000"))
+
+# Textos que se cargan como NULL (una vez quitados los espacios), además de los
+# nulos de pandas
+NULL_TOKENS = ("", "NaT", "NaN", "nan")
+# Tipos inferidos de columnas object sobre los que aplica el accesor .str
+_STR_INFERRED_TYPES = ("string", "mixed", "mixed-integer", "empty")
+
+
+def null_token_mask(series, null_tokens=NULL_TOKENS):
+    """
+    Máscara vectorizada de las celdas de texto de series que, sin espacios al
+    inicio o al final, son alguno de null_tokens. Retorna None si la columna no
+    tiene textos.
+    """
+    if series.dtype != object or pd.api.types.infer_dtype(series, skipna=True) not in _STR_INFERRED_TYPES:
+        return None
+    return series.str.strip().isin(null_tokens)
+
+
+def _connection_kwargs():
+    return dict(
         dbname=os.getenv("POSTGRES_DB", "airflow"),
         user=os.getenv("POSTGRES_USER", "airflow"),
         password=os.getenv("POSTGRES_PASSWORD", "airflow"),
-        host="postgres",  # nombre del servicio en docker-compose
-        port="5432"
+        host=os.getenv("POSTGRES_HOST", "postgres"),  # nombre del servicio en docker-compose
+        port=os.getenv("POSTGRES_PORT", "5432"),
     )
-    return conn
+
+
+def get_connection():
+    """
+    Abre una conexión nueva, fuera del pool.
+    """
+    return psycopg2.connect(**_connection_kwargs())
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool que, con maxconn conexiones prestadas, espera hasta
+    timeout segundos a que se devuelva una en lugar de lanzar PoolError de
+    inmediato: las fuentes en paralelo, el writer del streaming y la descarga de
+    documentos comparten el pool y un pico de demanda no es una caída de la base.
+    """
+
+    def __init__(self, minconn, maxconn, *args, timeout=DB_POOL_TIMEOUT, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError(f"Pool de conexiones agotado: {self.maxconn} prestadas durante más de "
+                            f"{self.timeout:g}s (ver DB_POOL_MAX)")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        super().putconn(conn, key, close)
+        self._slots.release()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Retorna el pool de conexiones del proceso (BlockingConnectionPool), creándolo
+    la primera vez. Si el proceso se bifurcó (p. ej. un worker de Airflow), se crea
+    un pool nuevo en lugar de compartir los sockets del proceso padre.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool.closed or _pool_pid != os.getpid():
+            _pool = BlockingConnectionPool(DB_POOL_MIN, max(DB_POOL_MIN, DB_POOL_MAX), **_connection_kwargs())
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def close_pool():
+    """
+    Cierra todas las conexiones del pool. Se ejecuta al terminar el proceso (p. ej.
+    un worker de Airflow o la CLI), para que Postgres no vea conexiones cortadas.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+
+
+def release_connection(conn):
+    """
+    Devuelve una conexión al pool descartando la transacción pendiente; si quedó
+    cerrada se descarta.
+    """
+    pool = get_pool()
+    if conn.closed:
+        pool.putconn(conn, close=True)
+        return
+    try:
+        conn.rollback()
+    except psycopg2.Error:
+        pool.putconn(conn, close=True)
+        return
+    pool.putconn(conn)
+
+
+atexit.register(close_pool)
+
 
 class DatabaseManager:
     def __init__(self):
         self.connection = None
         self.cursor = None
+        self._pooled = False
+
+    def __enter__(self):
+        if not self.connect():
+            raise Exception("Database not connected")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
     def connect(self):
         try:
-          
-            
-            self.connection = get_connection()
+            self.connection = get_pool().getconn()
+            self._pooled = True
             self.cursor = self.connection.cursor()
             return True
         except Exception as e:
@@ -33,30 +167,201 @@ class DatabaseManager:
         if self.cursor:
             self.cursor.close()
         if self.connection:
-            self.connection.close()
+            if self._pooled:
+                release_connection(self.connection)
+            else:
+                self.connection.close()
+        self.connection = None
+        self.cursor = None
+        self._pooled = False
 
     def execute_query(self, query, params=None):
         if not self.cursor:
             raise Exception("Database not connected")
-        self.cursor.execute(query, params)
-        return self.cursor.fetchall()
+        with metrics.db_roundtrip('query'):
+            self.cursor.execute(query, params)
+            return self.cursor.fetchall()
+
+    def iter_query(self, query, params=None, batch_size=ITER_BATCH_ROWS):
+        """
+        Recorre el resultado de una consulta con un cursor con nombre (del lado del
+        servidor), trayendo batch_size filas por viaje en lugar de cargar todo el
+        resultado en memoria. El cursor vive dentro de la transacción actual.
+
+        Yields:
+            tuple: Cada fila del resultado
+        """
+        if not self.connection:
+            raise Exception("Database not connected")
+        with self.connection.cursor(name=f"dapper_iter_{uuid.uuid4().hex[:12]}") as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(query, params)
+            for row in cursor:
+                yield row
 
     def bulk_insert(self, df, table_name):
         if not self.connection or not self.cursor:
             raise Exception("Database not connected")
         
         try:
-            df = df.astype(object).where(pd.notnull(df), None)
             columns_for_sql = ", ".join([f'"{col}"' for col in df.columns])
             placeholders = ", ".join(["%s"] * len(df.columns))
             
             insert_query = f"INSERT INTO {table_name} ({columns_for_sql}) VALUES ({placeholders})"
-            records_to_insert = [tuple(x) for x in df.values]
             
-            self.cursor.executemany(insert_query, records_to_insert)
-            self.connection.commit()
+            # executemany envía una sentencia por fila
+            with metrics.stage('bulk_insert', rows_in=len(df), log=False, table=table_name) as insert_stage:
+                with metrics.db_roundtrip('executemany', count=len(df)):
+                    self.cursor.executemany(insert_query, self._iter_records(df))
+                with metrics.db_roundtrip('commit'):
+                    self.connection.commit()
+                insert_stage.rows_out = len(df)
             return len(df)
         except Exception as e:
             self.connection.rollback()
             raise Exception(f"Error inserting into {table_name}: {str(e)}")
- 
\ No newline at end of file
+ 
+
+    @staticmethod
+    def _columns_sql(columns):
+        return ", ".join([f'"{col}"' for col in columns])
+
+    @staticmethod
+    def _iter_records(df, chunk_size=COPY_CHUNK_ROWS):
+        """
+        Filas de df como tuplas con None en lugar de NaN/NaT. La conversión a object
+        se hace por bloques de chunk_size filas, no sobre todo el DataFrame.
+        """
+        for start in range(0, len(df), chunk_size):
+            chunk = df.iloc[start:start + chunk_size]
+            yield from chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+
+    @staticmethod
+    def _prepare_chunk(chunk, null_tokens=()):
+        """
+        Ajusta un bloque para serializarlo como CSV de COPY: las columnas float que
+        solo tienen enteros (p. ej. int con NaN) se escriben como enteros y, en las
+        columnas de texto, los valores de null_tokens se cargan como NULL. Solo se
+        copia el bloque si alguna columna cambia.
+        """
+        changed = {}
+        for col in chunk.columns:
+            series = chunk[col]
+            if pd.api.types.is_float_dtype(series):
+                values = series.dropna()
+                if (values == values.round()).all():
+                    changed[col] = series.astype("Int64")
+            elif null_tokens:
+                mask = null_token_mask(series, null_tokens)
+                if mask is not None and mask.any():
+                    changed[col] = series.mask(mask, None)
+        return chunk.assign(**changed) if changed else chunk
+
+    def copy_dataframe(self, df, table_name, chunk_size=COPY_CHUNK_ROWS, null_tokens=()):
+        """
+        Carga un DataFrame en una tabla con COPY FROM STDIN (CSV), por bloques
+        de chunk_size filas serializados en un buffer en memoria. No hace commit.
+
+        Los valores nulos, los strings vacíos y los textos de null_tokens (p. ej.
+        NULL_TOKENS) se cargan como NULL; el DataFrame recibido no se modifica.
+        """
+        if not self.connection or not self.cursor:
+            raise Exception("Database not connected")
+
+        copy_query = f"COPY {table_name} ({self._columns_sql(df.columns)}) FROM STDIN WITH (FORMAT csv)"
+        for start in range(0, len(df), chunk_size):
+            chunk = self._prepare_chunk(df.iloc[start:start + chunk_size], null_tokens)
+            buffer = io.StringIO()
+            chunk.to_csv(buffer, header=False, index=False, na_rep="")
+            buffer.seek(0)
+            with metrics.db_roundtrip('copy'):
+                self.cursor.copy_expert(copy_query, buffer)
+        return len(df)
+
+    def create_staging_table(self, table_name, columns):
+        """
+        Crea una tabla temporal con los tipos de las columnas indicadas de table_name,
+        sin restricciones ni defaults. Se elimina sola al terminar la transacción.
+        """
+        staging_name = f"_stage_{table_name}_{uuid.uuid4().hex[:8]}"
+        with metrics.db_roundtrip('ddl'):
+            self.cursor.execute(
+                f"CREATE TEMP TABLE {staging_name} ON COMMIT DROP AS "
+                f"SELECT {self._columns_sql(columns)} FROM {table_name} WITH NO DATA"
+            )
+        return staging_name
+
+    def bulk_copy(self, df, table_name, returning_ids=True, chunk_size=COPY_CHUNK_ROWS, on_conflict=None,
+                  commit=True):
+        """
+        Inserta un DataFrame con COPY FROM STDIN.
+
+        Si returning_ids u on_conflict, los datos se copian a una tabla temporal y de
+        ahí se insertan con INSERT ... SELECT [ON CONFLICT ...] RETURNING id; si no,
+        se copian directo a la tabla destino.
+
+        Returns:
+            list | int: IDs insertados si returning_ids, o cantidad de filas insertadas
+        """
+        if not self.connection or not self.cursor:
+            raise Exception("Database not connected")
+
+        try:
+            if not returning_ids and not on_conflict:
+                inserted = self.copy_dataframe(df, table_name, chunk_size)
+            else:
+                columns_sql = self._columns_sql(df.columns)
+                staging_name = self.create_staging_table(table_name, df.columns)
+                self.copy_dataframe(df, staging_name, chunk_size)
+
+                insert_query = f"INSERT INTO {table_name} ({columns_sql}) SELECT {columns_sql} FROM {staging_name}"
+                if on_conflict:
+                    insert_query += f" ON CONFLICT {on_conflict}"
+                with metrics.db_roundtrip('insert_select'):
+                    if returning_ids:
+                        self.cursor.execute(insert_query + " RETURNING id")
+                        inserted = [row[0] for row in self.cursor.fetchall()]
+                    else:
+                        self.cursor.execute(insert_query)
+                        inserted = self.cursor.rowcount
+
+            if commit:
+                with metrics.db_roundtrip('commit'):
+                    self.connection.commit()
+            return inserted
+        except Exception as e:
+            self.connection.rollback()
+            raise Exception(f"Error copying into {table_name}: {str(e)}")
+
+    def bulk_insert_values(self, df, table_name, returning_ids=False, page_size=1000, on_conflict=None,
+                           commit=True):
+        """
+        Alternativa a bulk_copy con psycopg2.extras.execute_values: envía las filas
+        en sentencias INSERT de page_size filas (en lugar de una por fila).
+
+        Returns:
+            list | int: IDs insertados si returning_ids, o cantidad de filas enviadas
+        """
+        if not self.connection or not self.cursor:
+            raise Exception("Database not connected")
+
+        try:
+            insert_query = f"INSERT INTO {table_name} ({self._columns_sql(df.columns)}) VALUES %s"
+            if on_conflict:
+                insert_query += f" ON CONFLICT {on_conflict}"
+            if returning_ids:
+                insert_query += " RETURNING id"
+
+            # execute_values envía una sentencia por página de page_size filas
+            with metrics.db_roundtrip('execute_values', count=-(-len(df) // page_size)):
+                result = execute_values(self.cursor, insert_query, self._iter_records(df), page_size=page_size,
+                                        fetch=returning_ids)
+            inserted = [row[0] for row in result] if returning_ids else len(df)
+
+            if commit:
+                with metrics.db_roundtrip('commit'):
+                    self.connection.commit()
+            return inserted
+        except Exception as e:
+            self.connection.rollback()
+            raise Exception(f"Error inserting into {table_name}: {str(e)}")
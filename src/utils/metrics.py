@@ -0,0 +1,260 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Límites (en segundos) de los histogramas de latencia
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Logs JSON de las etapas: DAPPER_METRICS_LOG=off los silencia (las métricas se
+# siguen registrando)
+METRICS_LOG = os.getenv("DAPPER_METRICS_LOG", "on").lower() != "off"
+
+# Clave de XCom con la foto de las métricas de cada tarea
+XCOM_METRICS_KEY = "metrics"
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    """
+    Contadores e histogramas en memoria, seguros para usar desde varios hilos.
+    Cada métrica se identifica por su nombre y sus etiquetas, como en Prometheus.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            index = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    index = i
+                    break
+            histogram['counts'][index] += 1
+            histogram['sum'] += value
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        """
+        Foto serializable en JSON de todas las métricas. Los buckets de los
+        histogramas son acumulados ([límite, cantidad], el último con límite '+Inf').
+
+        Returns:
+            dict: {'counters': [...], 'histograms': [...]}
+        """
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = []
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                cumulative, total = [], 0
+                for bound, count in zip(self.buckets + ('+Inf',), histogram['counts']):
+                    total += count
+                    cumulative.append([bound, total])
+                histograms.append({
+                    'name': name, 'labels': dict(labels), 'buckets': cumulative,
+                    'sum': round(histogram['sum'], 6), 'count': total,
+                })
+        return {'counters': counters, 'histograms': histograms}
+
+
+REGISTRY = MetricsRegistry()
+
+
+def get_registry():
+    """
+    Retorna el registro de métricas del proceso.
+    """
+    return REGISTRY
+
+
+def inc(name, value=1, **labels):
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    REGISTRY.observe(name, value, **labels)
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels.items()) + list((extra or {}).items())
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def to_prometheus(snapshot=None):
+    """
+    Foto de las métricas en el formato de texto de Prometheus (apto para un
+    Pushgateway o el textfile collector de node_exporter).
+    """
+    snapshot = snapshot or REGISTRY.snapshot()
+    lines, typed = [], set()
+    for counter in snapshot['counters']:
+        if counter['name'] not in typed:
+            lines.append(f"# TYPE {counter['name']} counter")
+            typed.add(counter['name'])
+        lines.append(f"{counter['name']}{_format_labels(counter['labels'])} {counter['value']}")
+    for histogram in snapshot['histograms']:
+        name = histogram['name']
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        for bound, count in histogram['buckets']:
+            lines.append(f"{name}_bucket{_format_labels(histogram['labels'], {'le': bound})} {count}")
+        lines.append(f"{name}_sum{_format_labels(histogram['labels'])} {histogram['sum']}")
+        lines.append(f"{name}_count{_format_labels(histogram['labels'])} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def to_statsd(snapshot=None):
+    """
+    Foto de las métricas como líneas StatsD (etiquetas al estilo DogStatsD): los
+    contadores como '|c' y de cada histograma la suma en ms como '|ms' y la
+    cantidad como '|c'.
+    """
+    snapshot = snapshot or REGISTRY.snapshot()
+
+    def _tags(labels):
+        return "|#" + ",".join(f"{k}:{v}" for k, v in labels.items()) if labels else ""
+
+    lines = [f"{c['name']}:{c['value']}|c{_tags(c['labels'])}" for c in snapshot['counters']]
+    for h in snapshot['histograms']:
+        lines.append(f"{h['name']}.sum:{round(h['sum'] * 1000, 3)}|ms{_tags(h['labels'])}")
+        lines.append(f"{h['name']}.count:{h['count']}|c{_tags(h['labels'])}")
+    return lines
+
+
+def log_event(event, **fields):
+    """
+    Emite una línea de log JSON (una por evento, no por fila).
+    """
+    if not METRICS_LOG:
+        return
+    record = {'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'), 'event': event}
+    record.update(fields)
+    print(json.dumps(record, ensure_ascii=False, default=str))
+
+
+class Stage:
+    """
+    Mide una etapa del ETL: tiempo de pared, filas de entrada y salida y el
+    resultado (ok/error). Se usa como context manager, asignando rows_in, rows_out
+    y campos extra dentro del bloque:
+
+        with stage('validate', rows_in=len(df)) as s:
+            ...
+            s.rows_out = len(valid_df)
+            s.extra['rejected'] = len(invalid_df)
+
+    o como decorador (@stage('scrape_page')). Registra dapper_stage_seconds,
+    dapper_stage_runs_total y dapper_stage_rows_{in,out}_total con la etiqueta
+    stage y, si log es True, una línea de log JSON al terminar.
+    """
+
+    def __init__(self, name, rows_in=None, log=True, registry=None, **labels):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.log = log
+        self.registry = registry
+        self.labels = labels
+        self.extra = {}
+        self.seconds = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._start
+        registry = self.registry or REGISTRY
+        status = 'ok' if exc_type is None else 'error'
+        registry.observe('dapper_stage_seconds', self.seconds, stage=self.name, **self.labels)
+        registry.inc('dapper_stage_runs_total', stage=self.name, status=status, **self.labels)
+        if self.rows_in is not None:
+            registry.inc('dapper_stage_rows_in_total', self.rows_in, stage=self.name, **self.labels)
+        if self.rows_out is not None:
+            registry.inc('dapper_stage_rows_out_total', self.rows_out, stage=self.name, **self.labels)
+        if self.log:
+            fields = dict(self.labels, status=status, seconds=round(self.seconds, 4),
+                          rows_in=self.rows_in, rows_out=self.rows_out)
+            if exc is not None:
+                fields['error'] = str(exc)
+            fields.update(self.extra)
+            log_event(f"stage.{self.name}", **fields)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Stage(self.name, self.rows_in, self.log, self.registry, **self.labels):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def stage(name, rows_in=None, log=True, registry=None, **labels):
+    """
+    Context manager / decorador que mide una etapa (ver Stage).
+    """
+    return Stage(name, rows_in=rows_in, log=log, registry=registry, **labels)
+
+
+@contextmanager
+def db_roundtrip(op, count=1):
+    """
+    Cuenta count viajes a la base de datos de tipo op (dapper_db_roundtrips_total)
+    y mide su duración (dapper_db_seconds).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe('dapper_db_seconds', time.perf_counter() - start, op=op)
+        REGISTRY.inc('dapper_db_roundtrips_total', count, op=op)
+
+
+def task_metrics(fn):
+    """
+    Decorador para los callables de las tareas de Airflow: mide la tarea como una
+    etapa (task_<nombre>) y al terminar publica en XCom (clave 'metrics') la foto
+    de las métricas del proceso en formato Prometheus. El registro se reinicia al
+    empezar, de modo que la foto corresponde solo a esa tarea.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        REGISTRY.reset()
+        try:
+            with Stage(f"task_{fn.__name__.replace('task_', '', 1)}"):
+                return fn(*args, **kwargs)
+        finally:
+            ti = kwargs.get('ti')
+            if ti is not None:
+                ti.xcom_push(key=XCOM_METRICS_KEY, value=to_prometheus())
+    return wrapper
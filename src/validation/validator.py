@@ -1,19 +1,32 @@
-import json, re, pandas as pd
-
-def load_rules(path="src/validation/rules.json"):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-import re
-import json
-
 import json
+import os
 import re
+import threading
 import pandas as pd
+from datetime import date
 from pathlib import Path
 
+from utils import metrics
+
+DEFAULT_RULES_PATH = Path(__file__).parent / "rules.json"
+
+REASONS_COLUMN = "validation_reasons"
+
+ENGINE_VECTORIZED = "vectorized"
+ENGINE_ROWWISE = "rowwise"
+
+
+def _count_issue(field: str, check: str, required: bool, count: int = 1):
+    """
+    Cuenta en dapper_validation_issues_total las filas que no cumplen una regla:
+    check es 'required', 'type' o 'regex' y action 'rejected' (fila descartada)
+    o 'cleared' (campo opcional limpiado).
+    """
+    action = "rejected" if required else "cleared"
+    metrics.inc("dapper_validation_issues_total", count, field=field, check=check, action=action)
+
 def _is_empty(value) -> bool:
-    if value is None:
+    if value is None or value is pd.NaT:
         return True
     if isinstance(value, float) and pd.isna(value):
         return True
@@ -28,7 +41,8 @@ def _type_ok(value, expected_type: str) -> bool:
       - "int": debe ser int (no float con .0)
       - "float": debe ser float o int (permitimos int como float válido)
       - "boolean": debe ser bool
-      - "date": lo validará el regex (aquí solo se permite str o datetime formateado a str previamente)
+      - "date": fecha real (date, datetime o Timestamp, ver utils.dates) o str; a los
+        str se les aplica además el regex de la regla
     """
     if _is_empty(value):
         return True  # vacío se evalúa en otra regla (required)
@@ -41,18 +55,85 @@ def _type_ok(value, expected_type: str) -> bool:
     if expected_type == "boolean":
         return isinstance(value, bool)
     if expected_type == "date":
-        # El chequeo real vendrá por regex (YYYY-MM-DD). Aquí permitimos str.
-        return isinstance(value, str)
+        # Las fechas ya convertidas son válidas; los str se chequean por regex (YYYY-MM-DD)
+        return isinstance(value, (str, date))
     # Si no se reconoce el tipo, no lo invalidamos por tipo.
     return True
 
 def load_rules(path: str = None) -> dict:
     if path is None:
-        path = Path(__file__).parent / "rules.json"
+        path = DEFAULT_RULES_PATH
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def validate_dataframe(df: pd.DataFrame, rules_path: str = None):
+
+class CompiledRule:
+    """
+    Regla de un campo con su regex y su chequeo de tipo ya preparados.
+    """
+
+    def __init__(self, field: str, rule: dict):
+        self.field = field
+        self.required = rule.get("required", False)
+        self.expected_type = rule.get("type", None)
+        self.pattern = rule.get("regex", None)
+        self.regex = re.compile(self.pattern) if self.pattern else None
+        self.dtype_type_ok = _DTYPE_TYPE_OK.get(self.expected_type)
+
+
+class RuleSet:
+    """
+    Conjunto de reglas de validación compilado una sola vez.
+
+    Usar RuleSet.load(path) para obtenerlo: queda en memoria por ruta y solo se
+    vuelve a leer cuando cambia la fecha de modificación del archivo, de modo que
+    los workers de larga vida y los llamadores por lotes pequeños no pagan el costo
+    de leer y compilar las reglas en cada llamada.
+    """
+
+    _cache = {}
+    _lock = threading.Lock()
+
+    def __init__(self, rules: dict, path=None, mtime=None):
+        self.rules = rules
+        self.path = path
+        self.mtime = mtime
+        self.compiled = [CompiledRule(field, rule) for field, rule in rules.items()]
+
+    @classmethod
+    def load(cls, path: str = None) -> "RuleSet":
+        path = os.path.abspath(path or DEFAULT_RULES_PATH)
+        mtime = os.stat(path).st_mtime_ns
+
+        with cls._lock:
+            ruleset = cls._cache.get(path)
+            if ruleset is not None and ruleset.mtime == mtime:
+                return ruleset
+
+            ruleset = cls(load_rules(path), path=path, mtime=mtime)
+            cls._cache[path] = ruleset
+
+        print(f"Cargando reglas de validación ({path}):")
+        for col, r in ruleset.rules.items():
+            print(f"  - {col}: {r}")
+        return ruleset
+
+    def validate(self, batch, engine: str = ENGINE_VECTORIZED, verbose: bool = False):
+        """
+        Valida un lote (DataFrame o lista de dicts) con las reglas compiladas.
+
+        Retorna: (valid_df, invalid_df)
+        """
+        df = batch if isinstance(batch, pd.DataFrame) else pd.DataFrame(batch)
+
+        if engine == ENGINE_ROWWISE:
+            return _validate_rowwise(df, self)
+        if engine == ENGINE_VECTORIZED:
+            return _validate_vectorized(df, self, verbose)
+        raise ValueError(f"Motor de validación desconocido: {engine}")
+
+
+def validate_dataframe(df: pd.DataFrame, rules_path: str = None, engine: str = ENGINE_VECTORIZED):
     """
     Aplica reglas de validación por campo (tipo, regex, obligatoriedad).
 
@@ -60,37 +141,48 @@ def validate_dataframe(df: pd.DataFrame, rules_path: str = None):
       - Si un campo no cumple tipo o regex → ese campo se borra (None/NULL).
       - Si un campo obligatorio falta o no cumple → descartar fila completa.
 
-    Retorna: (valid_df, invalid_df)
+    engine:
+      - "vectorized" (default): evalúa cada regla por columna con operaciones de pandas.
+      - "rowwise": implementación original fila por fila (referencia para paridad).
+
+    Retorna: (valid_df, invalid_df). invalid_df incluye la columna
+    'validation_reasons' con los motivos de rechazo de cada fila. Los motivos se
+    cuentan por regla en dapper_validation_issues_total (ver utils.metrics).
     """
-    rules = load_rules(rules_path)
+    ruleset = RuleSet.load(rules_path)
+    with metrics.stage("validate", rows_in=len(df), engine=engine) as validate_stage:
+        valid_df, invalid_df = ruleset.validate(df, engine=engine, verbose=True)
+        validate_stage.rows_out = len(valid_df)
+        validate_stage.extra["rejected"] = len(invalid_df)
+    return valid_df, invalid_df
 
-    print("Cargando reglas de validación:")
-    for col, r in rules.items():
-        print(f"  - {col}: {r}")
 
+def _validate_rowwise(df: pd.DataFrame, ruleset: RuleSet):
     valid_rows = []
     invalid_rows = []
 
-    for idx, row in df.iterrows():
+    for _, row in df.iterrows():
         row_dict = row.to_dict()
         row_invalid = False
         reasons = []
         
-        for field, rule in rules.items():
+        for rule in ruleset.compiled:
+            field = rule.field
             value = row_dict.get(field, None)
 
             # 1) Campo requerido: si está vacío → fila inválida
-            if rule.get("required", False) and _is_empty(value):
+            if rule.required and _is_empty(value):
                 reasons.append(f"{field}: requerido pero vacío")
+                _count_issue(field, "required", True)
                 row_invalid = True
                 # No hace falta seguir validando este campo; pero seguimos con otros para log completo
                 continue
 
             # 2) Tipo: si no cumple y NO está vacío → campo a None; si era requerido → fila inválida
-            expected_type = rule.get("type", None)
+            expected_type = rule.expected_type
             if expected_type and not _is_empty(value) and not _type_ok(value, expected_type):
-                
-                if rule.get("required", False):
+                _count_issue(field, "type", rule.required)
+                if rule.required:
                     reasons.append(f"{field}: no cumple tipo ({expected_type})")
                     row_invalid = True
                 else:
@@ -99,12 +191,13 @@ def validate_dataframe(df: pd.DataFrame, rules_path: str = None):
                 # seguimos para evaluar regex (aunque ya queda None si opcional)
 
             # 3) Regex: si no cumple y NO está vacío → campo a None; si era requerido → fila inválida
-            pattern = rule.get("regex", None)
+            pattern = rule.pattern
             if pattern and not _is_empty(row_dict.get(field)):
                 val = row_dict.get(field)
                 if isinstance(val, str):
-                    if not re.match(pattern, val):
-                        if rule.get("required", False):
+                    if not rule.regex.match(val):
+                        _count_issue(field, "regex", rule.required)
+                        if rule.required:
                             reasons.append(f"{field}: no cumple regex {pattern}")
                             row_invalid = True
                         else:
@@ -114,17 +207,126 @@ def validate_dataframe(df: pd.DataFrame, rules_path: str = None):
                     # Si hay regex pero el valor no es string, ya falló tipo antes;
                     # si es requerido, ya marcamos fila inválida; si opcional, lo dejamos None.
                     pass
-        if reasons:
-            estado = "rechazada" if row_invalid else "válida con ajustes"
-            print(f"🧾 Fila {idx} ({estado}) → {'; '.join(reasons)}")
-            
         if row_invalid:
+            row_dict[REASONS_COLUMN] = "; ".join(reasons)
             invalid_rows.append(row_dict)
         else:
             valid_rows.append(row_dict)
 
     valid_df = pd.DataFrame(valid_rows)
     invalid_df = pd.DataFrame(invalid_rows)
+    return valid_df, invalid_df
+
+
+# Chequeos de tipo por dtype de la columna: si el dtype garantiza el tipo no hace
+# falta revisar celda por celda
+_DTYPE_TYPE_OK = {
+    "string": lambda s: pd.api.types.is_string_dtype(s) and pd.api.types.infer_dtype(s, skipna=True) in ("string", "empty"),
+    "int": lambda s: pd.api.types.is_integer_dtype(s) and not pd.api.types.is_bool_dtype(s),
+    "float": lambda s: pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s),
+    "boolean": lambda s: pd.api.types.is_bool_dtype(s),
+    "date": lambda s: pd.api.types.is_datetime64_any_dtype(s) or (
+        pd.api.types.is_string_dtype(s) and pd.api.types.infer_dtype(s, skipna=True) in ("string", "empty")
+    ),
+}
+
+
+def _str_mask(series: pd.Series) -> pd.Series:
+    if series.dtype != object:
+        return pd.Series(False, index=series.index)
+    if pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+        return series.notna()
+    return series.map(lambda v: isinstance(v, str)).astype(bool)
+
+
+def _empty_mask(series: pd.Series, is_str: pd.Series) -> pd.Series:
+    empty = series.isna()
+    if is_str.any():
+        blank = series[is_str].str.strip().eq("").astype(bool)
+        empty[blank.index[blank]] = True
+    return empty
+
+
+def _type_fail_mask(series: pd.Series, rule: CompiledRule, empty: pd.Series) -> pd.Series:
+    if rule.dtype_type_ok is None or rule.dtype_type_ok(series):
+        return pd.Series(False, index=series.index)
+    expected_type = rule.expected_type
+    type_ok = series.map(lambda v: _type_ok(v, expected_type)).astype(bool)
+    return ~empty & ~type_ok
+
+
+def _validate_vectorized(df: pd.DataFrame, ruleset: RuleSet, verbose: bool = False):
+    out = df.copy()
+    row_invalid = pd.Series(False, index=df.index)
+    reasons = pd.Series("", index=df.index, dtype=object)
+    reason_counts = {}
+
+    def _add_reason(mask, message, rule, check):
+        if not mask.any():
+            return
+        current = reasons[mask]
+        reasons[mask] = current.where(current.eq(""), current + "; ") + message
+        reason_counts[message] = int(mask.sum())
+        _count_issue(rule.field, check, rule.required, reason_counts[message])
+
+    for rule in ruleset.compiled:
+        field = rule.field
+        required = rule.required
+        expected_type = rule.expected_type
+        pattern = rule.pattern
+
+        if field not in out.columns:
+            # Columna ausente: todas las celdas vacías
+            if required:
+                row_invalid |= True
+                _add_reason(pd.Series(True, index=df.index), f"{field}: requerido pero vacío", rule, "required")
+            continue
+
+        series = out[field]
+        is_str = _str_mask(series)
+        empty = _empty_mask(series, is_str)
+
+        # 1) Requerido y vacío → fila inválida (no se evalúa más este campo)
+        if required:
+            _add_reason(empty, f"{field}: requerido pero vacío", rule, "required")
+            row_invalid |= empty
+
+        # 2) Tipo
+        cleared = pd.Series(False, index=df.index)
+        if expected_type:
+            type_fail = _type_fail_mask(series, rule, empty)
+            if required:
+                _add_reason(type_fail, f"{field}: no cumple tipo ({expected_type})", rule, "type")
+                row_invalid |= type_fail
+            else:
+                _add_reason(type_fail, f"{field}: opcional, no cumple tipo → limpiado", rule, "type")
+                cleared |= type_fail
+
+        # 3) Regex (solo sobre strings no vacíos que no se limpiaron por tipo)
+        if pattern:
+            candidates = ~empty & ~cleared & is_str
+            if candidates.any():
+                matched = series[candidates].str.match(rule.regex).astype(bool)
+                regex_fail = (~matched).reindex(df.index, fill_value=False)
+            else:
+                regex_fail = pd.Series(False, index=df.index)
+            if required:
+                _add_reason(regex_fail, f"{field}: no cumple regex {pattern}", rule, "regex")
+                row_invalid |= regex_fail
+            else:
+                _add_reason(regex_fail, f"{field}: opcional, no cumple regex → limpiado", rule, "regex")
+                cleared |= regex_fail
+
+        if cleared.any():
+            # infer_objects deja el mismo dtype que tendría la columna reconstruida
+            # desde filas (p. ej. enteros con None → float)
+            out[field] = series.astype(object).where(~cleared, None).infer_objects()
+
+    # Resumen por regla (una línea de log JSON) en lugar de una línea por fila
+    if verbose and reason_counts:
+        metrics.log_event("validation.reasons", reasons=reason_counts)
 
-    print(f"Validados {len(valid_df)} registros; descartados {len(invalid_df)}.")
+    valid_df = out[~row_invalid].reset_index(drop=True)
+    invalid_df = out[row_invalid].reset_index(drop=True)
+    invalid_df[REASONS_COLUMN] = reasons[row_invalid].reset_index(drop=True)
     return valid_df, invalid_df